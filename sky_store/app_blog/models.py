@@ -1,5 +1,3 @@
-from django.conf import settings
-from django.core.mail import send_mail
 from django.db import models
 
 from app_user.models import CustomUser
@@ -27,23 +25,6 @@ class Post(models.Model):
     def __str__(self):
         return self.title
 
-    def increment_view_count(self):
-        """
-        Увеличивает счетчик просмотров поста на 1.
-        Если счетчик просмотров достигает 100, отправляет
-        письмо на электронную почту.
-        """
-        self.views_count += 1
-        self.save()
-
-        if self.views_count == 100:
-            send_mail(
-                subject='Поздравляем с достижением!',
-                message=f'Статья "{self.title}" достигла 100 просмотров!',
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[settings.EMAIL_HOST_USER]
-            )
-
     def make_unpublished(self):
         """
         Помечает пост как неопубликованный.
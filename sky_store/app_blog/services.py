@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class RedisViewCountBackend:
+    """
+    Буфер просмотров постов в Redis.
+    Просмотры накапливаются в хеше атомарной командой HINCRBY.
+    """
+    PENDING_KEY = 'blog:views:pending'
+
+    def __init__(self, url: str) -> None:
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def increment(self, post_id: int) -> int:
+        return self.client.hincrby(self.PENDING_KEY, post_id, 1)
+
+    def drain(self) -> Dict[int, int]:
+        """
+        Атомарно забирает накопленные просмотры и очищает буфер.
+        """
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hgetall(self.PENDING_KEY)
+        pipeline.delete(self.PENDING_KEY)
+        pending, _ = pipeline.execute()
+        return {int(post_id): int(count) for post_id, count in pending.items()}
+
+    def restore(self, increments: Dict[int, int]) -> None:
+        """
+        Возвращает в буфер просмотры, которые не удалось записать в базу данных.
+        """
+        pipeline = self.client.pipeline(transaction=True)
+        for post_id, count in increments.items():
+            pipeline.hincrby(self.PENDING_KEY, post_id, count)
+        pipeline.execute()
+
+
+class LocalViewCountBackend:
+    """
+    Буфер просмотров постов в памяти процесса.
+    Используется, если Redis недоступен.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending = Counter()
+
+    def increment(self, post_id: int) -> int:
+        with self.lock:
+            self.pending[post_id] += 1
+            return self.pending[post_id]
+
+    def drain(self) -> Dict[int, int]:
+        with self.lock:
+            pending, self.pending = dict(self.pending), Counter()
+        return pending
+
+    def restore(self, increments: Dict[int, int]) -> None:
+        with self.lock:
+            self.pending.update(increments)
+
+
+class ViewCountService:
+    """
+    Класс, описывающий буферизованный счётчик просмотров постов.
+
+    Просмотр не записывается в базу данных во время запроса, а накапливается в буфере.
+    Периодическая задача app_blog.tasks.flush_post_views переносит накопленные просмотры
+    в базу данных одним UPDATE на пост и отправляет письма о достижении 100 просмотров.
+    Если Redis недоступен, просмотры накапливаются в памяти процесса и
+    периодически записываются в базу данных самим процессом. После ошибки Redis
+    не используется при учёте просмотров в течение BLOG_VIEWS_REDIS_RETRY_INTERVAL секунд,
+    чтобы запросы не ожидали тайм-аута подключения.
+    """
+    VIEWS_MILESTONE = 100
+
+    _redis_backend = None
+    _redis_retry_at = 0.0
+    _local_backend = LocalViewCountBackend()
+    _local_flushed_at = time.monotonic()
+
+    @classmethod
+    def increment(cls, post_id: int) -> int:
+        """
+        Учитывает просмотр поста.
+
+        :param post_id: Идентификатор поста.
+        :return: Количество просмотров поста, ещё не записанных в базу данных.
+        """
+        if time.monotonic() >= cls._redis_retry_at:
+            try:
+                return cls._get_redis_backend().increment(post_id)
+            except redis.RedisError as error:
+                cls._redis_retry_at = time.monotonic() + settings.BLOG_VIEWS_REDIS_RETRY_INTERVAL
+                logger.warning(f'Redis недоступен, просмотры учитываются в памяти процесса: {error}')
+
+        pending = cls._local_backend.increment(post_id)
+        if time.monotonic() - cls._local_flushed_at > settings.BLOG_VIEWS_FLUSH_INTERVAL:
+            cls._local_flushed_at = time.monotonic()
+            try:
+                cls._flush_backend(cls._local_backend)
+            except Exception as error:
+                logger.warning(f'Не удалось записать просмотры в базу данных: {error}')
+        return pending
+
+    @classmethod
+    def flush(cls) -> List[int]:
+        """
+        Записывает накопленные просмотры в базу данных.
+
+        :return: Идентификаторы постов, достигших 100 просмотров.
+        """
+        milestone_post_ids = cls._flush_backend(cls._local_backend)
+        try:
+            milestone_post_ids += cls._flush_backend(cls._get_redis_backend())
+        except redis.RedisError as error:
+            logger.warning(f'Не удалось получить просмотры из Redis: {error}')
+        return milestone_post_ids
+
+    @classmethod
+    def _flush_backend(cls, backend) -> List[int]:
+        """
+        Переносит просмотры из буфера в базу данных.
+        Если запись не удалась, возвращает просмотры обратно в буфер.
+        """
+        increments = backend.drain()
+        if not increments:
+            return []
+
+        try:
+            with transaction.atomic():
+                for post_id, count in increments.items():
+                    Post.objects.filter(pk=post_id).update(views_count=F('views_count') + count)
+                views_counts = dict(Post.objects.filter(pk__in=increments).values_list('pk', 'views_count'))
+        except Exception:
+            backend.restore(increments)
+            raise
+
+        logger.info(f'Записаны просмотры {sum(increments.values())} для {len(increments)} постов')
+
+        milestone_post_ids = [
+            post_id for post_id, views_count in views_counts.items()
+            if views_count - increments[post_id] < cls.VIEWS_MILESTONE <= views_count
+        ]
+        if milestone_post_ids:
+            from .tasks import send_views_milestone_email
+
+            for post_id in milestone_post_ids:
+                try:
+                    send_views_milestone_email.delay(post_id)
+                except Exception as error:
+                    logger.warning(f'Не удалось поставить в очередь письмо о просмотрах поста {post_id}: {error}')
+        return milestone_post_ids
+
+    @classmethod
+    def _get_redis_backend(cls) -> RedisViewCountBackend:
+        if cls._redis_backend is None:
+            cls._redis_backend = RedisViewCountBackend(url=settings.BLOG_VIEWS_REDIS_URL)
+        return cls._redis_backend
@@ -0,0 +1,29 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .models import Post
+from .services import ViewCountService
+
+
+@shared_task
+def flush_post_views() -> None:
+    """
+    Переносит накопленные просмотры постов в базу данных
+    """
+    ViewCountService.flush()
+
+
+@shared_task
+def send_views_milestone_email(post_id: int) -> None:
+    """
+    Отправляет письмо о достижении постом 100 просмотров
+    :param post_id: идентификатор поста
+    """
+    post = Post.objects.get(pk=post_id)
+    send_mail(
+        subject='Поздравляем с достижением!',
+        message=f'Статья "{post.title}" достигла {ViewCountService.VIEWS_MILESTONE} просмотров!',
+        from_email=settings.EMAIL_HOST_USER,
+        recipient_list=[settings.EMAIL_HOST_USER]
+    )
@@ -1,3 +1,40 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.test import TestCase, override_settings
+
+from app_user.models import CustomUser
+from .models import Post
+from .services import LocalViewCountBackend, RedisViewCountBackend, ViewCountService
+
+
+@override_settings(BLOG_VIEWS_REDIS_URL='redis://127.0.0.1:1/0', BLOG_VIEWS_REDIS_RETRY_INTERVAL=30,
+                   BLOG_VIEWS_FLUSH_INTERVAL=60)
+class ViewCountFallbackTestCase(TestCase):
+    """
+    Проверяет учёт просмотров постов при недоступном Redis.
+    """
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='author@example.com', password='password')
+        self.post = Post.objects.create(title='Пост', content='Содержание', created_by=user, views_count=99)
+        patcher = mock.patch.multiple(
+            ViewCountService, _redis_backend=None, _redis_retry_at=0.0, _local_backend=LocalViewCountBackend()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redis_is_not_retried_on_every_view(self):
+        error = redis.ConnectionError('Redis недоступен')
+        with mock.patch.object(RedisViewCountBackend, 'increment', side_effect=error) as increment:
+            self.assertEqual(ViewCountService.increment(self.post.pk), 1)
+            self.assertEqual(ViewCountService.increment(self.post.pk), 2)
+        self.assertEqual(increment.call_count, 1)
+
+    def test_local_flush_survives_unavailable_broker(self):
+        ViewCountService._local_backend.increment(self.post.pk)
+        with mock.patch('app_blog.tasks.send_views_milestone_email.delay', side_effect=ConnectionError) as delay:
+            self.assertEqual(ViewCountService._flush_backend(ViewCountService._local_backend), [self.post.pk])
+        delay.assert_called_once_with(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 100)
@@ -9,6 +9,7 @@ from permissions.authenticate import AuthenticatedAccessMixin
 from permissions.user_permission import CombinedAccessMixin
 from .forms import PostCreateForm
 from .models import Post
+from .services import ViewCountService
 
 
 class PostListView(ListView):
@@ -25,7 +26,7 @@ class PostDetailView(DetailView):
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset=queryset)
-        obj.increment_view_count()
+        obj.views_count += ViewCountService.increment(obj.pk)
         return obj
 
 
@@ -5,3 +5,6 @@ class AppCatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_catalog'
     verbose_name = 'Приложение "Каталог"'
+
+    def ready(self):
+        from . import signals  # noqa: F401
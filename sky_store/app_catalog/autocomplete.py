@@ -0,0 +1,463 @@
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'\w+')
+
+ProductSuggestion = namedtuple('ProductSuggestion', ['id', 'name'])
+
+
+class TrieNode:
+    """
+    Узел префиксного дерева. Дочерние узлы и идентификаторы товаров создаются
+    только при необходимости, чтобы дерево занимало меньше памяти.
+    """
+    __slots__ = ('children', 'ids')
+
+    def __init__(self) -> None:
+        self.children: Optional[Dict[str, 'TrieNode']] = None
+        self.ids: Optional[Set[int]] = None
+
+
+class ProductNameTrie:
+    """
+    Класс, описывающий префиксное дерево названий товаров.
+
+    Ключами служат нормализованное название (нижний регистр, слова через пробел) и его окончания,
+    начинающиеся с каждого следующего слова, поэтому товар находится по началу любого слова названия.
+    Ключи обрезаются до max_key_length символов. Поиск допускает опечатки (расстояние Левенштейна
+    между запросом и началом ключа), сначала возвращаются товары, найденные без опечаток.
+    """
+
+    def __init__(self, max_key_length: int = 32) -> None:
+        """
+        :param max_key_length: Максимальная длина ключа.
+        """
+        self.max_key_length = max_key_length
+        self.root = TrieNode()
+        self.names: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(WORD.findall(text.lower()))
+
+    def get_keys(self, name: str) -> Set[str]:
+        words = self.normalize(name).split(' ')
+        return {' '.join(words[index:])[:self.max_key_length] for index in range(len(words)) if words[index]}
+
+    def add(self, product_id: int, name: str) -> None:
+        """
+        Добавляет товар в дерево. Если товар уже есть в дереве, заменяет его название.
+        """
+        if product_id in self.names:
+            if self.names[product_id] == name:
+                return
+            self.remove(product_id)
+        self.names[product_id] = name
+        for key in self.get_keys(name):
+            node = self.root
+            for char in key:
+                if node.children is None:
+                    node.children = {}
+                node = node.children.setdefault(char, TrieNode())
+            if node.ids is None:
+                node.ids = set()
+            node.ids.add(product_id)
+
+    def remove(self, product_id: int) -> None:
+        """
+        Удаляет товар из дерева вместе с узлами, которые после этого остались пустыми.
+        """
+        name = self.names.pop(product_id, None)
+        if name is None:
+            return
+        for key in self.get_keys(name):
+            path = [self.root]
+            for char in key:
+                path.append(path[-1].children[char])
+            node = path[-1]
+            node.ids.discard(product_id)
+            if not node.ids:
+                node.ids = None
+            for char, parent, child in zip(reversed(key), reversed(path[:-1]), reversed(path[1:])):
+                if child.ids or child.children:
+                    break
+                del parent.children[char]
+                if not parent.children:
+                    parent.children = None
+
+    def complete(self, text: str, limit: int, max_typos: int = 0) -> List[ProductSuggestion]:
+        """
+        Возвращает товары, название которых (или одно из слов названия) начинается с запроса.
+
+        :param text: Запрос.
+        :param limit: Максимальное количество товаров.
+        :param max_typos: Допустимое количество опечаток в запросе.
+        :return: Товары: сначала найденные без опечаток, затем - с наименьшим количеством опечаток.
+        """
+        query = self.normalize(text)[:self.max_key_length]
+        if not query:
+            return []
+
+        ids: Dict[int, None] = {}
+        self.collect(self.find(query), ids, limit)
+        if len(ids) < limit and max_typos:
+            for _, _, node in sorted(self.find_similar(query, max_typos), key=lambda found: found[:2]):
+                self.collect(node, ids, limit)
+                if len(ids) >= limit:
+                    break
+        return [ProductSuggestion(product_id, self.names[product_id]) for product_id in ids]
+
+    def find(self, query: str) -> Optional[TrieNode]:
+        node = self.root
+        for char in query:
+            if node.children is None or char not in node.children:
+                return None
+            node = node.children[char]
+        return node
+
+    def find_similar(self, query: str, max_typos: int) -> Iterator[Tuple[int, int, TrieNode]]:
+        """
+        Находит узлы, путь к которым отличается от запроса не более чем на max_typos правок.
+        Строки расстояния Левенштейна вычисляются по мере спуска по дереву, ветви,
+        в которых расстояние до любого начала запроса больше max_typos, не просматриваются.
+
+        :return: Тройки (количество опечаток, разница длин пути и запроса, узел).
+        """
+        stack = [(self.root, list(range(len(query) + 1)), 0)]
+        while stack:
+            node, row, depth = stack.pop()
+            if row[-1] <= max_typos and depth:
+                yield row[-1], abs(depth - len(query)), node
+            if node.children is None:
+                continue
+            for char, child in node.children.items():
+                next_row = [row[0] + 1]
+                for index, query_char in enumerate(query, 1):
+                    next_row.append(min(
+                        next_row[index - 1] + 1,
+                        row[index] + 1,
+                        row[index - 1] + (query_char != char)
+                    ))
+                if min(next_row) <= max_typos:
+                    stack.append((child, next_row, depth + 1))
+
+    @staticmethod
+    def collect(node: Optional[TrieNode], ids: Dict[int, None], limit: int) -> None:
+        """
+        Добавляет в ids товары поддерева узла в алфавитном порядке ключей, пока их меньше limit.
+        """
+        if node is None:
+            return
+        stack = [node]
+        while stack and len(ids) < limit:
+            node = stack.pop()
+            if node.ids:
+                for product_id in sorted(node.ids):
+                    ids.setdefault(product_id)
+                    if len(ids) >= limit:
+                        return
+            if node.children:
+                stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+
+
+class ProductAutocomplete:
+    """
+    Класс, описывающий подсказки названий опубликованных товаров при вводе поискового запроса.
+
+    В PostgreSQL с расширением pg_trgm товары ищутся по триграммному сходству слов названия
+    с запросом (оператор %>, GIN-индекс product_name_trgm_idx), что допускает опечатки.
+    Если расширение недоступно (или используется другая СУБД), подсказки формируются
+    по префиксному дереву опубликованных товаров в памяти процесса. Дерево строится
+    при первом обращении и затем изменяется при сохранении и удалении отдельных товаров.
+
+    Дерево есть в каждом процессе, поэтому об изменении товара процесс сообщает остальным через кеш:
+    увеличивает номер поколения дерева и сохраняет идентификатор товара под новым номером.
+    При формировании подсказок процесс применяет пропущенные изменения, а если их слишком много
+    или они уже удалены из кеша - строит дерево заново. Без кеша (CACHE_ENABLED = False) дерево
+    процесса учитывает только изменения, сделанные в этом процессе. Пока дерево строится,
+    подсказки формируются по прежнему дереву. Отсутствие триграммного индекса перепроверяется
+    раз в PRODUCT_AUTOCOMPLETE_TRIGRAM_CHECK_INTERVAL секунд.
+    """
+    TRIGRAM_INDEX_NAME = 'product_name_trgm_idx'
+    GENERATION_KEY = 'catalog:autocomplete:generation'
+    CHANGE_KEY = 'catalog:autocomplete:change:{generation}'
+    MAX_REPLAYED_CHANGES = 1000
+
+    _lock = threading.Lock()
+    _build_lock = threading.Lock()
+    _trie: Optional[ProductNameTrie] = None
+    _generation: Optional[int] = None
+    _changed_during_build: Optional[Set[int]] = None
+    _trigram_available: Optional[bool] = None
+    _trigram_checked_at = 0.0
+
+    @classmethod
+    def install(cls, schema_editor=None) -> None:
+        """
+        Создаёт расширение pg_trgm и триграммный индекс по названию товара.
+        Если расширение не установлено на сервере PostgreSQL, индекс не создаётся.
+        """
+        db = schema_editor.connection if schema_editor else connection
+        if db.vendor != 'postgresql':
+            return
+        with db.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                logger.warning('Расширение pg_trgm недоступно, подсказки товаров будут формироваться без индекса')
+                return
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {cls.TRIGRAM_INDEX_NAME} ON product USING gin (name gin_trgm_ops)'
+            )
+
+    @classmethod
+    def uninstall(cls, schema_editor=None) -> None:
+        """
+        Удаляет триграммный индекс. Расширение pg_trgm не удаляется.
+        """
+        db = schema_editor.connection if schema_editor else connection
+        if db.vendor == 'postgresql':
+            with db.cursor() as cursor:
+                cursor.execute(f'DROP INDEX IF EXISTS {cls.TRIGRAM_INDEX_NAME}')
+
+    @classmethod
+    def is_trigram_available(cls) -> bool:
+        """
+        Проверяет, что используется PostgreSQL и триграммный индекс создан.
+        """
+        if connection.vendor != 'postgresql':
+            return False
+        now = time.monotonic()
+        if cls._trigram_available is None or (
+            not cls._trigram_available
+            and now - cls._trigram_checked_at >= settings.PRODUCT_AUTOCOMPLETE_TRIGRAM_CHECK_INTERVAL
+        ):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [cls.TRIGRAM_INDEX_NAME])
+                cls._trigram_available = cursor.fetchone() is not None
+            cls._trigram_checked_at = now
+            if cls._trigram_available:
+                with cls._lock:
+                    cls._trie = cls._generation = None
+        return cls._trigram_available
+
+    @staticmethod
+    def get_max_typos(text: str) -> int:
+        """
+        Возвращает допустимое количество опечаток: чем длиннее запрос, тем больше.
+        """
+        length = len(text)
+        return 0 if length < 4 else 1 if length < 8 else 2
+
+    @classmethod
+    def complete(cls, text: str, limit: Optional[int] = None) -> List[ProductSuggestion]:
+        """
+        Возвращает подсказки для поискового запроса.
+
+        :param text: Начало названия товара (возможно, с опечатками).
+        :param limit: Максимальное количество подсказок (по умолчанию - PRODUCT_AUTOCOMPLETE_LIMIT).
+        :return: Список подсказок (идентификатор и название товара), лучшие - первыми.
+        """
+        text = text.strip()
+        if len(text) < settings.PRODUCT_AUTOCOMPLETE_MIN_LENGTH:
+            return []
+        limit = min(limit or settings.PRODUCT_AUTOCOMPLETE_LIMIT, settings.PRODUCT_AUTOCOMPLETE_MAX_LIMIT)
+
+        if cls.is_trigram_available():
+            return cls.complete_trigram(text, limit)
+        trie = cls.get_trie()
+        with cls._lock:
+            return trie.complete(text, limit=limit, max_typos=cls.get_max_typos(text))
+
+    @staticmethod
+    def complete_trigram(text: str, limit: int) -> List[ProductSuggestion]:
+        rows = Product.get_all_published_products().extra(
+            where=['product.name %%> %s'], params=[text]
+        ).annotate(
+            similarity=TrigramWordSimilarity(text, 'name')
+        ).order_by('-similarity', 'name').values_list('id', 'name')[:limit]
+        return [ProductSuggestion(*row) for row in rows]
+
+    @classmethod
+    def get_trie(cls) -> ProductNameTrie:
+        """
+        Возвращает префиксное дерево опубликованных товаров: при первом обращении строит его,
+        затем применяет изменения товаров, сделанные в других процессах.
+        """
+        generation = cls.get_generation()
+        trie = cls._trie
+        if trie is not None and (generation is None or generation == cls._generation):
+            return trie
+        if trie is not None and cls.apply_changes(generation):
+            return trie
+        return cls.build_trie(generation, wait=trie is None)
+
+    @classmethod
+    def build_trie(cls, generation: Optional[int], wait: bool) -> ProductNameTrie:
+        """
+        Строит префиксное дерево без блокировки дерева, которое в это время продолжает использоваться,
+        и заменяет им прежнее. Одновременно дерево строится только одним потоком.
+        Товары, изменённые во время построения, затем загружаются заново.
+
+        :param generation: Номер поколения дерева в кеше до начала построения.
+        :param wait: Ждать ли построения дерева другим потоком (False - вернуть прежнее дерево).
+        """
+        if not cls._build_lock.acquire(blocking=wait):
+            return cls._trie
+        try:
+            if cls._trie is not None and (generation is None or generation == cls._generation):
+                return cls._trie
+            with cls._lock:
+                cls._changed_during_build = set()
+            trie = ProductNameTrie()
+            for product_id, name in Product.get_all_published_products().values_list('id', 'name').iterator():
+                trie.add(product_id, name)
+            with cls._lock:
+                changed, cls._changed_during_build = cls._changed_during_build, None
+                cls._trie, cls._generation = trie, generation
+            logger.info(f'Построено дерево подсказок товаров: {len(trie)} товаров')
+            if changed:
+                cls.refresh_products(changed)
+            return trie
+        finally:
+            cls._build_lock.release()
+
+    @classmethod
+    def apply_changes(cls, generation: int) -> bool:
+        """
+        Загружает заново товары, изменённые в других процессах после построения дерева.
+
+        :param generation: Текущий номер поколения дерева в кеше.
+        :return: False, если изменения нельзя применить и дерево нужно построить заново.
+        """
+        current = cls._generation
+        if current is None or not 0 < generation - current <= cls.MAX_REPLAYED_CHANGES:
+            return False
+        keys = [cls.CHANGE_KEY.format(generation=number) for number in range(current + 1, generation + 1)]
+        try:
+            changes = cache.get_many(keys)
+        except Exception as error:
+            logger.warning(f'Кеш подсказок товаров недоступен: {error}')
+            return True
+        if len(changes) < len(keys):
+            return False
+        cls.refresh_products(set(changes.values()), generation)
+        return True
+
+    @classmethod
+    def refresh_products(cls, product_ids: Set[int], generation: Optional[int] = None) -> None:
+        """
+        Загружает товары из базы данных и заменяет их в дереве: опубликованные добавляются
+        (или их названия заменяются), остальные удаляются.
+
+        :param product_ids: Идентификаторы товаров.
+        :param generation: Номер поколения дерева, которому соответствует дерево после изменения.
+        """
+        names = dict(Product.get_all_published_products().filter(pk__in=product_ids).values_list('id', 'name'))
+        with cls._lock:
+            if cls._trie is None:
+                return
+            for product_id in product_ids:
+                if product_id in names:
+                    cls._trie.add(product_id, names[product_id])
+                else:
+                    cls._trie.remove(product_id)
+            if generation is not None and cls._generation is not None:
+                cls._generation = max(cls._generation, generation)
+
+    @classmethod
+    def update_product(cls, product: Product) -> None:
+        """
+        Изменяет префиксное дерево после сохранения товара: опубликованный товар добавляется
+        (или его название заменяется), неопубликованный - удаляется.
+        """
+        with cls._lock:
+            if cls._changed_during_build is not None:
+                cls._changed_during_build.add(product.pk)
+            if cls._trie is not None:
+                if product.is_published:
+                    cls._trie.add(product.pk, product.name)
+                else:
+                    cls._trie.remove(product.pk)
+        cls.publish_change(product.pk)
+
+    @classmethod
+    def remove_product(cls, product_id: int) -> None:
+        """
+        Удаляет товар из префиксного дерева.
+        """
+        with cls._lock:
+            if cls._changed_during_build is not None:
+                cls._changed_during_build.add(product_id)
+            if cls._trie is not None:
+                cls._trie.remove(product_id)
+        cls.publish_change(product_id)
+
+    @classmethod
+    def get_generation(cls) -> Optional[int]:
+        """
+        Возвращает номер поколения дерева из кеша или None, если кеш отключён или недоступен.
+        """
+        if not settings.CACHE_ENABLED:
+            return None
+        try:
+            generation = cache.get(cls.GENERATION_KEY)
+            if generation is None:
+                cache.add(cls.GENERATION_KEY, time.time_ns(), None)
+                generation = cache.get(cls.GENERATION_KEY)
+        except Exception as error:
+            logger.warning(f'Кеш подсказок товаров недоступен: {error}')
+            return None
+        return generation
+
+    @classmethod
+    def publish_change(cls, product_id: int) -> None:
+        """
+        Сообщает другим процессам об изменении товара: увеличивает номер поколения дерева
+        и сохраняет в кеше идентификатор товара под новым номером.
+        """
+        if not settings.CACHE_ENABLED:
+            return
+        try:
+            generation = cache.incr(cls.GENERATION_KEY)
+            cache.set(
+                cls.CHANGE_KEY.format(generation=generation), product_id,
+                settings.PRODUCT_AUTOCOMPLETE_CHANGE_TIMEOUT
+            )
+        except ValueError:
+            # Номера поколения нет в кеше: новый номер заставит все процессы построить дерево заново
+            cls.get_generation()
+            return
+        except Exception as error:
+            logger.warning(f'Не удалось сообщить об изменении подсказок товаров: {error}')
+            return
+        with cls._lock:
+            if cls._generation == generation - 1:
+                cls._generation = generation
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Удаляет префиксное дерево, при следующем обращении оно будет построено заново.
+        """
+        with cls._lock:
+            cls._trie = None
+            cls._generation = None
+            cls._trigram_available = None
+            cls._trigram_checked_at = 0.0
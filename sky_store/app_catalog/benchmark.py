@@ -0,0 +1,234 @@
+import logging
+import random
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from app_newsletter.benchmark import percentile
+from app_user.models import CustomUser
+from pagination.keyset import KeysetPaginator
+from .autocomplete import ProductAutocomplete
+from .models import Category, Product
+from .search import ProductSearch
+
+logger = logging.getLogger(__name__)
+
+ADJECTIVES = [
+    'удобный', 'мощный', 'быстрый', 'надёжный', 'простой', 'умный', 'компактный', 'лёгкий',
+    'беспроводной', 'портативный', 'облачный', 'безопасный', 'гибкий', 'современный', 'профессиональный',
+]
+NOUNS = [
+    'сервис', 'бот', 'генератор', 'конструктор', 'микросервис', 'менеджер', 'планировщик', 'анализатор',
+    'редактор', 'конвертер', 'мессенджер', 'трекер', 'калькулятор', 'архиватор', 'сканер', 'парсер',
+    'шаблонизатор', 'агрегатор', 'маршрутизатор', 'кошелёк',
+]
+TOPICS = [
+    'рассылок', 'паролей', 'изображений', 'задач', 'отчётов', 'заказов', 'платежей', 'документов',
+    'видео', 'музыки', 'новостей', 'контактов', 'файлов', 'счетов', 'расходов', 'сайтов',
+]
+FEATURES = [
+    'неограниченная лицензия', 'поддержка', 'установка на сервер', 'получение обновлений',
+    'совместимость с мобильными устройствами', 'интеграция с телеграмом', 'резервное копирование',
+    'шифрование данных', 'экспорт в таблицы', 'тёмная тема', 'офлайн режим', 'многопользовательский доступ',
+    'настраиваемые уведомления', 'подробная статистика', 'открытый интерфейс программирования',
+]
+
+
+class ProductSearchBenchmark:
+    """
+    Класс, описывающий нагрузочное тестирование поиска товаров.
+
+    Создаёт синтетический каталог из products товаров, выполняет поисковые запросы
+    так же, как ProductSearchView (первая и следующая страницы keyset-пагинации,
+    с фильтром по категории и без него), и замеряет время выполнения запросов.
+    Для сравнения замеряется поиск через ILIKE по названию и описанию.
+    Также замеряется время формирования подсказок по началу названия (с опечатками и без них).
+    Все созданные данные удаляются откатом транзакции.
+    """
+
+    def __init__(self, products: int, queries: int, page_size: int = 20, categories: int = 20,
+                 category_share: float = 0.5, baseline_queries: int = 10, seed: Optional[int] = None,
+                 batch_size: int = 5000) -> None:
+        """
+        :param products: Количество товаров каталога.
+        :param queries: Количество поисковых запросов.
+        :param page_size: Количество товаров на странице.
+        :param categories: Количество категорий.
+        :param category_share: Доля запросов с фильтром по категории.
+        :param baseline_queries: Количество запросов через ILIKE (0 - не замерять).
+        :param seed: Начальное значение генератора случайных чисел.
+        :param batch_size: Количество товаров, создаваемых одним запросом.
+        """
+        self.products = products
+        self.queries = queries
+        self.page_size = page_size
+        self.categories = categories
+        self.category_share = category_share
+        self.baseline_queries = baseline_queries
+        self.seed = seed
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {
+            'products': self.products,
+            'queries': self.queries,
+            'page_size': self.page_size,
+            'categories': self.categories,
+            'category_share': self.category_share,
+            'baseline_queries': self.baseline_queries,
+            'seed': self.seed,
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Выполняет нагрузочное тестирование и возвращает результаты.
+        """
+        with transaction.atomic():
+            started_at = time.perf_counter()
+            category_ids = self.seed_catalog()
+            seed_duration = time.perf_counter() - started_at
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE product')
+            started_at = time.perf_counter()
+            autocomplete_backend = self.prepare_autocomplete()
+            autocomplete_build_duration = time.perf_counter() - started_at
+            result = self.measure(category_ids)
+            transaction.set_rollback(True)
+        ProductAutocomplete.reset()
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'params': self.params,
+            'seed_s': round(seed_duration, 2),
+            'autocomplete_backend': autocomplete_backend,
+            'autocomplete_build_s': round(autocomplete_build_duration, 2),
+            **result,
+        }
+
+    def seed_catalog(self) -> List[int]:
+        """
+        Создаёт категории и опубликованные товары со случайными названиями и описаниями.
+        :return: Идентификаторы созданных категорий.
+        """
+        prefix = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create(email=f'bench-{prefix}@example.com')
+        categories = Category.objects.bulk_create(
+            [Category(name=f'Bench {prefix} {index}') for index in range(self.categories)]
+        )
+        category_ids = [category.pk for category in categories]
+
+        created = 0
+        while created < self.products:
+            count = min(self.batch_size, self.products - created)
+            Product.objects.bulk_create([self.make_product(category_ids, user) for _ in range(count)])
+            created += count
+            logger.info(f'Создано товаров: {created}')
+        return category_ids
+
+    def make_product(self, category_ids: List[int], user: CustomUser) -> Product:
+        choice = self.random.choice
+        features = self.random.sample(FEATURES, k=self.random.randint(2, 6))
+        return Product(
+            name=f'{choice(ADJECTIVES).capitalize()} {choice(NOUNS)} {choice(TOPICS)} {self.random.randint(1, 999)}',
+            description='- ' + '\n- '.join(features),
+            category_id=choice(category_ids),
+            price=self.random.randint(10, 5000),
+            created_by=user,
+            is_published=self.random.random() < 0.9,
+        )
+
+    @staticmethod
+    def prepare_autocomplete() -> str:
+        """
+        Подготавливает подсказки: без триграммного индекса строит префиксное дерево созданного каталога.
+        :return: Способ формирования подсказок.
+        """
+        ProductAutocomplete.reset()
+        if ProductAutocomplete.is_trigram_available():
+            return 'trigram'
+        ProductAutocomplete.get_trie()
+        return 'trie'
+
+    def make_autocomplete_query(self) -> str:
+        """
+        Возвращает начало одного из слов названия, в половине случаев - с опечаткой.
+        """
+        word = self.random.choice(NOUNS + TOPICS + ADJECTIVES)
+        text = word[:self.random.randint(min(3, len(word)), len(word))]
+        if len(text) >= 4 and self.random.random() < 0.5:
+            index = self.random.randrange(1, len(text))
+            text = text[:index] + self.random.choice('аеиоуя') + text[index + 1:]
+        return text
+
+    def make_query(self) -> str:
+        words = [self.random.choice(NOUNS), self.random.choice(TOPICS + ADJECTIVES + FEATURES)]
+        return ' '.join(words[:self.random.randint(1, 2)])
+
+    def measure(self, category_ids: List[int]) -> Dict[str, Any]:
+        """
+        Выполняет поисковые запросы и замеряет время их выполнения.
+        """
+        timings = {'first_page': [], 'next_page': [], 'baseline_ilike': [], 'autocomplete': []}
+        results = []
+
+        for index in range(self.queries):
+            text = self.make_query()
+            category_id = self.random.choice(category_ids) if self.random.random() < self.category_share else None
+            queryset = (
+                Product.get_published_products_by_category(category_id=category_id) if category_id
+                else Product.get_all_published_products()
+            )
+            paginator = KeysetPaginator(
+                queryset=ProductSearch.search(text=text, queryset=queryset),
+                per_page=self.page_size,
+                ordering=('-rank', 'id')
+            )
+            page = self.timed(timings['first_page'], lambda: paginator.page(None))
+            results.append(len(page))
+            if page.next_cursor:
+                self.timed(timings['next_page'], lambda: paginator.page(page.next_cursor))
+
+            if index < self.baseline_queries:
+                self.timed(timings['baseline_ilike'], lambda: self.baseline_search(text, queryset))
+
+            prefix = self.make_autocomplete_query()
+            self.timed(timings['autocomplete'], lambda: ProductAutocomplete.complete(prefix))
+
+        return {
+            'avg_results_per_page': round(sum(results) / len(results), 2) if results else None,
+            'latency_ms': {name: self.summary(values) for name, values in timings.items()},
+        }
+
+    def baseline_search(self, text: str, queryset: QuerySet) -> List[Product]:
+        """
+        Поиск через ILIKE по названию и описанию (как в административной панели).
+        """
+        condition = Q()
+        for term in ProductSearch.get_terms(text):
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        return list(queryset.filter(condition).order_by('name', 'id')[:self.page_size])
+
+    @staticmethod
+    def timed(timings: List[float], function: Callable) -> Any:
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+        return result
+
+    @staticmethod
+    def summary(values: List[float]) -> Dict[str, Any]:
+        values = sorted(values)
+        return {
+            'count': len(values),
+            **{
+                name: round(percentile(values, percent) * 1000, 3)
+                for name, percent in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+            },
+        }
@@ -0,0 +1,230 @@
+import bisect
+import logging
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import Product, ProductFacet
+from .services import get_all_categories
+
+logger = logging.getLogger(__name__)
+
+CategoryFacet = namedtuple('CategoryFacet', ['id', 'name', 'count'])
+PriceFacet = namedtuple('PriceFacet', ['bucket', 'price_min', 'price_max', 'count'])
+ProductFacets = namedtuple('ProductFacets', ['categories', 'prices', 'total'])
+
+FacetState = Tuple[int, int]
+
+
+class ProductFacetService:
+    """
+    Класс, описывающий фасетную навигацию каталога: количество опубликованных товаров
+    по категориям и по ценовым диапазонам (границы диапазонов - CATALOG_PRICE_BUCKETS).
+
+    Количество товаров хранится в сводной таблице ProductFacet (категория x ценовой диапазон),
+    которая изменяется на ±1 при сохранении и удалении товара, а не пересчитывается GROUP BY
+    по таблице товаров. Количество по категориям учитывает выбранный диапазон цен,
+    количество по ценовым диапазонам - выбранную категорию. Если границы фильтра по цене
+    не совпадают с границами диапазонов, количество по категориям подсчитывается по таблице товаров.
+    Результаты кешируются для каждого сочетания фильтров; ключ содержит номер поколения,
+    который увеличивается при любом изменении сводной таблицы.
+    """
+    GENERATION_KEY = 'catalog:facets:generation'
+    DATA_KEY = 'catalog:facets:{generation}:{category_id}:{price_min}:{price_max}'
+
+    @staticmethod
+    def get_buckets() -> List[int]:
+        return settings.CATALOG_PRICE_BUCKETS
+
+    @classmethod
+    def get_price_bucket(cls, price) -> int:
+        """
+        Возвращает номер ценового диапазона, в который попадает цена.
+        """
+        return max(bisect.bisect_right(cls.get_buckets(), price) - 1, 0)
+
+    @classmethod
+    def get_bucket_expression(cls) -> Case:
+        """
+        Возвращает выражение, вычисляющее номер ценового диапазона товара в запросе.
+        """
+        buckets = cls.get_buckets()
+        return Case(
+            *[When(price__gte=price, then=Value(bucket)) for bucket, price in reversed(list(enumerate(buckets)))],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+
+    @classmethod
+    def get_state(cls, product: Product) -> Optional[FacetState]:
+        """
+        Возвращает категорию и ценовой диапазон товара, если товар опубликован.
+        """
+        if not product.is_published or product.price is None:
+            return None
+        return product.category_id, cls.get_price_bucket(product.price)
+
+    @classmethod
+    def get_saved_state(cls, product_id: Optional[int]) -> Optional[FacetState]:
+        """
+        Возвращает категорию и ценовой диапазон товара, сохранённые в базе данных.
+        """
+        if product_id is None:
+            return None
+        row = Product.objects.filter(pk=product_id).values_list('is_published', 'category_id', 'price').first()
+        if row is None or not row[0]:
+            return None
+        return row[1], cls.get_price_bucket(row[2])
+
+    @classmethod
+    def apply_change(cls, before: Optional[FacetState], after: Optional[FacetState]) -> None:
+        """
+        Изменяет сводную таблицу при изменении товара.
+
+        :param before: Категория и ценовой диапазон товара до изменения (None - товар не был опубликован).
+        :param after: Категория и ценовой диапазон товара после изменения (None - товар не опубликован).
+        """
+        if before == after:
+            return
+        if before is not None:
+            cls.add(*before, delta=-1)
+        if after is not None:
+            cls.add(*after, delta=1)
+        transaction.on_commit(cls.invalidate)
+
+    @staticmethod
+    def add(category_id: int, price_bucket: int, delta: int) -> None:
+        facets = ProductFacet.objects.filter(category_id=category_id, price_bucket=price_bucket)
+        if facets.update(count=F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                ProductFacet.objects.create(category_id=category_id, price_bucket=price_bucket, count=delta)
+        except IntegrityError:
+            facets.update(count=F('count') + delta)
+
+    @classmethod
+    def rebuild(cls, product_model=Product, facet_model=ProductFacet) -> int:
+        """
+        Пересчитывает сводную таблицу по таблице товаров.
+
+        :param product_model: Модель товара (в миграциях - историческая).
+        :param facet_model: Модель сводной таблицы (в миграциях - историческая).
+        :return: Количество строк сводной таблицы.
+        """
+        rows = product_model.objects.filter(is_published=True).annotate(
+            price_bucket=cls.get_bucket_expression()
+        ).values('category_id', 'price_bucket').annotate(count=Count('id')).order_by()
+        with transaction.atomic():
+            facet_model.objects.all().delete()
+            facets = facet_model.objects.bulk_create([facet_model(**row) for row in rows])
+            transaction.on_commit(cls.invalidate)
+        return len(facets)
+
+    @classmethod
+    def get_facets(cls, category_id: Optional[int] = None, price_min: Optional[Decimal] = None,
+                   price_max: Optional[Decimal] = None) -> ProductFacets:
+        """
+        Возвращает количество опубликованных товаров по категориям и ценовым диапазонам.
+
+        :param category_id: Выбранная категория.
+        :param price_min: Минимальная цена (включительно).
+        :param price_max: Максимальная цена (не включительно).
+        :return: Количество товаров по категориям, по ценовым диапазонам
+        и общее количество товаров, соответствующих фильтрам.
+        """
+        if not settings.CACHE_ENABLED:
+            return cls.compute_facets(category_id, price_min, price_max)
+        try:
+            key = cls.DATA_KEY.format(
+                generation=cls._get_generation(), category_id=category_id, price_min=price_min, price_max=price_max
+            )
+            facets = cache.get(key)
+        except Exception as error:
+            logger.warning(f'Кеш фасетов каталога недоступен: {error}')
+            return cls.compute_facets(category_id, price_min, price_max)
+
+        if facets is None:
+            facets = cls.compute_facets(category_id, price_min, price_max)
+            try:
+                cache.set(key, facets, settings.CATALOG_FACETS_CACHE_TIMEOUT)
+            except Exception as error:
+                logger.warning(f'Не удалось сохранить фасеты каталога в кеш: {error}')
+        return facets
+
+    @classmethod
+    def compute_facets(cls, category_id: Optional[int], price_min: Optional[Decimal],
+                       price_max: Optional[Decimal]) -> ProductFacets:
+        buckets = cls.get_buckets()
+        rows = list(ProductFacet.objects.values_list('category_id', 'price_bucket', 'count'))
+
+        price_counts = defaultdict(int)
+        for row_category_id, price_bucket, count in rows:
+            if category_id is None or row_category_id == category_id:
+                price_counts[price_bucket] += count
+        prices = [
+            PriceFacet(bucket, price, buckets[bucket + 1] if bucket + 1 < len(buckets) else None, price_counts[bucket])
+            for bucket, price in enumerate(buckets)
+        ]
+
+        category_counts = defaultdict(int)
+        selected_buckets = cls.get_bucket_range(price_min, price_max)
+        if selected_buckets is not None:
+            for row_category_id, price_bucket, count in rows:
+                if price_bucket in selected_buckets:
+                    category_counts[row_category_id] += count
+        else:
+            products = Product.get_all_published_products()
+            if price_min is not None:
+                products = products.filter(price__gte=price_min)
+            if price_max is not None:
+                products = products.filter(price__lt=price_max)
+            category_counts.update(products.values_list('category_id').annotate(count=Count('id')).order_by())
+        categories = [CategoryFacet(category.id, category.name, category_counts[category.id])
+                      for category in get_all_categories()]
+
+        total = category_counts[category_id] if category_id is not None else sum(category_counts.values())
+        return ProductFacets(categories=categories, prices=prices, total=total)
+
+    @classmethod
+    def get_bucket_range(cls, price_min: Optional[Decimal], price_max: Optional[Decimal]) -> Optional[range]:
+        """
+        Возвращает номера ценовых диапазонов, из которых состоит фильтр по цене,
+        или None, если границы фильтра не совпадают с границами диапазонов.
+        """
+        buckets = cls.get_buckets()
+        if price_min is not None and price_min not in buckets:
+            return None
+        if price_max is not None and price_max not in buckets[1:]:
+            return None
+        start = buckets.index(price_min) if price_min is not None else 0
+        stop = buckets.index(price_max) if price_max is not None else len(buckets)
+        return range(start, stop)
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Делает недействительными закешированные фасеты, увеличивая номер поколения.
+        """
+        if not settings.CACHE_ENABLED:
+            return
+        try:
+            cache.incr(cls.GENERATION_KEY)
+        except ValueError:
+            cls._get_generation()
+        except Exception as error:
+            logger.warning(f'Не удалось сбросить кеш фасетов каталога: {error}')
+
+    @classmethod
+    def _get_generation(cls) -> int:
+        generation = cache.get(cls.GENERATION_KEY)
+        if generation is None:
+            cache.add(cls.GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(cls.GENERATION_KEY)
+        return generation
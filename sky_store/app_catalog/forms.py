@@ -1,3 +1,5 @@
+from typing import List
+
 from django import forms
 from django.core.validators import RegexValidator
 from django.forms import inlineformset_factory, BaseInlineFormSet
@@ -143,6 +145,22 @@ class VersionFormSet(BaseInlineFormSet):
                 'Может быть только одна активная версия продукта. Пожалуйста, выберите только одну активную версию.'
             )
 
+    def save(self, commit: bool = True) -> List[Version]:
+        """
+        Сохраняет версии продукта.
+        Версии, с которых снят флаг активности, сохраняются раньше новой активной версии,
+        чтобы не нарушить ограничение уникальности активной версии в базе данных.
+        """
+        if not commit:
+            return super().save(commit=False)
+
+        versions = super().save(commit=False)
+        for version in self.deleted_objects:
+            version.delete()
+        for version in sorted(versions, key=lambda item: item.is_current_version):
+            version.save()
+        return versions
+
 
 ProductVersionFormSet = inlineformset_factory(
     parent_model=Product,
@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+
+from django.core.management import BaseCommand, CommandError
+
+from app_catalog.benchmark import ProductSearchBenchmark
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного тестирования поиска товаров.
+
+    Создаёт синтетический каталог с заданным количеством товаров, выполняет поисковые запросы
+    и сохраняет перцентили времени выполнения запросов (первая и следующая страницы результатов,
+    поиск через ILIKE для сравнения, подсказки) в JSON-файл. Созданные данные удаляются после завершения.
+    """
+    help = 'Benchmark full-text product search on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000, help='Number of products')
+        parser.add_argument('--queries', type=int, default=200, help='Number of search queries')
+        parser.add_argument('--page-size', type=int, default=20, help='Products per page')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories')
+        parser.add_argument(
+            '--category-share', type=float, default=0.5, help='Share of queries filtered by category'
+        )
+        parser.add_argument(
+            '--baseline-queries', type=int, default=10, help='Number of ILIKE queries for comparison'
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+        parser.add_argument('--output', default=None, help='Path of the JSON result file')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['queries'] < 1 or options['page_size'] < 1 or options['categories'] < 1:
+            raise CommandError('--products, --queries, --page-size and --categories must be positive')
+        if not 0 <= options['category_share'] <= 1:
+            raise CommandError('--category-share must be between 0 and 1')
+
+        benchmark = ProductSearchBenchmark(
+            products=options['products'],
+            queries=options['queries'],
+            page_size=options['page_size'],
+            categories=options['categories'],
+            category_share=options['category_share'],
+            baseline_queries=options['baseline_queries'],
+            seed=options['seed']
+        )
+        result = benchmark.run()
+
+        output = options['output'] or f'bench_product_search_{datetime.now():%Y%m%d_%H%M%S}.json'
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+        for name, latency in result['latency_ms'].items():
+            self.stdout.write(
+                f"{name}: {latency['count']} queries, p50 {latency['p50']} ms, "
+                f"p95 {latency['p95']} ms, p99 {latency['p99']} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Results were written to {output}.'))
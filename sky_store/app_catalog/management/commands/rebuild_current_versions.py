@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from app_catalog.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчёта указателей на активные версии товаров.
+
+    Заполняет поле current_version каждого товара по флагу is_current_version его версий.
+    Используется, если версии изменялись в обход формы редактирования товара
+    (например, через административную панель или загрузку фикстур).
+    """
+    help = 'Rebuild current version pointers of products'
+
+    def handle(self, *args, **options):
+        updated = Product.rebuild_current_versions()
+        self.stdout.write(self.style.SUCCESS(f'Current versions were rebuilt for {updated} products.'))
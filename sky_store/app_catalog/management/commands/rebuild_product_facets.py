@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from app_catalog.facets import ProductFacetService
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчёта количества товаров в фасетах каталога.
+
+    Заполняет сводную таблицу ProductFacet по таблице товаров. Используется после изменения
+    границ ценовых диапазонов (CATALOG_PRICE_BUCKETS) или изменения товаров в обход модели
+    (например, QuerySet.update() или прямые SQL-запросы).
+    """
+    help = 'Rebuild product counts by category and price bucket'
+
+    def handle(self, *args, **options):
+        facets = ProductFacetService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Product facets were rebuilt: {facets} rows.'))
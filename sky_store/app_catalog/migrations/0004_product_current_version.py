@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_current_version(apps, schema_editor):
+    """
+    Оставляет у каждого товара не более одной активной версии (последнюю созданную)
+    и заполняет указатель current_version.
+    """
+    Product = apps.get_model('app_catalog', 'Product')
+    Version = apps.get_model('app_catalog', 'Version')
+
+    current_version_ids = {}
+    for version_id, product_id in Version.objects.filter(
+            is_current_version=True
+    ).order_by('product_id', '-pk').values_list('pk', 'product_id'):
+        current_version_ids.setdefault(product_id, version_id)
+
+    Version.objects.filter(is_current_version=True).exclude(
+        pk__in=current_version_ids.values()
+    ).update(is_current_version=False)
+
+    active_version = Version.objects.filter(
+        product=models.OuterRef('pk'), is_current_version=True
+    ).values('pk')[:1]
+    Product.objects.update(current_version=models.Subquery(active_version))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_catalog', '0003_product_is_published'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='current_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_catalog.version', verbose_name='Активная версия'),
+        ),
+        migrations.RunPython(fill_current_version, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='version',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_current_version', True)), fields=('product',), name='unique_current_version_per_product'),
+        ),
+    ]
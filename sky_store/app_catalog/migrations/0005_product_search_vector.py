@@ -0,0 +1,90 @@
+# Generated by Django 4.2 on 2026-10-18 10:41
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# SQL на момент создания миграции (см. app_catalog.search): миграция не должна зависеть от кода приложения.
+POSTGRESQL_INSTALL_SQL = """
+CREATE OR REPLACE FUNCTION product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS product_search_vector_trigger ON product;
+CREATE TRIGGER product_search_vector_trigger BEFORE INSERT OR UPDATE OF name, description ON product
+    FOR EACH ROW EXECUTE FUNCTION product_search_vector_update();
+UPDATE product SET search_vector =
+    setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'B');
+CREATE INDEX IF NOT EXISTS product_search_vector_idx ON product USING gin (search_vector);
+"""
+
+POSTGRESQL_UNINSTALL_SQL = """
+DROP INDEX IF EXISTS product_search_vector_idx;
+DROP TRIGGER IF EXISTS product_search_vector_trigger ON product;
+DROP FUNCTION IF EXISTS product_search_vector_update();
+"""
+
+SQLITE_INSTALL_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+    "name, description, content='product', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts (product_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name, description ON product BEGIN "
+    "INSERT INTO product_fts (product_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO product_fts (product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL_SQL = [
+    'DROP TRIGGER IF EXISTS product_fts_insert',
+    'DROP TRIGGER IF EXISTS product_fts_delete',
+    'DROP TRIGGER IF EXISTS product_fts_update',
+    'DROP TABLE IF EXISTS product_fts',
+]
+
+
+
+def execute(schema_editor, postgresql_sql, sqlite_sql):
+    db = schema_editor.connection
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute(postgresql_sql)
+        elif db.vendor == 'sqlite':
+            for sql in sqlite_sql:
+                cursor.execute(sql)
+
+
+def install_search_index(apps, schema_editor):
+    """
+    Создаёт поисковый индекс товаров: в PostgreSQL - триггер, заполняющий search_vector, и GIN-индекс,
+    в SQLite - виртуальную таблицу FTS5 с триггерами.
+    """
+    execute(schema_editor, POSTGRESQL_INSTALL_SQL, SQLITE_INSTALL_SQL)
+
+
+def uninstall_search_index(apps, schema_editor):
+    execute(schema_editor, POSTGRESQL_UNINSTALL_SQL, SQLITE_UNINSTALL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_catalog', '0004_product_current_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
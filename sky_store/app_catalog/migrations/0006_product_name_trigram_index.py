@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 14:05
+
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def install_trigram_index(apps, schema_editor):
+    """
+    Создаёт в PostgreSQL расширение pg_trgm и триграммный GIN-индекс по названию товара.
+    Если расширение не установлено на сервере PostgreSQL, индекс не создаётся.
+    """
+    db = schema_editor.connection
+    if db.vendor != 'postgresql':
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            logger.warning('Расширение pg_trgm недоступно, подсказки товаров будут формироваться без индекса')
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute('CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON product USING gin (name gin_trgm_ops)')
+
+
+def uninstall_trigram_index(apps, schema_editor):
+    db = schema_editor.connection
+    if db.vendor == 'postgresql':
+        with db.cursor() as cursor:
+            cursor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_catalog', '0005_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_trigram_index, uninstall_trigram_index),
+    ]
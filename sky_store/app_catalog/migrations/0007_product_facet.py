@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 11:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+import django.db.models.deletion
+
+
+def fill_product_facets(apps, schema_editor):
+    """
+    Заполняет сводную таблицу количества товаров по категориям и ценовым диапазонам
+    (границы диапазонов - CATALOG_PRICE_BUCKETS).
+    """
+    Product = apps.get_model('app_catalog', 'Product')
+    ProductFacet = apps.get_model('app_catalog', 'ProductFacet')
+
+    buckets = settings.CATALOG_PRICE_BUCKETS
+    price_bucket = Case(
+        *[When(price__gte=price, then=Value(bucket)) for bucket, price in reversed(list(enumerate(buckets)))],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    rows = Product.objects.filter(is_published=True).annotate(
+        price_bucket=price_bucket
+    ).values('category_id', 'price_bucket').annotate(count=Count('id')).order_by()
+    ProductFacet.objects.bulk_create([ProductFacet(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_catalog', '0006_product_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField(verbose_name='Ценовой диапазон')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество товаров')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_catalog.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Количество товаров',
+                'verbose_name_plural': 'Количество товаров',
+                'db_table': 'product_facet',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productfacet',
+            constraint=models.UniqueConstraint(fields=('category', 'price_bucket'), name='unique_product_facet'),
+        ),
+        migrations.RunPython(fill_product_facets, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
-from typing import Union, Optional
+from typing import Iterable, Union, Optional
 
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -62,6 +63,30 @@ class Category(models.Model):
         return cls.objects.get(id=category_id)
 
 
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet товаров с дополнительными методами выборки
+    """
+
+    def with_active_version(self) -> 'ProductQuerySet':
+        """
+        Подгружает активные версии всех товаров выборки одним запросом
+        по первичным ключам из указателя current_version.
+
+        :return: QuerySet c предзагруженными активными версиями
+        """
+        return self.prefetch_related('current_version')
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """
+    Менеджер товаров. Поисковый вектор не загружается вместе с товарами.
+    """
+
+    def get_queryset(self) -> ProductQuerySet:
+        return super().get_queryset().defer('search_vector')
+
+
 class Product(models.Model):
     """
     Модель, описывающая товар
@@ -82,6 +107,16 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name='Кем создан', default=1)
     is_published = models.BooleanField(verbose_name='Опубликован', default=False)
+    current_version = models.ForeignKey(
+        'Version',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Активная версия',
+        **NULLABLE
+    )
+    search_vector = SearchVectorField(verbose_name='Поисковый вектор', editable=False, **NULLABLE)
+
+    objects = ProductManager()
 
     class Meta:
         db_table = 'product'
@@ -152,7 +187,29 @@ class Product(models.Model):
         Возвращает активную версию товара, если она существует.
         Если активная версия не найдена, возвращает None
         """
-        return self.version.filter(is_current_version=True).first()
+        return self.current_version
+
+    def refresh_current_version(self) -> None:
+        """
+        Обновляет указатель на активную версию товара
+        по флагу is_current_version его версий.
+        """
+        self.current_version = self.version.filter(is_current_version=True).first()
+        Product.objects.filter(pk=self.pk).update(current_version=self.current_version)
+
+    @classmethod
+    def rebuild_current_versions(cls, product_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Пересчитывает указатели на активные версии товаров одним запросом.
+
+        :param product_ids: Идентификаторы товаров (по умолчанию - все товары)
+        :return: Количество обновлённых товаров
+        """
+        active_version = Version.objects.filter(
+            product=models.OuterRef('pk'), is_current_version=True
+        ).values('pk')[:1]
+        products = cls.objects.all() if product_ids is None else cls.objects.filter(pk__in=product_ids)
+        return products.update(current_version=models.Subquery(active_version))
 
     @classmethod
     def get_published_products_by_category(cls, category_id: int) -> models.QuerySet:
@@ -191,6 +248,28 @@ class Product(models.Model):
         return cls.objects.filter(is_published=False)
 
 
+class ProductFacet(models.Model):
+    """
+    Модель, описывающая количество опубликованных товаров категории в ценовом диапазоне.
+    Сводная таблица для фасетной навигации каталога, изменяется при публикации, снятии
+    с публикации, удалении товара, изменении его категории или цены.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name='Категория')
+    price_bucket = models.PositiveSmallIntegerField(verbose_name='Ценовой диапазон')
+    count = models.IntegerField(default=0, verbose_name='Количество товаров')
+
+    class Meta:
+        db_table = 'product_facet'
+        verbose_name = 'Количество товаров'
+        verbose_name_plural = 'Количество товаров'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'price_bucket'], name='unique_product_facet')
+        ]
+
+    def __str__(self):
+        return f'{self.category_id}: {self.price_bucket} - {self.count}'
+
+
 class Version(models.Model):
     """
     Модель, описывающая версию товара.
@@ -204,6 +283,13 @@ class Version(models.Model):
         verbose_name = 'Версия'
         verbose_name_plural = 'Версии'
         db_table = 'versions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(is_current_version=True),
+                name='unique_current_version_per_product'
+            )
+        ]
 
     def __str__(self):
         return f"{self.version_number}: {self.version_name}"
@@ -0,0 +1,158 @@
+import logging
+import re
+from typing import List, Optional
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, QuerySet, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'\w+')
+
+POSTGRESQL_INSTALL_SQL = """
+CREATE OR REPLACE FUNCTION product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{config}', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('{config}', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS product_search_vector_trigger ON product;
+CREATE TRIGGER product_search_vector_trigger BEFORE INSERT OR UPDATE OF name, description ON product
+    FOR EACH ROW EXECUTE FUNCTION product_search_vector_update();
+UPDATE product SET search_vector =
+    setweight(to_tsvector('{config}', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('{config}', coalesce(description, '')), 'B');
+CREATE INDEX IF NOT EXISTS product_search_vector_idx ON product USING gin (search_vector);
+"""
+
+POSTGRESQL_UNINSTALL_SQL = """
+DROP INDEX IF EXISTS product_search_vector_idx;
+DROP TRIGGER IF EXISTS product_search_vector_trigger ON product;
+DROP FUNCTION IF EXISTS product_search_vector_update();
+"""
+
+SQLITE_INSTALL_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+    "name, description, content='product', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts (product_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name, description ON product BEGIN "
+    "INSERT INTO product_fts (product_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO product_fts (product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL_SQL = [
+    'DROP TRIGGER IF EXISTS product_fts_insert',
+    'DROP TRIGGER IF EXISTS product_fts_delete',
+    'DROP TRIGGER IF EXISTS product_fts_update',
+    'DROP TABLE IF EXISTS product_fts',
+]
+
+
+class ProductSearch:
+    """
+    Класс, описывающий полнотекстовый поиск товаров по названию и описанию.
+
+    В PostgreSQL поисковый вектор хранится в поле Product.search_vector (русская конфигурация,
+    название с весом A, описание - с весом B), заполняется триггером и индексируется GIN-индексом.
+    В SQLite используется виртуальная таблица FTS5 product_fts, синхронизируемая триггерами;
+    русские словоформы в ней не нормализуются, поэтому слова запроса ищутся по префиксу
+    без окончания (SQLITE_ENDING_LENGTH последних символов слов не короче SQLITE_MIN_STEM_LENGTH + 2).
+    Релевантность (rank) в обоих случаях тем больше, чем лучше товар соответствует запросу.
+    """
+    CONFIG = 'russian'
+    SQLITE_WEIGHTS = (10.0, 1.0)
+    SQLITE_ENDING_LENGTH = 2
+    SQLITE_MIN_STEM_LENGTH = 4
+
+    @staticmethod
+    def is_postgresql() -> bool:
+        return connection.vendor == 'postgresql'
+
+    @classmethod
+    def install(cls, schema_editor=None) -> None:
+        """
+        Создаёт (или пересоздаёт) поисковый индекс и триггеры, поддерживающие его в актуальном состоянии,
+        и заполняет индекс по существующим товарам. Повторный вызов безопасен.
+        """
+        db = schema_editor.connection if schema_editor else connection
+        with db.cursor() as cursor:
+            if db.vendor == 'postgresql':
+                cursor.execute(POSTGRESQL_INSTALL_SQL.format(config=cls.CONFIG))
+            elif db.vendor == 'sqlite':
+                for sql in SQLITE_INSTALL_SQL:
+                    cursor.execute(sql)
+
+    @classmethod
+    def uninstall(cls, schema_editor=None) -> None:
+        """
+        Удаляет поисковый индекс и триггеры.
+        """
+        db = schema_editor.connection if schema_editor else connection
+        with db.cursor() as cursor:
+            if db.vendor == 'postgresql':
+                cursor.execute(POSTGRESQL_UNINSTALL_SQL)
+            elif db.vendor == 'sqlite':
+                for sql in SQLITE_UNINSTALL_SQL:
+                    cursor.execute(sql)
+
+    @staticmethod
+    def get_terms(text: str) -> List[str]:
+        return WORD.findall(text.lower())
+
+    @classmethod
+    def search(cls, text: str, queryset: Optional[QuerySet] = None) -> QuerySet:
+        """
+        Возвращает товары, соответствующие поисковому запросу, с аннотацией релевантности rank.
+
+        :param text: Поисковый запрос. В PostgreSQL поддерживается синтаксис websearch_to_tsquery
+        (фразы в кавычках, OR, исключение слов через минус).
+        :param queryset: Выборка товаров, в которой выполняется поиск (по умолчанию - все товары).
+        :return: QuerySet товаров с полем rank, без сортировки.
+        """
+        if queryset is None:
+            queryset = Product.objects.all()
+        if not cls.get_terms(text):
+            return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+        if cls.is_postgresql():
+            query = SearchQuery(text, config=cls.CONFIG, search_type='websearch')
+            return queryset.filter(search_vector=query).annotate(
+                rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+            )
+
+        match = cls.get_sqlite_match(text)
+        weights = ', '.join(str(weight) for weight in cls.SQLITE_WEIGHTS)
+        # Таблица product_fts присоединяется к выборке, чтобы bm25 вычислялся один раз для каждого
+        # найденного товара, а не отдельным подзапросом.
+        return queryset.extra(
+            tables=['product_fts'],
+            where=['product_fts.rowid = product.id', 'product_fts MATCH %s'],
+            params=[match]
+        ).annotate(
+            rank=RawSQL(f'-bm25(product_fts, {weights})', [], output_field=FloatField())
+        )
+
+    @classmethod
+    def get_sqlite_match(cls, text: str) -> str:
+        """
+        Формирует выражение FTS5 MATCH: все слова запроса, каждое - по префиксу без окончания.
+        """
+        prefixes = []
+        for term in cls.get_terms(text):
+            if len(term) >= cls.SQLITE_MIN_STEM_LENGTH + cls.SQLITE_ENDING_LENGTH:
+                term = term[:-cls.SQLITE_ENDING_LENGTH]
+            prefixes.append(f'"{term}"*')
+        return ' '.join(prefixes)
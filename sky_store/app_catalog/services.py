@@ -1,8 +1,18 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, List
+
 from django.conf import settings
 from django.core.cache import cache
 
 from .models import Feedback, Category
 
+logger = logging.getLogger(__name__)
+
+CategoryRow = namedtuple('CategoryRow', ['id', 'name'])
+
 
 class FeedbackServices:
     @classmethod
@@ -11,15 +21,158 @@ class FeedbackServices:
         feedback.save()
 
 
-def get_all_categories():
+class CategoryCacheService:
     """
-    Возвращает все категории товаров с использованием кеширования.
+    Класс, описывающий кеш списка категорий товаров.
+
+    В кеше хранятся готовые компактные строки категорий (CategoryRow), а не QuerySet.
+    Ключ данных содержит номер поколения, который увеличивается при изменении
+    или удалении категории, поэтому устаревшие данные никогда не читаются.
+    Если основной кеш (Redis) недоступен, используется LRU-кеш внутри процесса.
+    Если Redis был недоступен при сбросе кеша, номер поколения увеличивается
+    при первом успешном обращении к Redis после восстановления.
     """
-    if settings.CACHE_ENABLED:
-        categories = cache.get('all_categories')
-        if categories is None:
-            categories = Category.get_all_categories()
-            cache.set('all_categories', categories, 60 * 15)
+    GENERATION_KEY = 'catalog:categories:generation'
+    DATA_KEY = 'catalog:categories:{generation}'
+    TIMEOUT = 60 * 15
+    LOCAL_CACHE_SIZE = 4
+
+    _lock = threading.Lock()
+    _local_cache: 'OrderedDict[int, List[CategoryRow]]' = OrderedDict()
+    _local_generation = 0
+    _pending_invalidation = False
+    _counters = {'hits': 0, 'misses': 0, 'rebuilds': 0, 'fallbacks': 0}
+
+    @classmethod
+    def get_categories(cls) -> List[CategoryRow]:
+        """
+        Возвращает список категорий товаров из кеша.
+        При промахе загружает категории из базы данных и сохраняет их в кеш.
+        """
+        if not settings.CACHE_ENABLED:
+            return cls._load_categories()
+
+        try:
+            cls._apply_pending_invalidation()
+            generation = cls._get_generation()
+            key = cls.DATA_KEY.format(generation=generation)
+            categories = cache.get(key)
+            if categories is not None:
+                cls._count('hits')
+                return categories
+
+            cls._count('misses')
+            categories = cls._rebuild()
+            cache.set(key, categories, cls.TIMEOUT)
+            return categories
+        except Exception as error:
+            logger.warning(f'Кеш категорий недоступен, используется локальный кеш: {error}')
+            cls._count('fallbacks')
+            return cls._get_local_categories()
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Делает недействительными закешированные категории, увеличивая номер поколения.
+        """
+        with cls._lock:
+            cls._local_generation += 1
+            cls._local_cache.clear()
+
+        if not settings.CACHE_ENABLED:
+            return
+
+        try:
+            cls._increment_generation()
+        except Exception as error:
+            with cls._lock:
+                cls._pending_invalidation = True
+            logger.warning(f'Не удалось сбросить кеш категорий, сброс будет выполнен позже: {error}')
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """
+        Возвращает счётчики попаданий, промахов, перестроений кеша
+        и обращений к локальному кешу.
+        """
+        with cls._lock:
+            return dict(cls._counters)
+
+    @classmethod
+    def _get_generation(cls) -> int:
+        """
+        Возвращает текущий номер поколения.
+        Если ключ поколения отсутствует (например, после перезапуска Redis),
+        создаёт его из текущего времени, чтобы не совпасть с ранее использованными поколениями.
+        """
+        generation = cache.get(cls.GENERATION_KEY)
+        if generation is None:
+            cache.add(cls.GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(cls.GENERATION_KEY)
+        return generation
+
+    @classmethod
+    def _increment_generation(cls) -> None:
+        try:
+            cache.incr(cls.GENERATION_KEY)
+        except ValueError:
+            cls._get_generation()
+
+    @classmethod
+    def _apply_pending_invalidation(cls) -> None:
+        """
+        Увеличивает номер поколения, если предыдущий сброс кеша не удался из-за недоступности Redis.
+        """
+        with cls._lock:
+            pending, cls._pending_invalidation = cls._pending_invalidation, False
+        if not pending:
+            return
+        try:
+            cls._increment_generation()
+        except Exception:
+            with cls._lock:
+                cls._pending_invalidation = True
+            raise
+
+    @classmethod
+    def _get_local_categories(cls) -> List[CategoryRow]:
+        """
+        Возвращает категории из LRU-кеша внутри процесса.
+        """
+        with cls._lock:
+            generation = cls._local_generation
+            categories = cls._local_cache.get(generation)
+            if categories is not None:
+                cls._local_cache.move_to_end(generation)
+                cls._counters['hits'] += 1
+                return categories
+            cls._counters['misses'] += 1
+
+        categories = cls._rebuild()
+        with cls._lock:
+            cls._local_cache[generation] = categories
+            while len(cls._local_cache) > cls.LOCAL_CACHE_SIZE:
+                cls._local_cache.popitem(last=False)
         return categories
-    else:
-        return Category.get_all_categories()
+
+    @classmethod
+    def _rebuild(cls) -> List[CategoryRow]:
+        cls._count('rebuilds')
+        logger.debug(f'Перестроение кеша категорий: {cls.stats()}')
+        return cls._load_categories()
+
+    @staticmethod
+    def _load_categories() -> List[CategoryRow]:
+        return [CategoryRow(*row) for row in Category.get_all_categories().values_list('id', 'name')]
+
+    @classmethod
+    def _count(cls, counter: str) -> None:
+        with cls._lock:
+            cls._counters[counter] += 1
+
+
+def get_all_categories() -> List[CategoryRow]:
+    """
+    Возвращает все категории товаров с использованием кеширования.
+    """
+    return CategoryCacheService.get_categories()
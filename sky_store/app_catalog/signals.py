@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .autocomplete import ProductAutocomplete
+from .facets import ProductFacetService
+from .models import Category, Product, Version
+from .services import CategoryCacheService
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, **kwargs) -> None:
+    """
+    Сбрасывает кеш категорий после фиксации транзакции, в которой категория создана, изменена или удалена,
+    чтобы кеш не был заполнен заново данными, прочитанными до фиксации.
+    """
+    transaction.on_commit(CategoryCacheService.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Version)
+def refresh_product_current_version(sender, instance: Version, **kwargs) -> None:
+    """
+    Обновляет указатель товара на активную версию после фиксации транзакции,
+    если версия создана, изменена или удалена не через форму редактирования товара
+    (в административной панели или в коде).
+    """
+    product_id = instance.product_id
+    transaction.on_commit(lambda: Product.rebuild_current_versions(product_ids=[product_id]))
+
+
+@receiver(post_save, sender=Product)
+def update_product_autocomplete(sender, instance: Product, **kwargs) -> None:
+    """
+    Обновляет товар в дереве подсказок после фиксации транзакции.
+    """
+    transaction.on_commit(lambda: ProductAutocomplete.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_autocomplete(sender, instance: Product, **kwargs) -> None:
+    """
+    Удаляет товар из дерева подсказок после фиксации транзакции.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: ProductAutocomplete.remove_product(product_id))
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_facet(sender, instance: Product, **kwargs) -> None:
+    """
+    Запоминает категорию и ценовой диапазон товара до сохранения.
+    """
+    instance._saved_facet_state = ProductFacetService.get_saved_state(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_product_facet(sender, instance: Product, **kwargs) -> None:
+    """
+    Изменяет количество товаров в фасетах при публикации, снятии с публикации,
+    изменении категории или цены товара.
+    """
+    ProductFacetService.apply_change(
+        getattr(instance, '_saved_facet_state', None), ProductFacetService.get_state(instance)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facet(sender, instance: Product, **kwargs) -> None:
+    """
+    Уменьшает количество товаров в фасетах при удалении опубликованного товара.
+    """
+    ProductFacetService.apply_change(ProductFacetService.get_state(instance), None)
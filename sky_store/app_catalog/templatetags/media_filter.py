@@ -1,5 +1,6 @@
 from django import template
-from django.conf import settings
+
+from app_media.services import MediaFileService
 
 register = template.Library()
 
@@ -8,7 +9,8 @@ register = template.Library()
 def mediapath(value):
     """
     Шаблонный фильтр, который преобразует переданный путь в полный путь для доступа к медиа файлу.
+    URL содержит хеш содержимого файла, вычисленный при загрузке, если файл уже обработан.
     :param value: относительный путь к медиа файлу
     :return: полный путь к медиа файлу
     """
-    return f"{settings.MEDIA_URL}{value}"
+    return MediaFileService.get_url(str(value))
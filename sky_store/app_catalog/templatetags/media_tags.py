@@ -1,5 +1,6 @@
 from django import template
-from django.conf import settings
+
+from app_media.services import MediaFileService
 
 register = template.Library()
 
@@ -8,5 +9,6 @@ register = template.Library()
 def mediapath(image):
     """
     Функция-шаблонный тег, преобразующий путь к медиа файлу в полный URL для доступа к этому файлу.
+    URL содержит хеш содержимого файла, вычисленный при загрузке, если файл уже обработан.
     """
-    return f"{settings.MEDIA_URL}{image}"
+    return MediaFileService.get_url(str(image))
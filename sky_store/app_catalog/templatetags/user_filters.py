@@ -1,7 +1,7 @@
 from django import template
-from django.contrib.auth.models import Group
 
 from app_user.models import CustomUser
+from permissions import roles
 
 register = template.Library()
 
@@ -10,9 +10,9 @@ register = template.Library()
 def has_group(user: CustomUser, group_name: str) -> bool:
     """
     Проверяет, принадлежит ли пользователь к определенной группе.
+    Использует группы, загруженные один раз за запрос.
 
     :param user: Пользователь, которого нужно проверить.
     :param group_name: Название группы, к которой выполняется проверка.
     """
-    group = Group.objects.get(name=group_name)
-    return group in user.groups.all()
+    return roles.has_group(user, group_name)
@@ -0,0 +1,212 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from app_media.services import MediaFileService
+from app_user.models import CustomUser
+from permissions.roles import MODERATORS_GROUP
+from .autocomplete import ProductAutocomplete
+from .models import Category, Product, Version
+from .services import CategoryCacheService, get_all_categories
+
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_ENABLED=True)
+class ProductListQueriesTestCase(TestCase):
+    """
+    Проверяет, что количество запросов к базе данных при выводе списков товаров
+    не зависит от количества товаров на странице и их версий.
+    Сведения об изображении товаров загружаются в кеш до запроса страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', password='password')
+        cls.moderator = CustomUser.objects.create_user(email='moderator@example.com', password='password')
+        cls.moderator.groups.add(Group.objects.create(name=MODERATORS_GROUP))
+        category = Category.objects.create(name='Категория')
+        for number in range(12):
+            product = Product.objects.create(
+                name=f'Товар {number}', description='Описание', category=category,
+                price=100 * number, created_by=cls.owner, is_published=number < 8
+            )
+            Version.objects.create(product=product, version_number=f'{number}.0', version_name='Первая')
+            Version.objects.create(
+                product=product, version_number=f'{number}.1', version_name='Вторая', is_current_version=True
+            )
+            product.refresh_current_version()
+
+    def setUp(self):
+        cache.clear()
+        MediaFileService.get(Product._meta.get_field('image').default)
+
+    def test_home_page_queries(self):
+        """
+        Главная страница: товары и их активные версии.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('app_catalog:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Активная версия: ', count=4)
+        self.assertNotContains(response, '.0</p>')
+
+    def test_product_list_queries(self):
+        """
+        Список товаров: товары, их активные версии, количество товаров в фасетах и категории.
+        """
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('app_catalog:product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Активная версия: ', count=4)
+        self.assertNotContains(response, '.0</p>')
+
+    def test_user_product_list_queries(self):
+        """
+        Список товаров владельца: сессия, пользователь, его группы, количество товаров,
+        товары и их активные версии.
+        """
+        self.client.force_login(self.owner)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('app_catalog:user_products'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Активная версия: ', count=4)
+        self.assertNotContains(response, '.0</p>')
+
+    def test_unpublished_product_list_queries(self):
+        """
+        Список неопубликованных товаров: сессия, пользователь, его группы, количество товаров,
+        товары и их активные версии.
+        """
+        self.client.force_login(self.moderator)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('app_catalog:unpublished_products'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Активная версия: ', count=4)
+        self.assertNotContains(response, '.0</p>')
+
+
+class ProductCurrentVersionTestCase(TestCase):
+    """
+    Проверяет обновление указателя на активную версию при изменении версий вне формы редактирования товара.
+    """
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+        self.product = Product.objects.create(
+            name='Товар', description='Описание', category=category, price=100, created_by=user
+        )
+
+    def test_current_version_follows_versions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            version = Version.objects.create(
+                product=self.product, version_number='1.0', version_name='Первая', is_current_version=True
+            )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_version, version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version.is_current_version = False
+            version.save()
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.current_version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version = Version.objects.create(
+                product=self.product, version_number='2.0', version_name='Вторая', is_current_version=True
+            )
+            version.delete()
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.current_version)
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_ENABLED=True)
+class CategoryCacheTestCase(TestCase):
+    """
+    Проверяет сброс кеша категорий, в том числе при недоступности Redis.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Категория')
+
+    def test_invalidation_is_applied_after_cache_recovers(self):
+        self.assertEqual([row.name for row in get_all_categories()], ['Категория'])
+
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError('Redis недоступен')):
+            Category.objects.filter(pk=self.category.pk).update(name='Переименованная')
+            CategoryCacheService.invalidate()
+
+        self.assertEqual([row.name for row in get_all_categories()], ['Переименованная'])
+
+    def test_invalidation_waits_for_commit(self):
+        self.assertEqual([row.name for row in get_all_categories()], ['Категория'])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Category.objects.create(name='Новая')
+            # До фиксации транзакции кеш не сбрасывается: иначе другой процесс
+            # закешировал бы под новым поколением категории без новой
+            self.assertEqual([row.name for row in get_all_categories()], ['Категория'])
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertEqual([row.name for row in get_all_categories()], ['Категория', 'Новая'])
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_ENABLED=True)
+class ProductAutocompleteTestCase(TestCase):
+    """
+    Проверяет применение к дереву подсказок изменений товаров, сделанных в других процессах.
+    """
+
+    def setUp(self):
+        cache.clear()
+        ProductAutocomplete.reset()
+        self.addCleanup(ProductAutocomplete.reset)
+        user = CustomUser.objects.create_user(email='owner@example.com', password='password')
+        self.product = Product.objects.create(
+            name='Ноутбук', description='Описание', category=Category.objects.create(name='Категория'),
+            price=100, created_by=user, is_published=True
+        )
+
+    @staticmethod
+    def get_names(text: str) -> list:
+        return [suggestion.name for suggestion in ProductAutocomplete.complete(text)]
+
+    def rename_in_other_process(self, name: str, publish: bool = True) -> None:
+        """
+        Переименовывает товар так, как это делает другой процесс: без изменения дерева этого процесса.
+        """
+        Product.objects.filter(pk=self.product.pk).update(name=name)
+        generation = cache.incr(ProductAutocomplete.GENERATION_KEY)
+        if publish:
+            cache.set(ProductAutocomplete.CHANGE_KEY.format(generation=generation), self.product.pk)
+
+    def test_published_change_is_applied(self):
+        self.assertEqual(self.get_names('ноут'), ['Ноутбук'])
+
+        self.rename_in_other_process('Планшет')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_names('план'), ['Планшет'])
+        self.assertEqual(self.get_names('ноут'), [])
+
+    def test_trie_is_rebuilt_when_change_is_lost(self):
+        self.assertEqual(self.get_names('ноут'), ['Ноутбук'])
+
+        self.rename_in_other_process('Планшет', publish=False)
+        self.assertEqual(self.get_names('план'), ['Планшет'])
+
+    def test_local_change_is_published(self):
+        self.assertEqual(self.get_names('ноут'), ['Ноутбук'])
+        generation = cache.get(ProductAutocomplete.GENERATION_KEY)
+
+        self.product.name = 'Планшет'
+        ProductAutocomplete.update_product(self.product)
+        self.assertEqual(
+            cache.get(ProductAutocomplete.CHANGE_KEY.format(generation=generation + 1)), self.product.pk
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names('план'), ['Планшет'])
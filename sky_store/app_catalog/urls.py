@@ -5,6 +5,8 @@ from .apps import AppConfig
 from .views import (
     HomePageView,
     ProductListView,
+    ProductSearchView,
+    ProductAutocompleteView,
     ProductDetailView,
     ProductCreateView,
     ProductUpdateView,
@@ -20,6 +22,8 @@ app_name = AppConfig.__name__
 urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('products/', ProductListView.as_view(), name='product_list'),
+    path('products/search/', ProductSearchView.as_view(), name='product_search'),
+    path('products/autocomplete/', ProductAutocompleteView.as_view(), name='product_autocomplete'),
     path('user/products/', UserProductListView.as_view(), name='user_products'),
     path('products/unpublished/', UnpublishedProductListView.as_view(), name='unpublished_products'),
     path('product/<int:pk>/', cache_page(60 * 2)(ProductDetailView.as_view()), name='product_detail'),
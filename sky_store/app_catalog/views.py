@@ -1,17 +1,24 @@
-from typing import Dict, Any
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Optional, Sequence
 
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import QuerySet
-from django.http import HttpResponse, HttpRequest, HttpResponseRedirect
+from django.http import HttpResponse, HttpRequest, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy, reverse
 from django.views import View
 from django.views.generic import FormView, TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
 
+from pagination.keyset import KeysetPaginationMixin
 from permissions.authenticate import AuthenticatedAccessMixin
+from permissions.roles import is_moderator
 from permissions.user_permission import CreatorAccessMixin, ModeratorOrCreatorMixin, ModeratorAccessMixin
+from .autocomplete import ProductAutocomplete
+from .facets import ProductFacetService
 from .forms import FeedbackForm, ProductForm, ProductVersionFormSet
 from .models import Product, Category, CompanyContact
+from .search import ProductSearch
 from .services import FeedbackServices, get_all_categories
 
 
@@ -20,23 +27,26 @@ class HomePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['products'] = Product.get_last_products(count=4)
+        context['products'] = Product.get_last_products(count=4).with_active_version()
         return context
 
 
-class ProductListView(ListView):
+class ProductListView(KeysetPaginationMixin, ListView):
     """
     Представление для списка товаров.
-    Настроена пагинация.
+    Настроена keyset-пагинация по названию товара.
     На одной странице отображается 4 товара.
+    Товары фильтруются по категории и по цене (price_min - включительно, price_max - не включительно),
+    для фильтров выводится количество товаров по категориям и ценовым диапазонам.
     """
     context_object_name = 'products'
     paginate_by = 4
+    keyset_ordering = ('name', 'id')
 
     def get_queryset(self) -> QuerySet[Product]:
         """
         Получает и возвращает queryset опубликованных товаров в зависимости
-        от выбранной категории или всех опубликованных товаров.
+        от выбранной категории (или всех опубликованных товаров) и диапазона цен.
         """
         category_id = self.request.GET.get('category', None)
 
@@ -45,12 +55,29 @@ class ProductListView(ListView):
         else:
             queryset = Product.get_all_published_products()
 
-        return queryset
+        price_min, price_max = self.get_price('price_min'), self.get_price('price_max')
+        if price_min is not None:
+            queryset = queryset.filter(price__gte=price_min)
+        if price_max is not None:
+            queryset = queryset.filter(price__lt=price_max)
+
+        return queryset.with_active_version()
+
+    def get_price(self, name: str) -> Optional[Decimal]:
+        """
+        Возвращает границу диапазона цен из параметров запроса или None, если она не указана или некорректна.
+        """
+        try:
+            price = Decimal(self.request.GET.get(name, ''))
+        except InvalidOperation:
+            return None
+        return price if price.is_finite() and price >= 0 else None
 
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         """
         Возвращает контекст данных для шаблона списка товаров,
-        включая категории и текущую выбранную категорию.
+        включая категории, текущую выбранную категорию, диапазон цен
+        и количество товаров по категориям и ценовым диапазонам.
         """
         context = super().get_context_data(**kwargs)
         category_id = self.request.GET.get('category')
@@ -60,8 +87,78 @@ class ProductListView(ListView):
         else:
             context['category'] = 'Все'
 
+        price_min, price_max = self.get_price('price_min'), self.get_price('price_max')
+        context['category_id'] = category_id or ''
+        context['price_min'], context['price_max'] = price_min, price_max
+        context['facets'] = ProductFacetService.get_facets(
+            category_id=context['category'].pk if category_id else None, price_min=price_min, price_max=price_max
+        )
+        context['category_query'] = self.get_filter_query(exclude=('category',))
+        context['price_query'] = self.get_filter_query(exclude=('price_min', 'price_max'))
         return context
 
+    def get_filter_query(self, exclude: Sequence[str]) -> str:
+        """
+        Возвращает параметры запроса без пагинации и без указанных фильтров
+        для формирования ссылок на значения фильтров.
+        """
+        query = self.request.GET.copy()
+        for name in (self.cursor_kwarg, 'page', *exclude):
+            query.pop(name, None)
+        return query.urlencode()
+
+
+class ProductSearchView(KeysetPaginationMixin, ListView):
+    """
+    Представление для полнотекстового поиска опубликованных товаров.
+    Товары упорядочены по релевантности, настроена keyset-пагинация по релевантности.
+    На одной странице отображается 4 товара.
+    """
+    template_name = 'app_catalog/product_search.html'
+    context_object_name = 'products'
+    paginate_by = 4
+    keyset_ordering = ('-rank', 'id')
+
+    def get_queryset(self) -> QuerySet[Product]:
+        """
+        Получает и возвращает queryset опубликованных товаров, соответствующих поисковому запросу,
+        в выбранной категории или во всех категориях.
+        """
+        category_id = self.request.GET.get('category', None)
+
+        if category_id:
+            queryset = Product.get_published_products_by_category(category_id=category_id)
+        else:
+            queryset = Product.get_all_published_products()
+
+        return ProductSearch.search(text=self.request.GET.get('q', ''), queryset=queryset).with_active_version()
+
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        """
+        Возвращает контекст данных для шаблона результатов поиска,
+        включая поисковый запрос, категории и идентификатор выбранной категории.
+        """
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['categories'] = get_all_categories()
+        context['category_id'] = self.request.GET.get('category', '')
+        return context
+
+
+class ProductAutocompleteView(View):
+    """
+    Представление для подсказок названий опубликованных товаров при вводе поискового запроса.
+    Возвращает JSON со списком товаров (идентификатор и название), допускаются опечатки.
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        try:
+            limit = int(request.GET.get('limit', 0))
+        except ValueError:
+            limit = 0
+        suggestions = ProductAutocomplete.complete(text=request.GET.get('q', ''), limit=max(limit, 0))
+        return JsonResponse({'results': [suggestion._asdict() for suggestion in suggestions]})
+
 
 class ProductDetailView(DetailView):
     """
@@ -117,8 +214,10 @@ class ProductUpdateView(ModeratorOrCreatorMixin, UpdateView):
 
         if versions:
             if versions.is_valid():
-                versions.instance = product
-                versions.save()
+                with transaction.atomic():
+                    versions.instance = product
+                    versions.save()
+                    product.refresh_current_version()
             else:
                 error_message = versions.non_form_errors()
                 messages.error(self.request, error_message)
@@ -141,7 +240,7 @@ class ProductUpdateView(ModeratorOrCreatorMixin, UpdateView):
         """
         Возвращает экземпляр формсета версий товара.
         """
-        if self.request.user.groups.filter(name='Модераторы').exists():
+        if is_moderator(self.request.user):
             return None
         elif self.request.POST:
             return ProductVersionFormSet(self.request.POST, instance=self.object)
@@ -182,7 +281,7 @@ class UserProductListView(AuthenticatedAccessMixin, ListView):
         """
         Получает и возвращает queryset товаров, созданных текущим пользователем.
         """
-        return Product.objects.filter(created_by=self.request.user)
+        return Product.objects.filter(created_by=self.request.user).with_active_version()
 
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         """
@@ -207,7 +306,7 @@ class UnpublishedProductListView(ModeratorAccessMixin, ListView):
         """
         Получает и возвращает queryset неопубликованных товаров.
         """
-        return Product.get_unpublished_products()
+        return Product.get_unpublished_products().with_active_version()
 
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         """
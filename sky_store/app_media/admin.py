@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import MediaFile
+
+
+@admin.register(MediaFile)
+class MediaFileAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'path', 'width', 'height', 'processed_at', 'error', 'updated_at']
+    list_display_links = ['pk', 'path']
+    search_fields = ['path', 'sha256']
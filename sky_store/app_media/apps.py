@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AppMediaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_media'
+    verbose_name = 'Приложение "Медиафайлы"'
+
+    def ready(self):
+        from .signals import connect_image_signals
+
+        connect_image_signals()
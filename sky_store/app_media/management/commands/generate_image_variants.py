@@ -0,0 +1,51 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from app_media.models import MediaFile
+from app_media.services import ImageVariantService
+from app_media.tasks import queue_image_variants
+
+
+class Command(BaseCommand):
+    """
+    Команда для формирования уменьшенных копий уже загруженных изображений.
+
+    Обрабатывает изображения полей из MEDIA_VARIANT_FIELDS (товары, посты, аватары пользователей),
+    которые ещё не обработаны (нет сведений в MediaFile или не заполнена дата обработки),
+    или все изображения с параметром --all. Файлы, которые не удалось обработать (не найдены
+    или не являются изображениями), повторно обрабатываются только с параметром --retry-failed.
+    Существующие копии повторно не формируются.
+    С параметром --enqueue изображения не обрабатываются в этом процессе, а ставятся в очередь celery.
+    """
+    help = 'Generate resized variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Process images that were already processed')
+        parser.add_argument(
+            '--retry-failed', action='store_true', help='Process images that previously failed to be processed'
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true', help='Queue images to the Celery worker instead of processing them here'
+        )
+
+    def handle(self, *args, **options):
+        paths = set()
+        for label, fields in settings.MEDIA_VARIANT_FIELDS.items():
+            model = apps.get_model(label)
+            for field in fields:
+                paths.update(model._default_manager.exclude(**{field: ''}).values_list(field, flat=True).distinct())
+        if not options['all']:
+            done = MediaFile.objects.filter(path__in=paths, processed_at__isnull=False)
+            if options['retry_failed']:
+                done = done.filter(error='')
+            paths -= set(done.values_list('path', flat=True))
+
+        if options['enqueue']:
+            queued = sum(queue_image_variants(path) for path in sorted(paths))
+            self.stdout.write(self.style.SUCCESS(f'Queued {queued} of {len(paths)} images.'))
+            return
+
+        service = ImageVariantService()
+        processed = sum(service.process(path) is not None for path in sorted(paths))
+        self.stdout.write(self.style.SUCCESS(f'Variants were generated for {processed} of {len(paths)} images.'))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='Путь к файлу')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Хеш содержимого')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('variant_widths', models.JSONField(default=list, verbose_name='Ширины вариантов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+                'db_table': 'media_file',
+            },
+        ),
+    ]
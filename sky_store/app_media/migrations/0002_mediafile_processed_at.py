@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 12:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_processed_at(apps, schema_editor):
+    """
+    Отмечает обработанными изображения, для которых уже сформированы варианты.
+    """
+    MediaFile = apps.get_model('app_media', 'MediaFile')
+    MediaFile.objects.exclude(variant_widths=[]).update(processed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='Ошибка обработки'),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата обработки'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='height',
+            field=models.PositiveIntegerField(default=0, verbose_name='Высота'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Хеш содержимого'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='width',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ширина'),
+        ),
+        migrations.RunPython(fill_processed_at, migrations.RunPython.noop),
+    ]
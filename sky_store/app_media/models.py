@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class MediaFile(models.Model):
+    """
+    Модель, описывающая загруженное изображение: хеш содержимого, размеры
+    и ширины сформированных уменьшенных копий (вариантов).
+    Для файла, который не удалось обработать (не найден или не является изображением),
+    сохраняются дата обработки и ошибка, а список вариантов остаётся пустым.
+    """
+    path = models.CharField(max_length=255, unique=True, verbose_name='Путь к файлу')
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name='Хеш содержимого')
+    width = models.PositiveIntegerField(default=0, verbose_name='Ширина')
+    height = models.PositiveIntegerField(default=0, verbose_name='Высота')
+    variant_widths = models.JSONField(default=list, verbose_name='Ширины вариантов')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата обработки')
+    error = models.TextField(blank=True, verbose_name='Ошибка обработки')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')
+
+    class Meta:
+        db_table = 'media_file'
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return self.path
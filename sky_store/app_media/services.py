@@ -0,0 +1,276 @@
+import hashlib
+import io
+import logging
+from collections import namedtuple
+from typing import BinaryIO, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import MediaFile
+
+logger = logging.getLogger(__name__)
+
+MediaFileInfo = namedtuple('MediaFileInfo', ['path', 'sha256', 'width', 'height', 'variant_widths'])
+ImageVariant = namedtuple('ImageVariant', ['width', 'url'])
+
+
+class MediaFileService:
+    """
+    Класс, описывающий доступ к сведениям о загруженных изображениях при формировании страниц.
+
+    Сведения (MediaFileInfo) читаются из кеша, при промахе - из таблицы MediaFile и сохраняются в кеш.
+    Отсутствие сведений тоже кешируется: после обработки изображения задача generate_image_variants
+    записывает в кеш новые сведения.
+
+    URL изображения содержит начало хеша содержимого (MEDIA_URL/v/<хеш>/<путь>), поэтому его можно
+    кешировать бессрочно: изображение с другим содержимым получает другой URL.
+    """
+    KEY = 'media:file:{digest}'
+    MISSING = ()
+
+    @classmethod
+    def get_key(cls, path: str) -> str:
+        return cls.KEY.format(digest=hashlib.sha1(path.encode()).hexdigest())
+
+    @classmethod
+    def get(cls, path: str) -> Optional[MediaFileInfo]:
+        """
+        Возвращает сведения об изображении или None, если изображение ещё не обработано.
+
+        :param path: Путь к изображению относительно MEDIA_ROOT.
+        """
+        if not path:
+            return None
+        if not settings.CACHE_ENABLED:
+            return cls.load(path)
+
+        try:
+            info = cache.get(cls.get_key(path))
+        except Exception as error:
+            logger.warning(f'Кеш сведений о медиафайлах недоступен: {error}')
+            return cls.load(path)
+
+        if info is None:
+            info = cls.load(path)
+            cls.set_cached(path, info)
+        return MediaFileInfo(*info) if info else None
+
+    @classmethod
+    def get_url(cls, path: str) -> str:
+        """
+        Возвращает URL изображения с хешем содержимого или, если изображение ещё не обработано, - без него.
+
+        :param path: Путь к изображению относительно MEDIA_ROOT.
+        """
+        return cls.build_url(path, cls.get(path))
+
+    @staticmethod
+    def build_url(path: str, info: Optional[MediaFileInfo]) -> str:
+        if info is None:
+            return f'{settings.MEDIA_URL}{path}'
+        return f'{settings.MEDIA_URL}v/{info.sha256[:settings.MEDIA_URL_HASH_LENGTH]}/{path}'
+
+    @staticmethod
+    def load(path: str) -> Optional[MediaFileInfo]:
+        # Для файла, который не удалось прочитать, хеш содержимого неизвестен
+        row = MediaFile.objects.filter(path=path).exclude(sha256='').values_list(*MediaFileInfo._fields).first()
+        return MediaFileInfo(*row) if row else None
+
+    @classmethod
+    def set_cached(cls, path: str, info: Optional[MediaFileInfo]) -> None:
+        if not settings.CACHE_ENABLED:
+            return
+        try:
+            cache.set(cls.get_key(path), tuple(info) if info else cls.MISSING, settings.MEDIA_FILE_CACHE_TIMEOUT)
+        except Exception as error:
+            logger.warning(f'Не удалось сохранить сведения о медиафайле в кеш: {error}')
+
+
+class ImageVariantService:
+    """
+    Класс, описывающий формирование уменьшенных копий (вариантов) изображений.
+
+    Для каждой ширины из MEDIA_VARIANT_WIDTHS, меньшей ширины изображения, и для исходной ширины,
+    если она меньше наибольшей из них, формируется вариант в каждом формате из MEDIA_VARIANT_FORMATS.
+    Варианты хранятся по адресу, зависящему от содержимого изображения
+    (MEDIA_VARIANT_DIR/<sha256[:2]>/<sha256>/<ширина>.<расширение>), поэтому существующий вариант
+    никогда не формируется повторно, а одинаковые изображения используют одни и те же варианты.
+    Файл, который не удалось обработать, отмечается в MediaFile ошибкой и повторно не обрабатывается,
+    пока не будет загружен заново.
+    """
+    CHUNK_SIZE = 64 * 1024
+    PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+    EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+    EXIF_ORIENTATION = 0x0112
+    ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+    def __init__(self, storage: Storage = default_storage) -> None:
+        """
+        :param storage: Хранилище изображений и вариантов.
+        """
+        self.storage = storage
+
+    @classmethod
+    def get_variant_path(cls, sha256: str, width: int, image_format: str) -> str:
+        return f'{settings.MEDIA_VARIANT_DIR}/{sha256[:2]}/{sha256}/{width}.{cls.EXTENSIONS[image_format]}'
+
+    @staticmethod
+    def get_variant_widths(width: int) -> List[int]:
+        """
+        Возвращает ширины вариантов изображения заданной ширины. Изображение не увеличивается.
+        """
+        widths = settings.MEDIA_VARIANT_WIDTHS
+        return sorted({variant_width for variant_width in widths if variant_width < width} | {min(width, max(widths))})
+
+    def get_variants(self, info: MediaFileInfo, image_format: str) -> List[ImageVariant]:
+        """
+        Возвращает варианты изображения в заданном формате, от меньшего к большему.
+        """
+        return [
+            ImageVariant(width, self.storage.url(self.get_variant_path(info.sha256, width, image_format)))
+            for width in info.variant_widths
+        ]
+
+    @classmethod
+    def get_hash(cls, file: BinaryIO) -> str:
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: file.read(cls.CHUNK_SIZE), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def register(self, path: str) -> Optional[MediaFileInfo]:
+        """
+        Вычисляет хеш содержимого и размеры изображения и сохраняет их в MediaFile, не формируя варианты.
+        Вызывается сразу после загрузки изображения, чтобы URL с хешем был доступен до формирования вариантов.
+
+        :param path: Путь к изображению относительно MEDIA_ROOT.
+        :return: Сведения об изображении или None, если файл не найден или не является изображением
+        (ошибка сохраняется в MediaFile).
+        """
+        if not self.storage.exists(path):
+            logger.warning(f'Изображение {path} не найдено')
+            self.save_error(path, 'Файл не найден')
+            return None
+
+        with self.storage.open(path, 'rb') as file:
+            sha256 = self.get_hash(file)
+            file.seek(0)
+            try:
+                with Image.open(file) as image:
+                    width, height = image.size
+                    if image.getexif().get(self.EXIF_ORIENTATION) in self.ROTATED_ORIENTATIONS:
+                        width, height = height, width
+            except (Image.UnidentifiedImageError, OSError) as error:
+                logger.warning(f'Не удалось прочитать изображение {path}: {error}')
+                self.save_error(path, str(error))
+                return None
+
+        saved = MediaFileService.load(path)
+        widths = saved.variant_widths if saved is not None and saved.sha256 == sha256 else []
+        return self.save_info(MediaFileInfo(path, sha256, width, height, widths))
+
+    def process(self, path: str) -> Optional[MediaFileInfo]:
+        """
+        Вычисляет хеш содержимого изображения, формирует недостающие варианты
+        и сохраняет сведения об изображении в MediaFile.
+
+        :param path: Путь к изображению относительно MEDIA_ROOT.
+        :return: Сведения об изображении или None, если файл не найден или не является изображением
+        (ошибка сохраняется в MediaFile).
+        """
+        if not self.storage.exists(path):
+            logger.warning(f'Изображение {path} не найдено')
+            self.save_error(path, 'Файл не найден')
+            return None
+
+        with self.storage.open(path, 'rb') as file:
+            sha256 = self.get_hash(file)
+            file.seek(0)
+            try:
+                with Image.open(file) as image:
+                    image = ImageOps.exif_transpose(image)
+                    width, height = image.size
+                    widths = self.get_variant_widths(width)
+                    self.generate_variants(image, sha256, widths)
+            except (Image.UnidentifiedImageError, OSError) as error:
+                logger.warning(f'Не удалось сформировать варианты изображения {path}: {error}')
+                self.save_error(path, str(error))
+                return None
+
+        logger.info(f'Сформированы варианты изображения {path}: {widths}')
+        return self.save_info(MediaFileInfo(path, sha256, width, height, widths), processed=True)
+
+    @staticmethod
+    def save_info(info: MediaFileInfo, processed: bool = False) -> MediaFileInfo:
+        """
+        Сохраняет сведения об изображении в MediaFile и в кеш.
+        :param processed: Сформированы ли варианты. Изображение без вариантов отмечается необработанным.
+        """
+        defaults = {'sha256': info.sha256, 'width': info.width, 'height': info.height,
+                    'variant_widths': info.variant_widths, 'error': ''}
+        if processed:
+            defaults['processed_at'] = timezone.now()
+        elif not info.variant_widths:
+            defaults['processed_at'] = None
+        MediaFile.objects.update_or_create(path=info.path, defaults=defaults)
+        MediaFileService.set_cached(info.path, info)
+        return info
+
+    @staticmethod
+    def save_error(path: str, error: str) -> None:
+        """
+        Отмечает файл обработанным с ошибкой, чтобы он не обрабатывался повторно при каждом запуске
+        команды generate_image_variants.
+        Сведения о файле удаляются из кеша: URL формируется без хеша содержимого.
+        """
+        MediaFile.objects.update_or_create(
+            path=path,
+            defaults={'sha256': '', 'width': 0, 'height': 0, 'variant_widths': [],
+                      'processed_at': timezone.now(), 'error': error}
+        )
+        MediaFileService.set_cached(path, None)
+
+    def generate_variants(self, image: Image.Image, sha256: str, widths: List[int]) -> None:
+        """
+        Формирует варианты, которых ещё нет в хранилище. Изображение уменьшается
+        от большей ширины к меньшей, каждый следующий вариант - из предыдущего.
+        """
+        for width in sorted(widths, reverse=True):
+            height = max(round(image.height * width / image.width), 1)
+            missing = [
+                image_format for image_format in settings.MEDIA_VARIANT_FORMATS
+                if not self.storage.exists(self.get_variant_path(sha256, width, image_format))
+            ]
+            if not missing:
+                continue
+            if image.width != width:
+                image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for image_format in missing:
+                self.save_variant(image, self.get_variant_path(sha256, width, image_format), image_format)
+
+    def save_variant(self, image: Image.Image, path: str, image_format: str) -> None:
+        if image_format == 'jpeg' and image.mode != 'RGB':
+            image = self.flatten(image)
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        buffer = io.BytesIO()
+        image.save(
+            buffer, self.PIL_FORMATS[image_format], quality=settings.MEDIA_VARIANT_FORMATS[image_format], optimize=True
+        )
+        self.storage.save(path, ContentFile(buffer.getvalue()))
+
+    @staticmethod
+    def flatten(image: Image.Image) -> Image.Image:
+        """
+        Накладывает изображение с прозрачностью на белый фон (JPEG не поддерживает прозрачность).
+        """
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
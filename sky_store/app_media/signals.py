@@ -0,0 +1,54 @@
+from typing import Iterable, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save
+
+from .services import ImageVariantService
+from .tasks import queue_image_variants
+
+
+def get_image_fields(sender: type, update_fields: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Возвращает поля модели с изображениями, которые сохраняются (при update_fields - только из их числа).
+    """
+    fields = settings.MEDIA_VARIANT_FIELDS.get(sender._meta.label, [])
+    if update_fields is None:
+        return fields
+    return [name for name in fields if name in update_fields]
+
+
+def remember_uploaded_images(sender, instance: models.Model, raw: bool = False,
+                             update_fields: Optional[Iterable[str]] = None, **kwargs) -> None:
+    """
+    Запоминает поля с изображениями, загруженными при этом сохранении.
+    """
+    instance._uploaded_images = [
+        name for name in get_image_fields(sender, update_fields)
+        if getattr(instance, name) and not getattr(instance, name)._committed
+    ]
+
+
+def enqueue_image_variants(sender, instance: models.Model, raw: bool = False, **kwargs) -> None:
+    """
+    Вычисляет хеш содержимого изображений, загруженных при этом сохранении, и после фиксации
+    транзакции ставит в очередь формирование их вариантов.
+    Сохранения без загрузки изображения (например, обновление last_login при входе) ничего не делают;
+    изображения, загруженные ранее, ставятся в очередь командой generate_image_variants --enqueue.
+    Файл, который не удалось прочитать как изображение, отмечается ошибкой и в очередь не ставится.
+    """
+    for name in getattr(instance, '_uploaded_images', []):
+        path = getattr(instance, name).name
+        if ImageVariantService().register(path) is not None:
+            transaction.on_commit(lambda path=path: queue_image_variants(path))
+
+
+def connect_image_signals() -> None:
+    """
+    Подключает обработчики сохранения к моделям из MEDIA_VARIANT_FIELDS.
+    """
+    for label in settings.MEDIA_VARIANT_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(remember_uploaded_images, sender=model, dispatch_uid=f'remember_uploaded_images:{label}')
+        post_save.connect(enqueue_image_variants, sender=model, dispatch_uid=f'enqueue_image_variants:{label}')
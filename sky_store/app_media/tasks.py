@@ -0,0 +1,34 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .services import ImageVariantService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def generate_image_variants(path: str) -> bool:
+    """
+    Формирует уменьшенные копии загруженного изображения.
+    :param path: путь к изображению относительно MEDIA_ROOT
+    :return: True, если изображение обработано
+    """
+    return ImageVariantService().process(path) is not None
+
+
+def queue_image_variants(path: str) -> bool:
+    """
+    Ставит в очередь формирование уменьшенных копий изображения.
+    Если брокер недоступен, ошибка записывается в лог, а не ожидается повторное подключение:
+    постановка в очередь выполняется при сохранении товара, поста или пользователя.
+    :param path: путь к изображению относительно MEDIA_ROOT
+    :return: True, если задача поставлена в очередь
+    """
+    try:
+        generate_image_variants.apply_async((path,), retry_policy=settings.MEDIA_VARIANT_TASK_RETRY_POLICY)
+    except Exception as error:
+        logger.warning(f'Не удалось поставить в очередь обработку изображения {path}: {error}')
+        return False
+    return True
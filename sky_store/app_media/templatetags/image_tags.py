@@ -0,0 +1,55 @@
+from typing import Any, Dict
+
+from django import template
+from django.conf import settings
+
+from app_media.services import ImageVariantService, MediaFileService
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_srcset(image, image_format: str = 'webp') -> str:
+    """
+    Шаблонный тег, формирующий значение атрибута srcset из уменьшенных копий изображения.
+    :param image: изображение (поле модели) или путь к нему относительно MEDIA_ROOT
+    :param image_format: формат копий (webp или jpeg)
+    :return: строка вида "url 320w, url 640w" или пустая строка, если копии ещё не сформированы
+    """
+    info = MediaFileService.get(getattr(image, 'name', image))
+    if info is None:
+        return ''
+    variants = ImageVariantService().get_variants(info, image_format)
+    return ', '.join(f'{variant.url} {variant.width}w' for variant in variants)
+
+
+@register.inclusion_tag('app_media/includes/responsive_image.html')
+def responsive_image(image, alt: str = '', sizes: str = '100vw', css_class: str = '') -> Dict[str, Any]:
+    """
+    Шаблонный тег, выводящий изображение с уменьшенными копиями в форматах WebP и JPEG:
+    браузер выбирает копию по ширине области вывода (sizes).
+    Пока копии не сформированы, выводится исходное изображение (с хешем содержимого в URL, если он вычислен).
+    :param image: изображение (поле модели) или путь к нему относительно MEDIA_ROOT
+    :param alt: альтернативный текст
+    :param sizes: значение атрибута sizes
+    :param css_class: CSS-класс изображения
+    """
+    path = getattr(image, 'name', image)
+    info = MediaFileService.get(path)
+    context = {'src': MediaFileService.build_url(path, info), 'alt': alt, 'sizes': sizes, 'css_class': css_class}
+    if info is None or not info.variant_widths:
+        return context
+
+    service = ImageVariantService()
+    variants = {image_format: service.get_variants(info, image_format) for image_format in settings.MEDIA_VARIANT_FORMATS}
+    if variants.get('jpeg'):
+        context['src'] = variants['jpeg'][-1].url
+    context.update({
+        'width': info.width,
+        'height': info.height,
+        'srcsets': {
+            image_format: ', '.join(f'{variant.url} {variant.width}w' for variant in image_variants)
+            for image_format, image_variants in variants.items()
+        },
+    })
+    return context
@@ -0,0 +1,11 @@
+from django.urls import re_path
+
+from .apps import AppMediaConfig
+from .views import MediaFileView
+
+app_name = AppMediaConfig.name
+
+urlpatterns = [
+    re_path(r'^v/(?P<version>[0-9a-f]+)/(?P<path>.+)$', MediaFileView.as_view(), name='media_versioned'),
+    re_path(r'^(?P<path>.+)$', MediaFileView.as_view(), name='media'),
+]
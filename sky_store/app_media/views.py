@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.views import View
+from django.views.static import serve
+
+from .services import MediaFileService
+
+
+class MediaFileView(View):
+    """
+    Представление для раздачи медиафайлов при разработке и нагрузочном тестировании.
+
+    Файлы, запрошенные по URL с актуальным хешем содержимого, и варианты изображений
+    (их путь зависит от содержимого) отдаются с заголовком Cache-Control: immutable
+    и сроком кеширования MEDIA_IMMUTABLE_MAX_AGE. Остальные файлы браузер должен проверять
+    при каждом обращении (Cache-Control: no-cache).
+    """
+
+    def get(self, request: HttpRequest, path: str, version: str = None) -> HttpResponse:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+        if self.is_immutable(path, version):
+            response['Cache-Control'] = f'public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    @staticmethod
+    def is_immutable(path: str, version: str = None) -> bool:
+        """
+        Проверяет, что содержимое файла по этому URL никогда не изменится.
+        """
+        if version is None:
+            return path.startswith(f'{settings.MEDIA_VARIANT_DIR}/')
+        info = MediaFileService.get(path)
+        return info is not None and info.sha256.startswith(version)
@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.db.models import Sum
 
-from .models import Client, Newsletter, Message, NewsletterLog
+from .models import Client, Newsletter, Message, NewsletterLog, NewsletterDelivery, NewsletterRunStats
 
 
 @admin.register(Client)
@@ -9,13 +10,35 @@ class ClientAdmin(admin.ModelAdmin):
     list_display_links = ['email']
 
 
+class NewsletterRunStatsInline(admin.TabularInline):
+    model = NewsletterRunStats
+    fields = ['run_at', 'sent', 'failed', 'last_error', 'updated_at']
+    readonly_fields = fields
+    extra = 0
+    max_num = 0
+    can_delete = False
+
+
 @admin.register(Newsletter)
 class NewsletterAdmin(admin.ModelAdmin):
-    list_display = ['pk', 'time', 'frequency', 'status', 'created_at']
+    list_display = ['pk', 'time', 'frequency', 'status', 'created_at', 'sent_total', 'failed_total']
+    inlines = [NewsletterRunStatsInline]
 
     class Media:
         js = ('js/select_all.js',)
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.annotate(sent_total=Sum('run_stats__sent'), failed_total=Sum('run_stats__failed'))
+
+    @admin.display(description='Отправлено писем', ordering='sent_total')
+    def sent_total(self, obj):
+        return obj.sent_total or 0
+
+    @admin.display(description='Ошибок отправки', ordering='failed_total')
+    def failed_total(self, obj):
+        return obj.failed_total or 0
+
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
@@ -25,3 +48,15 @@ class MessageAdmin(admin.ModelAdmin):
 @admin.register(NewsletterLog)
 class NewsletterLogAdmin(admin.ModelAdmin):
     list_display = ['date_time', 'status']
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['newsletter', 'run_at', 'message', 'client', 'delivered_at']
+    list_select_related = ['newsletter', 'message', 'client']
+
+
+@admin.register(NewsletterRunStats)
+class NewsletterRunStatsAdmin(admin.ModelAdmin):
+    list_display = ['newsletter', 'run_at', 'sent', 'failed', 'updated_at']
+    list_select_related = ['newsletter']
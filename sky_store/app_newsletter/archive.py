@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .models import NewsletterLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['id', 'date_time', 'status', 'server_response', 'client_id', 'message_id', 'newsletter_id']
+
+PART_FILE = re.compile(r'part-(\d+)(?:-(\d+))?\.(?:parquet|arrow)$')
+
+
+class NewsletterLogArchive:
+    """
+    Класс, описывающий архив логов отправки писем в колоночном формате (Parquet или Arrow IPC).
+
+    Логи выгружаются из базы данных порциями по возрастанию идентификатора (keyset)
+    и записываются в файлы, разбитые по дням (по UTC):
+    <каталог>/date=ГГГГ-ММ-ДД/part-<первый id>-<последний id>.<формат>.
+    Статус и идентификатор рассылки хранятся словарным кодированием, файлы сжимаются zstd.
+    Идентификатор последнего выгруженного лога сохраняется в файле _state.json,
+    поэтому повторный запуск продолжает выгрузку с места остановки. Файлы с логами после него,
+    записанные прерванной выгрузкой, перед продолжением удаляются, чтобы логи не выгружались дважды
+    (в том числе при другом размере порции).
+    Для работы нужен пакет pyarrow.
+    """
+    FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+    STATE_FILE = '_state.json'
+    COMPRESSION = 'zstd'
+
+    def __init__(self, directory: str, file_format: str = 'parquet') -> None:
+        """
+        :param directory: Каталог архива.
+        :param file_format: Формат файлов: 'parquet' или 'arrow' (Arrow IPC).
+        """
+        if pa is None:
+            raise ImproperlyConfigured('Для архива логов отправки писем нужен пакет pyarrow')
+        if file_format not in self.FORMATS:
+            raise ValueError(f'Неизвестный формат архива: {file_format}')
+        self.directory = directory
+        self.file_format = file_format
+
+    @staticmethod
+    def schema() -> 'pa.Schema':
+        return pa.schema([
+            ('id', pa.int64()),
+            ('date_time', pa.timestamp('us', tz='UTC')),
+            ('status', pa.dictionary(pa.int8(), pa.string())),
+            ('server_response', pa.string()),
+            ('client_id', pa.int64()),
+            ('message_id', pa.int64()),
+            ('newsletter_id', pa.dictionary(pa.int32(), pa.int64())),
+        ])
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.directory, self.STATE_FILE)
+
+    def get_last_id(self) -> int:
+        """
+        Возвращает идентификатор последнего выгруженного лога (0, если выгрузки не было).
+        """
+        try:
+            with open(self.state_path, encoding='utf-8') as file:
+                return int(json.load(file)['last_id'])
+        except FileNotFoundError:
+            return 0
+
+    def save_last_id(self, last_id: int) -> None:
+        """
+        Атомарно сохраняет идентификатор последнего выгруженного лога.
+        """
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'last_id': last_id, 'updated_at': timezone.now().isoformat()}, file)
+        os.replace(tmp_path, self.state_path)
+
+    def export(self, chunk_size: int = 10000, until: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Выгружает в архив логи, созданные до until, начиная с последнего выгруженного.
+
+        :param chunk_size: Количество логов, читаемых из базы данных одним запросом.
+        :param until: Верхняя граница времени логов (по умолчанию - начало текущих суток по UTC,
+        чтобы выгружать только завершённые дни).
+        :return: Количество выгруженных логов и записанных файлов.
+        """
+        if until is None:
+            today = timezone.now().astimezone(dt_timezone.utc).date()
+            until = datetime(today.year, today.month, today.day, tzinfo=dt_timezone.utc)
+
+        os.makedirs(self.directory, exist_ok=True)
+        last_id = self.get_last_id()
+        self.remove_unfinished_files(last_id)
+        result = {'rows': 0, 'files': 0}
+
+        while True:
+            rows = list(
+                NewsletterLog.objects.filter(pk__gt=last_id, date_time__lt=until)
+                .order_by('pk')
+                .values_list(*FIELDS)[:chunk_size]
+            )
+            if not rows:
+                break
+
+            days = defaultdict(list)
+            for row in rows:
+                days[row[1].astimezone(dt_timezone.utc).date()].append(row)
+            for day, day_rows in days.items():
+                self.write_file(day, day_rows)
+            last_id = rows[-1][0]
+            self.save_last_id(last_id)
+
+            result['rows'] += len(rows)
+            result['files'] += len(days)
+            logger.info(f'Выгружено логов отправки писем: {result["rows"]}, последний идентификатор {last_id}')
+        return result
+
+    def write_file(self, day: date, rows: List[tuple]) -> str:
+        """
+        Записывает логи одного дня в файл архива.
+        Файл сначала записывается во временный, затем переименовывается.
+
+        :param day: День логов.
+        :param rows: Логи в порядке полей FIELDS.
+        :return: Путь к файлу.
+        """
+        columns = list(zip(*rows))
+        table = pa.table(
+            [
+                pa.array(columns[0], type=pa.int64()),
+                pa.array(columns[1], type=pa.timestamp('us', tz='UTC')),
+                pa.array(columns[2], type=pa.string()).dictionary_encode().cast(pa.dictionary(pa.int8(), pa.string())),
+                pa.array(columns[3], type=pa.string()),
+                pa.array(columns[4], type=pa.int64()),
+                pa.array(columns[5], type=pa.int64()),
+                pa.array(columns[6], type=pa.int64()).dictionary_encode(),
+            ],
+            schema=self.schema()
+        )
+
+        day_directory = os.path.join(self.directory, f'date={day.isoformat()}')
+        os.makedirs(day_directory, exist_ok=True)
+        filename = f'part-{rows[0][0]:012d}-{rows[-1][0]:012d}.{self.FORMATS[self.file_format]}'
+        path = os.path.join(day_directory, filename)
+        tmp_path = os.path.join(day_directory, f'.{filename}.tmp')
+        if self.file_format == 'parquet':
+            pq.write_table(table, tmp_path, compression=self.COMPRESSION, use_dictionary=True)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.COMPRESSION)
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return path
+
+    def remove_unfinished_files(self, last_id: int) -> None:
+        """
+        Удаляет файлы архива с логами после last_id: их записала прерванная выгрузка,
+        и при продолжении эти логи будут выгружены заново.
+
+        :param last_id: Идентификатор последнего выгруженного лога.
+        """
+        for day_directory in os.listdir(self.directory):
+            day_path = os.path.join(self.directory, day_directory)
+            if not day_directory.startswith('date=') or not os.path.isdir(day_path):
+                continue
+            for filename in os.listdir(day_path):
+                match = PART_FILE.match(filename)
+                if match and int(match.group(2) or match.group(1)) > last_id:
+                    os.remove(os.path.join(day_path, filename))
+                    logger.warning(f'Удалён файл прерванной выгрузки логов отправки писем: {filename}')
+
+    def dataset(self) -> 'ds.Dataset':
+        """
+        Возвращает набор данных архива (pyarrow.dataset) с разбиением по дням.
+        """
+        return ds.dataset(
+            self.directory,
+            format='parquet' if self.file_format == 'parquet' else 'ipc',
+            partitioning='hive',
+            exclude_invalid_files=True,
+            ignore_prefixes=['.', '_'],
+        )
+
+    def load_newsletter_history(self, newsletter_id: int, start: Optional[date] = None,
+                                end: Optional[date] = None) -> 'pa.Table':
+        """
+        Загружает из архива логи одной рассылки, не обращаясь к базе данных.
+
+        :param newsletter_id: Идентификатор рассылки.
+        :param start: Первый день периода (включительно).
+        :param end: Последний день периода (включительно).
+        :return: Таблица pyarrow с логами, упорядоченными по идентификатору.
+        """
+        if not os.path.isdir(self.directory):
+            return self.schema().empty_table()
+
+        condition = ds.field('newsletter_id') == newsletter_id
+        if start is not None:
+            condition &= ds.field('date') >= start.isoformat()
+        if end is not None:
+            condition &= ds.field('date') <= end.isoformat()
+        table = self.dataset().to_table(columns=FIELDS, filter=condition)
+        return table.sort_by('id')
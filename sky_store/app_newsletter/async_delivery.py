@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import smtplib
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.mail.message import sanitize_address
+
+from .rate_limit import SMTPRateLimiter
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+logger = logging.getLogger(__name__)
+
+
+def to_smtplib_error(error: Exception) -> Exception:
+    """
+    Преобразует ошибку aiosmtplib в соответствующую ошибку smtplib,
+    чтобы ошибки обоих способов отправки обрабатывались одинаково.
+    """
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return smtplib.SMTPRecipientsRefused(
+            {refused.recipient: (refused.code, refused.message.encode()) for refused in error.recipients}
+        )
+    if isinstance(error, aiosmtplib.SMTPServerDisconnected):
+        return smtplib.SMTPServerDisconnected(str(error))
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return smtplib.SMTPResponseException(error.code, error.message)
+    return error
+
+
+class AsyncSMTPConnectionPool:
+    """
+    Класс, описывающий пул соединений с почтовым сервером для асинхронной отправки.
+    Соединения открываются по мере необходимости, но не более size одновременно.
+    """
+
+    def __init__(self, size: int, connection_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        """
+        :param size: Максимальное количество соединений.
+        :param connection_kwargs: Параметры соединения (host, port, username, password, use_tls, use_ssl, timeout),
+        по умолчанию - из настроек проекта.
+        """
+        self.size = size
+        self.connection_kwargs = connection_kwargs or {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.clients: List['aiosmtplib.SMTP'] = []
+
+    async def __aenter__(self) -> 'AsyncSMTPConnectionPool':
+        self.queue = asyncio.Queue()
+        for _ in range(self.size):
+            self.queue.put_nowait(None)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await asyncio.gather(*[self.disconnect(client) for client in self.clients])
+        self.clients = []
+
+    def create_client(self) -> 'aiosmtplib.SMTP':
+        kwargs = self.connection_kwargs
+        username = kwargs.get('username', settings.EMAIL_HOST_USER)
+        password = kwargs.get('password', settings.EMAIL_HOST_PASSWORD)
+        if not (username and password):
+            username = password = None
+        return aiosmtplib.SMTP(
+            hostname=kwargs.get('host', settings.EMAIL_HOST),
+            port=kwargs.get('port', settings.EMAIL_PORT),
+            username=username,
+            password=password,
+            use_tls=kwargs.get('use_ssl', settings.EMAIL_USE_SSL),
+            start_tls=kwargs.get('use_tls', settings.EMAIL_USE_TLS),
+            timeout=kwargs.get('timeout', settings.EMAIL_TIMEOUT),
+        )
+
+    async def acquire(self) -> 'aiosmtplib.SMTP':
+        """
+        Возвращает свободное соединение, при необходимости открывая новое.
+        """
+        client = await self.queue.get()
+        if client is not None and client.is_connected:
+            return client
+        if client is not None:
+            self.clients.remove(client)
+        try:
+            client = self.create_client()
+            await client.connect()
+        except BaseException:
+            self.queue.put_nowait(None)
+            raise
+        self.clients.append(client)
+        return client
+
+    def release(self, client: 'aiosmtplib.SMTP') -> None:
+        self.queue.put_nowait(client)
+
+    async def discard(self, client: 'aiosmtplib.SMTP') -> None:
+        """
+        Закрывает соединение, разорванное сервером, и освобождает место в пуле.
+        """
+        self.clients.remove(client)
+        await self.disconnect(client)
+        self.queue.put_nowait(None)
+
+    @staticmethod
+    async def disconnect(client: 'aiosmtplib.SMTP') -> None:
+        if not client.is_connected:
+            return
+        try:
+            await client.quit()
+        except Exception as error:
+            logger.warning(f'Ошибка закрытия соединения с почтовым сервером: {error}')
+            client.close()
+
+
+class AsyncEmailSender:
+    """
+    Класс, описывающий асинхронную отправку писем (asyncio, aiosmtplib).
+
+    Письма, переданные в send, отправляются пачками по chunk_size штук в отдельном цикле событий
+    через пул из pool_size соединений, одновременно - не более concurrency писем.
+    Цикл событий и пул соединений общие для всех пачек. Работа с базой данных остаётся вне цикла событий:
+    письма пачки формируются до её отправки, результаты обрабатываются после. Временные ошибки
+    возвращаются последними. Если сервер временно отказал в приёме письма и включён stop_on_transient,
+    остальные письма пачки не отправляются, для них возвращается та же временная ошибка.
+    Для работы нужен пакет aiosmtplib.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, concurrency: Optional[int] = None,
+                 connection_kwargs: Optional[Dict[str, Any]] = None,
+                 rate_limiter: Optional[SMTPRateLimiter] = None, chunk_size: Optional[int] = None,
+                 stop_on_transient: bool = True) -> None:
+        """
+        :param pool_size: Количество соединений с почтовым сервером.
+        :param concurrency: Количество одновременно отправляемых писем.
+        :param connection_kwargs: Параметры соединения (по умолчанию - из настроек проекта).
+        :param rate_limiter: Ограничитель скорости отправки писем.
+        :param chunk_size: Количество писем, формируемых и отправляемых за один проход цикла событий.
+        :param stop_on_transient: Прекращать ли отправку пачки после временного отказа сервера
+        (False - при последней попытке, когда отправка не будет повторена).
+        """
+        if aiosmtplib is None:
+            raise ImproperlyConfigured('Для асинхронной отправки писем нужен пакет aiosmtplib')
+        self.pool_size = pool_size or settings.NEWSLETTER_ASYNC_POOL_SIZE
+        self.concurrency = concurrency or settings.NEWSLETTER_ASYNC_CONCURRENCY
+        self.connection_kwargs = connection_kwargs or {}
+        self.rate_limiter = rate_limiter
+        self.chunk_size = chunk_size or settings.NEWSLETTER_ASYNC_CHUNK_SIZE
+        self.stop_on_transient = stop_on_transient
+
+    def send(self, emails: Iterable[Tuple[Any, EmailMessage]]) -> Iterator[Tuple[Any, Optional[Exception]]]:
+        """
+        Отправляет письма и для каждого письма возвращает результат отправки.
+
+        :param emails: Пары (ключ, письмо). Ключ возвращается вместе с результатом.
+        :return: Пары (ключ, ошибка). Для успешно отправленных писем ошибка равна None.
+        """
+        emails = iter(emails)
+        chunk = list(islice(emails, self.chunk_size))
+        if not chunk:
+            return
+
+        loop = asyncio.new_event_loop()
+        pool = AsyncSMTPConnectionPool(size=self.pool_size, connection_kwargs=self.connection_kwargs)
+        loop.run_until_complete(pool.__aenter__())
+        try:
+            while chunk:
+                yield from loop.run_until_complete(self.send_all(pool, chunk))
+                chunk = list(islice(emails, self.chunk_size))
+        finally:
+            try:
+                loop.run_until_complete(pool.__aexit__(None, None, None))
+                # Потоки, в которых ограничитель скорости обращается к Redis
+                loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                loop.close()
+
+    async def send_all(self, pool: AsyncSMTPConnectionPool,
+                       emails: List[Tuple[Any, EmailMessage]]) -> List[Tuple[Any, Optional[Exception]]]:
+        """
+        Отправляет пачку писем через пул соединений.
+
+        :param pool: Пул соединений.
+        :param emails: Пары (ключ, письмо).
+        :return: Пары (ключ, ошибка) для всех писем пачки, временные ошибки - последними.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results, transient_results = [], []
+        stop_error: Optional[Exception] = None
+
+        async def send(key: Any, email: EmailMessage) -> None:
+            nonlocal stop_error
+            async with semaphore:
+                error = stop_error if stop_error is not None else await self.send_one(pool, email)
+            if error is not None and self.is_transient(error):
+                if self.stop_on_transient:
+                    stop_error = stop_error or error
+                transient_results.append((key, error))
+            else:
+                results.append((key, error))
+
+        await asyncio.gather(*[send(key, email) for key, email in emails])
+        return results + transient_results
+
+    async def send_one(self, pool: AsyncSMTPConnectionPool, email: EmailMessage) -> Optional[Exception]:
+        """
+        Отправляет одно письмо через соединение из пула.
+        Если сервер разорвал соединение, отправка повторяется через новое соединение.
+
+        :param pool: Пул соединений.
+        :param email: Письмо.
+        :return: Ошибка отправки или None, если письмо отправлено.
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+        encoding = email.encoding or settings.DEFAULT_CHARSET
+        from_email = sanitize_address(email.from_email, encoding)
+        recipients = [sanitize_address(address, encoding) for address in email.recipients()]
+        data = email.message().as_bytes(linesep='\r\n')
+
+        for attempt in range(2):
+            try:
+                client = await pool.acquire()
+            except Exception as error:
+                return to_smtplib_error(error)
+            try:
+                await client.sendmail(from_email, recipients, data)
+            except aiosmtplib.SMTPServerDisconnected as error:
+                await pool.discard(client)
+                if attempt:
+                    return to_smtplib_error(error)
+                logger.warning('Почтовый сервер разорвал соединение, переподключение')
+            except Exception as error:
+                pool.release(client)
+                return to_smtplib_error(error)
+            else:
+                pool.release(client)
+                return None
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        from .services import is_transient_error
+
+        return is_transient_error(error)
@@ -0,0 +1,477 @@
+import logging
+import math
+import os
+import random
+import socketserver
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .async_delivery import AsyncEmailSender
+from .models import Client, Message, Newsletter
+from .payloads import EmailPayload
+from .rate_limit import SMTPRateLimiter
+from .services import BulkEmailSender, NewsletterDeliveryService, TransientDeliveryError
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Обработчик соединения с фиктивным почтовым сервером.
+    Поддерживает минимальный набор команд SMTP, необходимый smtplib.
+    """
+
+    def handle(self) -> None:
+        server = self.server
+        if server.should_fail(server.connect_throttle_rate):
+            self.reply(b'421 too many connections, try again later')
+            return
+        self.reply(b'220 fake smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply(b'250 fake')
+            elif command == b'RCPT':
+                if server.should_fail(server.rcpt_throttle_rate):
+                    self.reply(b'451 recipient rate limit exceeded, try again later')
+                else:
+                    self.reply(b'250 ok')
+            elif command == b'DATA':
+                self.reply(b'354 end data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.should_fail(server.data_throttle_rate):
+                    self.reply(b'451 message rate limit exceeded, try again later')
+                elif server.should_fail(server.failure_rate):
+                    self.reply(b'550 message rejected')
+                else:
+                    self.reply(b'250 queued')
+            elif command == b'QUIT':
+                self.reply(b'221 bye')
+                return
+            else:
+                self.reply(b'250 ok')
+
+    def reply(self, line: bytes) -> None:
+        self.wfile.write(line + b'\r\n')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Класс, описывающий фиктивный почтовый сервер для нагрузочного тестирования.
+    Принимает письма, не доставляя их, с заданной задержкой ответа на каждое письмо,
+    заданной долей отказов (ответ 550) и временных отказов, которыми почтовые сервисы
+    ограничивают скорость отправки: при подключении (421) и на команды RCPT и DATA (451).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    # Пул асинхронной отправки открывает десятки соединений одновременно: при очереди по умолчанию (5)
+    # часть подключений не принимается и клиент бесконечно ждёт приветствия сервера.
+    request_queue_size = 128
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None,
+                 connect_throttle_rate: float = 0.0, rcpt_throttle_rate: float = 0.0,
+                 data_throttle_rate: float = 0.0) -> None:
+        """
+        :param latency: Задержка ответа на каждое письмо в секундах.
+        :param failure_rate: Доля писем, которые сервер отклоняет (от 0 до 1).
+        :param seed: Начальное значение генератора случайных чисел для воспроизводимости отказов.
+        :param connect_throttle_rate: Доля подключений, на которые сервер отвечает 421 и закрывает соединение.
+        :param rcpt_throttle_rate: Доля команд RCPT, на которые сервер отвечает 451.
+        :param data_throttle_rate: Доля писем, на которые после DATA сервер отвечает 451.
+        """
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.connect_throttle_rate = connect_throttle_rate
+        self.rcpt_throttle_rate = rcpt_throttle_rate
+        self.data_throttle_rate = data_throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> 'FakeSMTPServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def should_fail(self, rate: float) -> bool:
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+
+class LatencyHistogram:
+    """
+    Класс, описывающий гистограмму времени отправки писем.
+
+    Время отправки учитывается в логарифмических корзинах с шагом RESOLUTION (1 %), поэтому
+    размер гистограммы не зависит от количества писем, а перцентили вычисляются
+    с относительной погрешностью не больше RESOLUTION. Максимальное время хранится точно.
+    """
+    MIN_VALUE = 1e-6
+    MAX_VALUE = 600.0
+    RESOLUTION = 0.01
+
+    def __init__(self) -> None:
+        self.log_step = math.log1p(self.RESOLUTION)
+        self.counts = [0] * (int(math.log(self.MAX_VALUE / self.MIN_VALUE) / self.log_step) + 2)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        """
+        Учитывает время отправки письма в секундах.
+        """
+        index = 0
+        if value > self.MIN_VALUE:
+            index = min(math.ceil(math.log(value / self.MIN_VALUE) / self.log_step), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Возвращает перцентиль времени отправки (метод ближайшего ранга) - верхнюю границу корзины.
+        :param percent: Перцентиль (от 0 до 100).
+        """
+        if not self.count:
+            return 0.0
+        rank = min(max(int(round(percent / 100 * self.count + 0.5)), 1), self.count)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.MIN_VALUE * math.exp(index * self.log_step), self.max)
+        return self.max
+
+
+class TimedEmailSender(BulkEmailSender):
+    """
+    Пакетная отправка писем с замером времени отправки каждого письма.
+    """
+
+    def __init__(self, latencies: LatencyHistogram, **kwargs) -> None:
+        """
+        :param latencies: Гистограмма, в которой учитывается время отправки каждого письма.
+        """
+        super().__init__(**kwargs)
+        self.latencies = latencies
+
+    def send_one(self, email):
+        started_at = time.perf_counter()
+        error = super().send_one(email)
+        self.latencies.add(time.perf_counter() - started_at)
+        return error
+
+
+class TimedAsyncEmailSender(AsyncEmailSender):
+    """
+    Асинхронная отправка писем с замером времени отправки каждого письма.
+    """
+
+    def __init__(self, latencies: LatencyHistogram, **kwargs) -> None:
+        """
+        :param latencies: Гистограмма, в которой учитывается время отправки каждого письма.
+        """
+        super().__init__(**kwargs)
+        self.latencies = latencies
+
+    async def send_one(self, pool, email):
+        started_at = time.perf_counter()
+        error = await super().send_one(pool, email)
+        self.latencies.add(time.perf_counter() - started_at)
+        return error
+
+
+class QueryCounter:
+    """
+    Обёртка выполнения SQL-запросов, подсчитывающая их количество.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get_rss_kb() -> Optional[int]:
+    """
+    Возвращает текущий объём резидентной памяти процесса в КБ (только Linux).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+class NewsletterBenchmark:
+    """
+    Класс, описывающий нагрузочное тестирование доставки рассылки.
+
+    Создаёт рассылку с clients клиентами и messages сообщениями, отправляет её
+    через NewsletterDeliveryService по шардам на фиктивный почтовый сервер
+    и замеряет пропускную способность, время отправки писем, количество
+    SQL-запросов и потребление памяти. Клиенты создаются пачками, чтобы
+    пиковое потребление памяти отражало отправку, а не подготовку данных.
+    Все созданные данные удаляются откатом транзакции.
+    """
+    SEED_BATCH_SIZE = 10000
+    SMTP_TIMEOUT = 30
+
+    def __init__(self, clients: int, messages: int, shard_size: int, latency: float = 0.0,
+                 failure_rate: float = 0.0, chunk_size: Optional[int] = None, seed: Optional[int] = None,
+                 rate_limit: Optional[float] = None, trace_memory: bool = False,
+                 payload_cache: bool = True, backend: str = 'sync', concurrency: Optional[int] = None,
+                 pool_size: Optional[int] = None, connect_throttle_rate: float = 0.0,
+                 rcpt_throttle_rate: float = 0.0, data_throttle_rate: float = 0.0) -> None:
+        """
+        :param clients: Количество клиентов рассылки.
+        :param messages: Количество сообщений рассылки.
+        :param shard_size: Количество клиентов в одном шарде.
+        :param latency: Задержка ответа почтового сервера на каждое письмо в секундах.
+        :param failure_rate: Доля писем, которые отклоняет почтовый сервер.
+        :param chunk_size: Количество писем, отправляемых через одно соединение.
+        :param seed: Начальное значение генератора случайных чисел.
+        :param rate_limit: Ограничение скорости отправки, писем в секунду (None - без ограничения).
+        :param trace_memory: Замерять ли пиковое потребление памяти через tracemalloc (замедляет отправку).
+        :param payload_cache: Использовать ли заранее сформированные письма (EmailPayload).
+        :param backend: Способ отправки: 'sync' (BulkEmailSender) или 'async' (AsyncEmailSender).
+        :param concurrency: Количество одновременно отправляемых писем при асинхронной отправке.
+        :param pool_size: Количество соединений с почтовым сервером при асинхронной отправке.
+        :param connect_throttle_rate: Доля подключений, на которые почтовый сервер отвечает 421.
+        :param rcpt_throttle_rate: Доля команд RCPT, на которые почтовый сервер отвечает 451.
+        :param data_throttle_rate: Доля писем, на которые почтовый сервер отвечает 451.
+        """
+        self.clients = clients
+        self.messages = messages
+        self.shard_size = shard_size
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.rate_limit = rate_limit
+        self.trace_memory = trace_memory
+        self.payload_cache = payload_cache
+        self.backend = backend
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.connect_throttle_rate = connect_throttle_rate
+        self.rcpt_throttle_rate = rcpt_throttle_rate
+        self.data_throttle_rate = data_throttle_rate
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {
+            'clients': self.clients,
+            'messages': self.messages,
+            'shard_size': self.shard_size,
+            'latency_ms': self.latency * 1000,
+            'failure_rate': self.failure_rate,
+            'chunk_size': self.chunk_size,
+            'seed': self.seed,
+            'rate_limit': self.rate_limit,
+            'payload_cache': self.payload_cache,
+            'backend': self.backend,
+            'concurrency': self.concurrency,
+            'pool_size': self.pool_size,
+            'connect_throttle_rate': self.connect_throttle_rate,
+            'rcpt_throttle_rate': self.rcpt_throttle_rate,
+            'data_throttle_rate': self.data_throttle_rate,
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Выполняет нагрузочное тестирование и возвращает результаты.
+        """
+        # При DEBUG=True Django сохраняет текст каждого запроса в connection.queries_log (до 9000 запросов),
+        # и на миллионе клиентов этот журнал занимает около 180 МБ, искажая замер памяти рассылки.
+        with override_settings(DEBUG=False), transaction.atomic():
+            newsletter = self.seed_newsletter()
+            server = FakeSMTPServer(
+                latency=self.latency,
+                failure_rate=self.failure_rate,
+                seed=self.seed,
+                connect_throttle_rate=self.connect_throttle_rate,
+                rcpt_throttle_rate=self.rcpt_throttle_rate,
+                data_throttle_rate=self.data_throttle_rate
+            )
+            with server:
+                result = self.deliver(newsletter=newsletter, port=server.port)
+            transaction.set_rollback(True)
+        return result
+
+    def seed_newsletter(self) -> Newsletter:
+        """
+        Создаёт рассылку с клиентами и сообщениями.
+        """
+        prefix = uuid.uuid4().hex[:8]
+        messages = Message.objects.bulk_create(
+            [Message(subject=f'Benchmark {index}', body='Benchmark message body') for index in range(self.messages)]
+        )
+
+        now = timezone.localtime()
+        newsletter = Newsletter.objects.create(
+            time=now.time(),
+            frequency='D',
+            status='C',
+            finish_date=(now + timedelta(days=1)).date(),
+            finish_time=now.time()
+        )
+        newsletter.messages.set(messages)
+        through = Newsletter.clients.through
+        for start in range(0, self.clients, self.SEED_BATCH_SIZE):
+            clients = Client.objects.bulk_create(
+                [
+                    Client(email=f'bench-{prefix}-{index}@example.com', first_name='Bench', last_name=str(index))
+                    for index in range(start, min(start + self.SEED_BATCH_SIZE, self.clients))
+                ],
+                batch_size=1000
+            )
+            through.objects.bulk_create(
+                [through(newsletter_id=newsletter.pk, client_id=client.pk) for client in clients],
+                batch_size=1000
+            )
+        if connection.vendor == 'postgresql':
+            # Созданные данные не зафиксированы, и autovacuum не собирает по ним статистику:
+            # без неё планировщик выбирает для больших рассылок вложенные циклы по всей таблице клиентов.
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE "{Client._meta.db_table}", "{through._meta.db_table}"')
+        return newsletter
+
+    def deliver(self, newsletter: Newsletter, port: int) -> Dict[str, Any]:
+        """
+        Отправляет рассылку по шардам на почтовый сервер и замеряет показатели.
+        :param newsletter: Рассылка.
+        :param port: Порт почтового сервера.
+        """
+        latencies = LatencyHistogram()
+        service = NewsletterDeliveryService(newsletter=newsletter)
+        connection_kwargs = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': '127.0.0.1',
+            'port': port,
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'use_ssl': False,
+            'timeout': self.SMTP_TIMEOUT,
+        }
+        if self.backend == 'async':
+            service.sender_class = partial(
+                TimedAsyncEmailSender,
+                latencies=latencies,
+                pool_size=self.pool_size,
+                concurrency=self.concurrency,
+                connection_kwargs=connection_kwargs
+            )
+        else:
+            service.sender_class = partial(
+                TimedEmailSender, latencies=latencies, chunk_size=self.chunk_size, connection_kwargs=connection_kwargs
+            )
+        service.use_payload_cache = self.payload_cache
+        service.rate_limiter = None
+        if self.rate_limit:
+            service.rate_limiter = SMTPRateLimiter(
+                account=f'bench-{newsletter.pk}', rate=self.rate_limit, capacity=self.rate_limit
+            )
+        totals = {'sent': 0, 'failed': 0, 'skipped': 0, 'retries': 0}
+        counter = QueryCounter()
+
+        if self.trace_memory:
+            tracemalloc.start()
+        EmailPayload.clear_cache()
+        rss_before = get_rss_kb()
+        started_at = time.perf_counter()
+        cpu_started_at = time.process_time()
+        try:
+            with connection.execute_wrapper(counter):
+                run_at = service.get_run_at()
+                for first_id, last_id in service.get_client_shards(shard_size=self.shard_size):
+                    self.deliver_shard(service, first_id=first_id, last_id=last_id, run_at=run_at, totals=totals)
+            duration = time.perf_counter() - started_at
+            cpu_time = time.process_time() - cpu_started_at
+        finally:
+            traced_peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+
+        processed = totals['sent'] + totals['failed']
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'params': self.params,
+            **totals,
+            'duration_s': round(duration, 4),
+            'sends_per_second': round(processed / duration, 2) if duration else None,
+            'cpu_s': round(cpu_time, 4),
+            'cpu_ms_per_send': round(cpu_time * 1000 / processed, 4) if processed else None,
+            'latency_ms': {
+                name: round(latencies.percentile(percent) * 1000, 3)
+                for name, percent in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+            },
+            'queries': counter.count,
+            'queries_per_send': round(counter.count / processed, 4) if processed else None,
+            'peak_memory': {
+                'tracemalloc_bytes': traced_peak,
+                'rss_before_delivery_kb': rss_before,
+                'rss_after_delivery_kb': get_rss_kb(),
+                'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            },
+        }
+
+    @staticmethod
+    def deliver_shard(service: NewsletterDeliveryService, first_id: int, last_id: int, run_at: datetime,
+                      totals: Dict[str, int]) -> None:
+        """
+        Отправляет шард так же, как задача send_newsletter_shard: при временном отказе почтового сервера
+        отправка повторяется (без задержки), при последней попытке письма записываются как неуспешные.
+        """
+        max_retries = settings.NEWSLETTER_SEND_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            try:
+                result = service.send_mail_to_clients(
+                    first_id=first_id, last_id=last_id, run_at=run_at, retry_transient=attempt < max_retries
+                )
+            except TransientDeliveryError as error:
+                result, deferred = error.result, True
+            else:
+                deferred = False
+            totals['sent'] += result['sent']
+            totals['failed'] += result['failed']
+            if not attempt:
+                totals['skipped'] += result['skipped']
+            if not deferred:
+                return
+            totals['retries'] += 1
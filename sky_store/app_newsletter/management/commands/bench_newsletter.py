@@ -0,0 +1,101 @@
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from app_newsletter.benchmark import NewsletterBenchmark
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного тестирования доставки рассылок.
+
+    Создаёт рассылку с заданным количеством клиентов и сообщений, отправляет её
+    на локальный фиктивный почтовый сервер с заданной задержкой и долей отказов
+    и сохраняет результаты (писем в секунду, перцентили времени отправки письма,
+    SQL-запросов на письмо, пиковое потребление памяти) в JSON-файл.
+    Созданные данные удаляются после завершения.
+    """
+    help = 'Benchmark newsletter delivery against a local fake SMTP server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='Number of clients')
+        parser.add_argument('--messages', type=int, default=3, help='Number of messages')
+        parser.add_argument(
+            '--shard-size', type=int, default=settings.NEWSLETTER_SHARD_SIZE, help='Clients per shard'
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help='Emails per SMTP connection')
+        parser.add_argument('--latency', type=float, default=0.0, help='SMTP server latency per email, ms')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of emails rejected by the server')
+        parser.add_argument(
+            '--connect-throttle-rate', type=float, default=0.0, help='Share of connections refused with 421'
+        )
+        parser.add_argument(
+            '--rcpt-throttle-rate', type=float, default=0.0, help='Share of RCPT commands deferred with 451'
+        )
+        parser.add_argument(
+            '--data-throttle-rate', type=float, default=0.0, help='Share of emails deferred with 451 after DATA'
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for server failures')
+        parser.add_argument('--rate-limit', type=float, default=None, help='Sending rate limit, emails per second')
+        parser.add_argument(
+            '--trace-memory', action='store_true', help='Measure peak Python memory with tracemalloc (slower)'
+        )
+        parser.add_argument(
+            '--backend', choices=['sync', 'async'], default='sync', help='Delivery backend'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=None, help='Concurrent sends per worker (async backend)'
+        )
+        parser.add_argument(
+            '--pool-size', type=int, default=None, help='SMTP connections per worker (async backend)'
+        )
+        parser.add_argument(
+            '--no-payload-cache', action='store_true', help='Build every email from scratch instead of cached payloads'
+        )
+        parser.add_argument('--output', default=None, help='Path of the JSON result file')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['messages'] < 1 or options['shard_size'] < 1:
+            raise CommandError('--clients, --messages and --shard-size must be positive')
+        for option in ('failure_rate', 'connect_throttle_rate', 'rcpt_throttle_rate', 'data_throttle_rate'):
+            if not 0 <= options[option] <= 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be between 0 and 1")
+
+        benchmark = NewsletterBenchmark(
+            clients=options['clients'],
+            messages=options['messages'],
+            shard_size=options['shard_size'],
+            latency=options['latency'] / 1000,
+            failure_rate=options['failure_rate'],
+            chunk_size=options['chunk_size'],
+            seed=options['seed'],
+            rate_limit=options['rate_limit'],
+            trace_memory=options['trace_memory'],
+            payload_cache=not options['no_payload_cache'],
+            backend=options['backend'],
+            concurrency=options['concurrency'],
+            pool_size=options['pool_size'],
+            connect_throttle_rate=options['connect_throttle_rate'],
+            rcpt_throttle_rate=options['rcpt_throttle_rate'],
+            data_throttle_rate=options['data_throttle_rate']
+        )
+        result = benchmark.run()
+
+        output = options['output'] or f'bench_newsletter_{datetime.now():%Y%m%d_%H%M%S}.json'
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+        latency = result['latency_ms']
+        self.stdout.write(
+            f"sent {result['sent']}, failed {result['failed']}, shard retries {result['retries']} "
+            f"in {result['duration_s']} s "
+            f"({result['sends_per_second']} emails/s, {result['cpu_ms_per_send']} ms CPU per email)\n"
+            f"latency p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms\n"
+            f"queries per email {result['queries_per_send']}, "
+            f"RSS before delivery {result['peak_memory']['rss_before_delivery_kb']} KB, "
+            f"after {result['peak_memory']['rss_after_delivery_kb']} KB, "
+            f"max RSS {result['peak_memory']['max_rss_kb']} KB"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Results were written to {output}.'))
@@ -0,0 +1,48 @@
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import BaseCommand, CommandError
+
+from app_newsletter.archive import NewsletterLogArchive
+
+
+class Command(BaseCommand):
+    """
+    Команда для выгрузки логов отправки писем в архив в формате Parquet или Arrow IPC.
+
+    Логи читаются порциями по возрастанию идентификатора и записываются в сжатые файлы,
+    разбитые по дням. Повторный запуск продолжает выгрузку с последнего выгруженного лога.
+    Для работы нужен пакет pyarrow.
+    """
+    help = 'Export newsletter logs to day-partitioned Parquet or Arrow IPC files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir', default=settings.NEWSLETTER_LOG_ARCHIVE_DIR, help='Archive directory'
+        )
+        parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet', help='File format')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched per query')
+        parser.add_argument(
+            '--until', type=date.fromisoformat, default=None,
+            help='Export logs before this UTC date (YYYY-MM-DD), defaults to today'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        try:
+            archive = NewsletterLogArchive(directory=str(options['output_dir']), file_format=options['format'])
+        except ImproperlyConfigured as error:
+            raise CommandError(f'{error}. Install it with "pip install pyarrow".')
+
+        until = options['until']
+        if until is not None:
+            until = datetime(until.year, until.month, until.day, tzinfo=timezone.utc)
+
+        result = archive.export(chunk_size=options['chunk_size'], until=until)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {result["rows"]} logs into {result["files"]} files, '
+            f'last exported id {archive.get_last_id()}.'
+        ))
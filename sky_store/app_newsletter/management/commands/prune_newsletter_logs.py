@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from app_newsletter.partitions import NewsletterLogPartitions
+
+
+class Command(BaseCommand):
+    """
+    Команда для удаления логов отправки писем старше срока хранения.
+
+    В PostgreSQL устаревшие помесячные секции таблицы логов удаляются целиком
+    (перед удалением их можно выгрузить в архив), для остальных СУБД устаревшие
+    логи удаляются запросом DELETE. Также создаёт секции на следующие месяцы.
+    С параметром --dry-run ничего не изменяет, а только выводит секции, которые были бы созданы и удалены.
+    """
+    help = 'Drop or archive newsletter log partitions past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months', type=int, default=settings.NEWSLETTER_LOG_RETENTION_MONTHS,
+            help='Number of full months of logs to keep besides the current one'
+        )
+        parser.add_argument('--archive-dir', default=None, help='Directory for gzipped CSV archives of dropped logs')
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only list partitions that would be created or dropped'
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_months'] < 0:
+            raise CommandError('--retention-months must not be negative')
+
+        created = NewsletterLogPartitions.create_partitions(dry_run=options['dry_run'])
+        if created:
+            prefix = 'Partitions to create' if options['dry_run'] else 'Created partitions'
+            self.stdout.write(f'{prefix}: {", ".join(created)}')
+
+        dropped, deleted = NewsletterLogPartitions.prune(
+            retention_months=options['retention_months'],
+            archive_dir=options['archive_dir'],
+            dry_run=options['dry_run']
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Partitions to drop: {", ".join(dropped) or "none"}')
+            if not NewsletterLogPartitions.is_supported():
+                self.stdout.write(f'Logs to delete: {deleted}')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Dropped partitions: {", ".join(dropped) or "none"}. Deleted rows: {deleted}.'
+        ))
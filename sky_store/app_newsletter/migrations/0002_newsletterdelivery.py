@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 10:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_newsletter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_at', models.DateTimeField(verbose_name='Плановое время запуска')),
+                ('delivered_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата и время доставки')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_newsletter.client', verbose_name='Клиент')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_newsletter.message', verbose_name='Сообщение')),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='app_newsletter.newsletter', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Доставка письма',
+                'verbose_name_plural': 'Доставки писем',
+                'db_table': 'newsletter_deliveries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='newsletterdelivery',
+            constraint=models.UniqueConstraint(fields=('newsletter', 'run_at', 'client', 'message'), name='unique_newsletter_delivery'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 10:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_newsletter', '0002_newsletterdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterRunStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_at', models.DateTimeField(verbose_name='Плановое время запуска')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Отправлено писем')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Ошибок отправки')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_stats', to='app_newsletter.newsletter', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Статистика запуска рассылки',
+                'verbose_name_plural': 'Статистика запусков рассылок',
+                'db_table': 'newsletter_run_stats',
+                'ordering': ['-run_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='newsletterrunstats',
+            constraint=models.UniqueConstraint(fields=('newsletter', 'run_at'), name='unique_newsletter_run_stats'),
+        ),
+    ]
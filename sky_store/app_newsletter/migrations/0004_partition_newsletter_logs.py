@@ -0,0 +1,97 @@
+# Generated by Django 4.2 on 2026-10-18 10:27
+
+from datetime import date, datetime, timezone
+
+from django.db import migrations, models
+
+PARTITIONS_AHEAD = 3
+
+CREATE_PARTITIONED_TABLE_SQL = """
+ALTER TABLE "newsletter_logs" RENAME TO "newsletter_logs_unpartitioned";
+CREATE TABLE "newsletter_logs" (
+    "id" bigint NOT NULL,
+    "date_time" timestamp with time zone NOT NULL,
+    "status" varchar(1) NOT NULL,
+    "server_response" text NOT NULL,
+    "client_id" bigint NULL,
+    "message_id" bigint NULL,
+    "newsletter_id" bigint NULL,
+    PRIMARY KEY ("id", "date_time")
+) PARTITION BY RANGE ("date_time");
+CREATE TABLE "newsletter_logs_default" PARTITION OF "newsletter_logs" DEFAULT;
+"""
+
+MOVE_ROWS_SQL = """
+INSERT INTO "newsletter_logs" ("id", "date_time", "status", "server_response", "client_id", "message_id", "newsletter_id")
+SELECT "id", "date_time", "status", "server_response", "client_id", "message_id", "newsletter_id"
+FROM "newsletter_logs_unpartitioned";
+DROP TABLE "newsletter_logs_unpartitioned";
+CREATE SEQUENCE "newsletter_logs_id_seq" OWNED BY "newsletter_logs"."id";
+SELECT setval('"newsletter_logs_id_seq"', COALESCE((SELECT max("id") FROM "newsletter_logs"), 0) + 1, false);
+ALTER TABLE "newsletter_logs" ALTER COLUMN "id" SET DEFAULT nextval('"newsletter_logs_id_seq"');
+ALTER TABLE "newsletter_logs" ADD CONSTRAINT "newsletter_logs_client_id_ec0582c4_fk_clients_id"
+    FOREIGN KEY ("client_id") REFERENCES "clients" ("id") DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE "newsletter_logs" ADD CONSTRAINT "newsletter_logs_message_id_ce234c62_fk_messages_id"
+    FOREIGN KEY ("message_id") REFERENCES "messages" ("id") DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE "newsletter_logs" ADD CONSTRAINT "newsletter_logs_newsletter_id_b607153e_fk_newsletters_id"
+    FOREIGN KEY ("newsletter_id") REFERENCES "newsletters" ("id") DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX "newsletter_logs_client_id_ec0582c4" ON "newsletter_logs" ("client_id");
+CREATE INDEX "newsletter_logs_message_id_ce234c62" ON "newsletter_logs" ("message_id");
+CREATE INDEX "newsletter_logs_newsletter_id_b607153e" ON "newsletter_logs" ("newsletter_id");
+"""
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_newsletter_logs(apps, schema_editor):
+    """
+    Преобразует таблицу логов отправки писем в PostgreSQL в таблицу, секционированную по месяцам поля date_time.
+    Создаёт секции для месяцев с существующими логами и на PARTITIONS_AHEAD месяцев вперёд,
+    а также секцию по умолчанию. Для остальных СУБД таблица остаётся обычной.
+    Обратная миграция оставляет таблицу секционированной.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('newsletter_logs')")
+        if cursor.fetchone()[0] == 'p':
+            return
+        cursor.execute(CREATE_PARTITIONED_TABLE_SQL)
+
+        now = datetime.now(timezone.utc)
+        cursor.execute('SELECT min("date_time") FROM "newsletter_logs_unpartitioned"')
+        first = min(cursor.fetchone()[0] or now, now).astimezone(timezone.utc)
+        month = date(first.year, first.month, 1)
+        last_month = add_months(date(now.year, now.month, 1), PARTITIONS_AHEAD)
+        while month <= last_month:
+            next_month = add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE "newsletter_logs_y{month.year}m{month.month:02d}" '
+                f'PARTITION OF "newsletter_logs" FOR VALUES FROM (%s) TO (%s)',
+                [
+                    datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+                    datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc),
+                ]
+            )
+            month = next_month
+
+        cursor.execute(MOVE_ROWS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_newsletter', '0003_newsletterrunstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_newsletter_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='newsletterlog',
+            index=models.Index(fields=['date_time', 'id'], name='newsletter_logs_dt_id_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2 on 2026-10-18 10:32
+
+from datetime import date, datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def add_month(day: date, day_of_month: int) -> date:
+    """
+    Возвращает дату с номером дня day_of_month в следующем за day месяце.
+    """
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return date(year, month, day_of_month)
+
+
+def get_next_run_at(run_time: time, frequency: str, created_at: datetime, after: datetime) -> datetime:
+    """
+    Копия app_newsletter.schedule.get_next_run_at на момент создания миграции:
+    миграция не должна зависеть от кода приложения, который может измениться.
+    """
+    local_after = timezone.localtime(after)
+    created_at = timezone.localtime(created_at)
+    day = local_after.date()
+
+    if frequency == 'W':
+        day += timedelta(days=(created_at.weekday() - day.weekday()) % 7)
+    elif frequency == 'M':
+        day_of_month = min(created_at.day, 28)
+        day = day.replace(day=day_of_month) if day.day <= day_of_month else add_month(day, day_of_month)
+
+    run_at = timezone.make_aware(datetime.combine(day, run_time))
+    if run_at > after:
+        return run_at
+
+    if frequency == 'W':
+        day += timedelta(days=7)
+    elif frequency == 'M':
+        day = add_month(day, min(created_at.day, 28))
+    else:
+        day += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, run_time))
+
+
+def schedule_newsletters(apps, schema_editor):
+    """
+    Заполняет время следующего запуска активных незавершённых рассылок
+    и удаляет периодические задачи celery-beat, созданные для отдельных рассылок.
+    """
+    Newsletter = apps.get_model('app_newsletter', 'Newsletter')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+
+    now = timezone.now()
+    newsletters = list(Newsletter.objects.filter(is_active=True).exclude(status='F'))
+    for newsletter in newsletters:
+        newsletter.next_run_at = get_next_run_at(newsletter.time, newsletter.frequency, newsletter.created_at, now)
+    Newsletter.objects.bulk_update(newsletters, ['next_run_at'], batch_size=1000)
+
+    PeriodicTask.objects.filter(task='app_newsletter.tasks.send_newsletter').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_newsletter', '0004_partition_newsletter_logs'),
+        ('django_celery_beat', '0018_improve_crontab_helptext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Время следующего запуска'),
+        ),
+        migrations.RunPython(schedule_newsletters, migrations.RunPython.noop),
+    ]
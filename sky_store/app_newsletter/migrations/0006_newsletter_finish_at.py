@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 10:58
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_finish_at(apps, schema_editor):
+    """
+    Заполняет время завершения рассылок по дате и времени завершения (по часовому поясу проекта).
+    """
+    Newsletter = apps.get_model('app_newsletter', 'Newsletter')
+
+    newsletters = list(Newsletter.objects.only('pk', 'finish_date', 'finish_time'))
+    for newsletter in newsletters:
+        newsletter.finish_at = timezone.make_aware(datetime.combine(newsletter.finish_date, newsletter.finish_time))
+    Newsletter.objects.bulk_update(newsletters, ['finish_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_newsletter', '0005_newsletter_next_run_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='finish_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Время завершения'),
+        ),
+        migrations.RunPython(fill_finish_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='newsletter',
+            name='finish_at',
+            field=models.DateTimeField(db_index=True, editable=False, verbose_name='Время завершения'),
+        ),
+    ]
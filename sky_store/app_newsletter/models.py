@@ -1,5 +1,11 @@
+from datetime import datetime
+from typing import Optional
+
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
+
+from .schedule import get_finish_at, get_next_run_at
 
 NULLABLE = {'blank': True, 'null': True}
 
@@ -59,6 +65,8 @@ class Newsletter(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     finish_date = models.DateField(verbose_name='Дата завершения рассылки')
     finish_time = models.TimeField(verbose_name='Время завершения рассылки')
+    finish_at = models.DateTimeField(verbose_name='Время завершения', db_index=True, editable=False)
+    next_run_at = models.DateTimeField(verbose_name='Время следующего запуска', db_index=True, **NULLABLE)
 
     class Meta:
         db_table = 'newsletters'
@@ -68,6 +76,33 @@ class Newsletter(models.Model):
     def __str__(self):
         return f"Рассылка #{self.pk}"
 
+    def save(self, *args, **kwargs):
+        # Дата и время могут быть переданы строками, например Newsletter.objects.create(finish_date='2030-01-01')
+        for name in ('time', 'finish_date', 'finish_time'):
+            setattr(self, name, self._meta.get_field(name).to_python(getattr(self, name)))
+        self.finish_at = get_finish_at(self.finish_date, self.finish_time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'finish_date', 'finish_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'finish_at'}
+        super().save(*args, **kwargs)
+
+    def is_finished(self, now: Optional[datetime] = None) -> bool:
+        """
+        Проверяет, наступило ли время завершения рассылки.
+        """
+        return self.finish_at <= (now or timezone.now())
+
+    def get_next_run_at(self, after: Optional[datetime] = None) -> datetime:
+        """
+        Возвращает ближайшее время запуска рассылки после after (по умолчанию - после текущего момента).
+        """
+        return get_next_run_at(
+            run_time=self.time,
+            frequency=self.frequency,
+            created_at=self.created_at or timezone.now(),
+            after=after or timezone.now()
+        )
+
     def get_absolute_url(self):
         return reverse('app_newsletter:newsletter_detail', args=[str(self.pk)])
 
@@ -115,6 +150,88 @@ class NewsletterLog(models.Model):
         db_table = 'newsletter_logs'
         verbose_name = 'Лог отправки письма'
         verbose_name_plural = 'Логи отправок писем'
+        indexes = [
+            models.Index(fields=['date_time', 'id'], name='newsletter_logs_dt_id_idx')
+        ]
 
     def __str__(self):
         return f'Лог #{self.pk}'
+
+
+class NewsletterDelivery(models.Model):
+    """
+    Модель, описывающая доставку сообщения рассылки клиенту в рамках одного запуска рассылки.
+    Используется, чтобы при повторном выполнении запуска не отправлять письмо повторно.
+    """
+    newsletter = models.ForeignKey(
+        Newsletter, on_delete=models.CASCADE, related_name='deliveries', verbose_name='Рассылка'
+    )
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, verbose_name='Сообщение')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
+    run_at = models.DateTimeField(verbose_name='Плановое время запуска')
+    delivered_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время доставки')
+
+    class Meta:
+        db_table = 'newsletter_deliveries'
+        verbose_name = 'Доставка письма'
+        verbose_name_plural = 'Доставки писем'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['newsletter', 'run_at', 'client', 'message'],
+                name='unique_newsletter_delivery'
+            )
+        ]
+
+    def __str__(self):
+        return f'Доставка #{self.pk}'
+
+
+class NewsletterRunStats(models.Model):
+    """
+    Модель, описывающая статистику отправки писем в рамках одного запуска рассылки.
+    Обновляется в одной транзакции с записью логов отправки писем,
+    поэтому для вывода статистики не нужно подсчитывать логи.
+    """
+    newsletter = models.ForeignKey(
+        Newsletter, on_delete=models.CASCADE, related_name='run_stats', verbose_name='Рассылка'
+    )
+    run_at = models.DateTimeField(verbose_name='Плановое время запуска')
+    sent = models.PositiveIntegerField(default=0, verbose_name='Отправлено писем')
+    failed = models.PositiveIntegerField(default=0, verbose_name='Ошибок отправки')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')
+
+    class Meta:
+        db_table = 'newsletter_run_stats'
+        verbose_name = 'Статистика запуска рассылки'
+        verbose_name_plural = 'Статистика запусков рассылок'
+        ordering = ['-run_at']
+        constraints = [
+            models.UniqueConstraint(fields=['newsletter', 'run_at'], name='unique_newsletter_run_stats')
+        ]
+
+    def __str__(self):
+        return f'Запуск {self.newsletter} от {self.run_at}'
+
+    @classmethod
+    def increment(cls, newsletter_id: int, run_at: datetime, sent: int, failed: int,
+                  last_error: Optional[str] = None) -> None:
+        """
+        Увеличивает счётчики отправленных и неотправленных писем запуска рассылки.
+        Если статистики запуска ещё нет, создаёт её.
+
+        :param newsletter_id: Идентификатор рассылки.
+        :param run_at: Плановое время запуска рассылки.
+        :param sent: Количество отправленных писем.
+        :param failed: Количество неотправленных писем.
+        :param last_error: Текст последней ошибки отправки.
+        """
+        cls.objects.bulk_create([cls(newsletter_id=newsletter_id, run_at=run_at)], ignore_conflicts=True)
+        values = {
+            'sent': models.F('sent') + sent,
+            'failed': models.F('failed') + failed,
+            'updated_at': timezone.now(),
+        }
+        if last_error:
+            values['last_error'] = last_error
+        cls.objects.filter(newsletter_id=newsletter_id, run_at=run_at).update(**values)
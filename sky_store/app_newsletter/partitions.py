@@ -0,0 +1,225 @@
+import csv
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import NewsletterLog
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    Возвращает первое число месяца, отстоящего от month на months месяцев.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class NewsletterLogPartitions:
+    """
+    Класс, описывающий помесячное секционирование таблицы логов отправки писем.
+
+    В PostgreSQL таблица newsletter_logs секционирована по месяцам (по UTC) поля date_time:
+    секции newsletter_logs_yYYYYmMM создаются заранее, записи вне созданных секций
+    попадают в секцию newsletter_logs_default. Устаревшие секции удаляются целиком.
+    Для остальных СУБД таблица не секционирована, устаревшие логи удаляются запросом DELETE.
+    """
+    TABLE = 'newsletter_logs'
+    DEFAULT_PARTITION = 'newsletter_logs_default'
+    PARTITION_NAME = re.compile(r'^newsletter_logs_y(\d{4})m(\d{2})$')
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        """
+        Проверяет, секционирована ли таблица логов.
+        """
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [cls.TABLE])
+            row = cursor.fetchone()
+        return row is not None and row[0] == 'p'
+
+    @classmethod
+    def partition_name(cls, month: date) -> str:
+        return f'{cls.TABLE}_y{month.year}m{month.month:02d}'
+
+    @staticmethod
+    def month_start(month: date) -> datetime:
+        """
+        Возвращает начало месяца по UTC.
+        """
+        return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def current_month(cls) -> date:
+        now = timezone.now().astimezone(dt_timezone.utc)
+        return date(now.year, now.month, 1)
+
+    @classmethod
+    def get_partitions(cls) -> List[Tuple[str, date]]:
+        """
+        Возвращает помесячные секции таблицы логов, упорядоченные по месяцу.
+
+        :return: Пары (имя секции, первое число месяца).
+        """
+        if not cls.is_supported():
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(%s)",
+                [cls.TABLE]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = []
+        for name in names:
+            match = cls.PARTITION_NAME.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @classmethod
+    def create_partitions(cls, months_ahead: Optional[int] = None, dry_run: bool = False) -> List[str]:
+        """
+        Создаёт секции для текущего месяца и months_ahead следующих месяцев, если их ещё нет.
+
+        :param months_ahead: Количество месяцев вперёд (по умолчанию - NEWSLETTER_LOG_PARTITIONS_AHEAD).
+        :param dry_run: Только вернуть имена недостающих секций, не создавая их.
+        :return: Имена созданных (при dry_run - недостающих) секций.
+        """
+        if not cls.is_supported():
+            return []
+        if months_ahead is None:
+            months_ahead = settings.NEWSLETTER_LOG_PARTITIONS_AHEAD
+
+        existing = {name for name, _ in cls.get_partitions()}
+        created = []
+        current_month = cls.current_month()
+        for offset in range(months_ahead + 1):
+            month = add_months(current_month, offset)
+            name = cls.partition_name(month)
+            if name in existing:
+                continue
+            created.append(name)
+            if dry_run:
+                continue
+            cls._create_partition(name, month)
+        return created
+
+    @classmethod
+    def _create_partition(cls, name: str, month: date) -> None:
+        """
+        Создаёт секцию за месяц в одной транзакции.
+        Если секция создаётся с опозданием и в секции по умолчанию уже есть логи за этот месяц
+        (PostgreSQL в этом случае не позволяет создать секцию), секция по умолчанию на время
+        отсоединяется, а её логи за месяц переносятся в новую секцию.
+        """
+        start, end = cls.month_start(month), cls.month_start(add_months(month, 1))
+        columns = ', '.join(f'"{field.column}"' for field in NewsletterLog._meta.concrete_fields)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{cls.DEFAULT_PARTITION}" WHERE "date_time" >= %s AND "date_time" < %s)',
+                [start, end]
+            )
+            has_default_rows = cursor.fetchone()[0]
+            if has_default_rows:
+                cursor.execute(f'ALTER TABLE "{cls.TABLE}" DETACH PARTITION "{cls.DEFAULT_PARTITION}"')
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{cls.TABLE}" FOR VALUES FROM (%s) TO (%s)', [start, end]
+            )
+            if has_default_rows:
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM "{cls.DEFAULT_PARTITION}" '
+                    f'WHERE "date_time" >= %s AND "date_time" < %s RETURNING {columns}) '
+                    f'INSERT INTO "{cls.TABLE}" ({columns}) SELECT {columns} FROM moved',
+                    [start, end]
+                )
+                moved = cursor.rowcount
+                cursor.execute(f'ALTER TABLE "{cls.TABLE}" ATTACH PARTITION "{cls.DEFAULT_PARTITION}" DEFAULT')
+                logger.info(f'В секцию {name} перенесено логов из секции по умолчанию: {moved}')
+        logger.info(f'Создана секция логов отправки писем {name}')
+
+    @classmethod
+    def prune(cls, retention_months: Optional[int] = None, archive_dir: Optional[str] = None,
+              dry_run: bool = False) -> Tuple[List[str], int]:
+        """
+        Удаляет логи старше срока хранения.
+        В PostgreSQL устаревшие секции отсоединяются и удаляются целиком,
+        а устаревшие записи секции по умолчанию удаляются запросом DELETE.
+        Перед удалением логи можно выгрузить в архив (CSV, сжатый gzip).
+
+        :param retention_months: Срок хранения в месяцах (по умолчанию - NEWSLETTER_LOG_RETENTION_MONTHS).
+        :param archive_dir: Каталог для архивов. Если не указан, логи удаляются без архивирования.
+        :param dry_run: Только вернуть список устаревших секций, ничего не удаляя.
+        :return: Имена удалённых секций и количество удалённых запросом DELETE записей.
+        """
+        if retention_months is None:
+            retention_months = settings.NEWSLETTER_LOG_RETENTION_MONTHS
+        cutoff_month = add_months(cls.current_month(), -retention_months)
+        cutoff = cls.month_start(cutoff_month)
+
+        if not cls.is_supported():
+            queryset = NewsletterLog.objects.filter(date_time__lt=cutoff)
+            if dry_run:
+                return [], queryset.count()
+            if archive_dir:
+                cls._archive_queryset(queryset, cls._archive_path(archive_dir, f'{cls.TABLE}_before_{cutoff_month}'))
+            deleted, _ = queryset.delete()
+            return [], deleted
+
+        expired = [name for name, month in cls.get_partitions() if month < cutoff_month]
+        if dry_run:
+            return expired, 0
+
+        for name in expired:
+            if archive_dir:
+                cls._archive_table(name, cls._archive_path(archive_dir, name))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{cls.TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+            logger.info(f'Удалена секция логов отправки писем {name}')
+
+        default_rows = NewsletterLog.objects.filter(date_time__lt=cutoff)
+        if archive_dir and default_rows.exists():
+            cls._archive_queryset(
+                default_rows, cls._archive_path(archive_dir, f'{cls.DEFAULT_PARTITION}_before_{cutoff_month}')
+            )
+        deleted, _ = default_rows.delete()
+        return expired, deleted
+
+    @staticmethod
+    def _archive_path(archive_dir: str, name: str) -> str:
+        os.makedirs(archive_dir, exist_ok=True)
+        return os.path.join(archive_dir, f'{name}.csv.gz')
+
+    @classmethod
+    def _archive_table(cls, table: str, path: str) -> None:
+        """
+        Выгружает таблицу в CSV-файл, сжатый gzip, командой COPY.
+        """
+        with gzip.open(path, 'wb') as file, connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{table}" TO STDOUT WITH (FORMAT csv, HEADER)', file)
+        logger.info(f'Секция логов отправки писем {table} выгружена в {path}')
+
+    @staticmethod
+    def _archive_queryset(queryset, path: str) -> None:
+        """
+        Выгружает логи из выборки в CSV-файл, сжатый gzip.
+        """
+        fields = [field.attname for field in NewsletterLog._meta.concrete_fields]
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(fields)
+            writer.writerows(queryset.order_by('pk').values_list(*fields).iterator())
+        logger.info(f'Логи отправки писем выгружены в {path}')
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, make_msgid
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.mail.message import DNS_NAME, forbid_multi_line_headers
+
+from .models import Message
+
+LINESEP = b'\r\n'
+
+
+def get_message_version(message: Message, from_email: str) -> str:
+    """
+    Возвращает хеш содержимого сообщения, меняющийся при любом изменении темы, текста или отправителя.
+    """
+    content = '\0'.join([message.subject, message.body, from_email])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class EmailPayload:
+    """
+    Класс, описывающий заранее сформированное письмо с сообщением рассылки.
+
+    Заголовки, общие для всех получателей, и закодированное тело письма формируются один раз,
+    при отправке к ним добавляются только заголовки получателя (To, Date, Message-ID).
+    Сформированные письма кешируются в памяти процесса по идентификатору сообщения
+    и хешу его содержимого, поэтому изменённое сообщение формируется заново.
+    """
+    _cache: 'OrderedDict[tuple, EmailPayload]' = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, headers: bytes, body: bytes, from_email: str, encoding: Optional[str] = None) -> None:
+        """
+        :param headers: Общие заголовки письма, каждый с переводом строки CRLF.
+        :param body: Закодированное тело письма с переводами строк CRLF.
+        :param from_email: Отправитель.
+        :param encoding: Кодировка письма.
+        """
+        self.headers = headers
+        self.body = body
+        self.from_email = from_email
+        self.encoding = encoding or settings.DEFAULT_CHARSET
+
+    @classmethod
+    def build(cls, message: Message, from_email: str) -> 'EmailPayload':
+        """
+        Формирует письмо с сообщением без заголовков получателя.
+        """
+        mime = EmailMessage(subject=message.subject, body=message.body, from_email=from_email).message()
+        for name in ('Date', 'Message-ID'):
+            del mime[name]
+        headers, body = mime.as_bytes(linesep='\r\n').split(LINESEP * 2, 1)
+        return cls(headers=headers + LINESEP, body=body, from_email=from_email)
+
+    @classmethod
+    def for_message(cls, message: Message, from_email: Optional[str] = None) -> 'EmailPayload':
+        """
+        Возвращает сформированное письмо с сообщением из кеша, при необходимости формируя его.
+
+        :param message: Экземпляр класса Сообщение (Message).
+        :param from_email: Отправитель (по умолчанию - DEFAULT_FROM_EMAIL).
+        """
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        if not from_email:
+            raise ImproperlyConfigured('Не задан отправитель писем рассылки (EMAIL_HOST_USER)')
+        key = (message.pk, get_message_version(message, from_email))
+        with cls._lock:
+            payload = cls._cache.get(key)
+            if payload is not None:
+                cls._cache.move_to_end(key)
+                return payload
+
+        payload = cls.build(message, from_email)
+        with cls._lock:
+            cls._cache[key] = payload
+            while len(cls._cache) > settings.NEWSLETTER_PAYLOAD_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return payload
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._lock:
+            cls._cache.clear()
+
+    def render(self, to: List[str]) -> bytes:
+        """
+        Возвращает письмо получателям to с переводами строк CRLF.
+        """
+        recipient_headers = [
+            ('To', forbid_multi_line_headers('To', ', '.join(to), self.encoding)[1]),
+            ('Date', formatdate(localtime=settings.EMAIL_USE_LOCALTIME)),
+            ('Message-ID', make_msgid(domain=DNS_NAME)),
+        ]
+        headers = b''.join(f'{name}: {value}'.encode('ascii') + LINESEP for name, value in recipient_headers)
+        return self.headers + headers + LINESEP + self.body
+
+
+class RenderedMessage:
+    """
+    Письмо, сформированное из EmailPayload, с интерфейсом, который используют почтовые бэкенды Django.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def as_bytes(self, unixfrom: bool = False, linesep: str = '\n') -> bytes:
+        if linesep == '\r\n':
+            return self.data
+        return self.data.replace(LINESEP, linesep.encode('ascii'))
+
+    def as_string(self, unixfrom: bool = False, linesep: str = '\n') -> str:
+        return self.as_bytes(linesep=linesep).decode('utf-8', errors='replace')
+
+    def get_charset(self) -> None:
+        return None
+
+
+class PreparedEmailMessage(EmailMessage):
+    """
+    Письмо, которое не формируется заново для каждого получателя, а берётся из EmailPayload.
+    """
+
+    def __init__(self, payload: EmailPayload, to: List[str]) -> None:
+        """
+        :param payload: Сформированное письмо с сообщением.
+        :param to: Получатели.
+        """
+        super().__init__(from_email=payload.from_email, to=to)
+        self.payload = payload
+        self.encoding = payload.encoding
+
+    def message(self) -> RenderedMessage:
+        return RenderedMessage(self.payload.render(self.to))
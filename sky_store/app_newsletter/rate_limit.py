@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+PAUSE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local seconds = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens')) or capacity
+tokens = math.min(tokens, -rate * seconds)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate + seconds) + 60)
+return 1
+"""
+
+
+class RedisTokenBucket:
+    """
+    Корзина токенов в Redis, общая для всех воркеров.
+    Пополнение и списание токена выполняются атомарно Lua-скриптом по часам сервера Redis.
+    """
+    KEY = 'newsletter:smtp:bucket:{account}'
+
+    def __init__(self, client: redis.Redis, account: str, rate: float, capacity: float) -> None:
+        self.key = self.KEY.format(account=account)
+        self.rate = rate
+        self.capacity = capacity
+        self.acquire_script = client.register_script(ACQUIRE_SCRIPT)
+        self.pause_script = client.register_script(PAUSE_SCRIPT)
+
+    def take(self) -> float:
+        """
+        Списывает токен, если он есть.
+        :return: Время ожидания следующего токена в секундах (0 - токен списан).
+        """
+        return float(self.acquire_script(keys=[self.key], args=[self.rate, self.capacity]))
+
+    def pause(self, seconds: float) -> None:
+        """
+        Опустошает корзину так, чтобы новые токены появились не раньше чем через seconds секунд.
+        """
+        self.pause_script(keys=[self.key], args=[self.rate, self.capacity, seconds])
+
+
+class LocalTokenBucket:
+    """
+    Корзина токенов в памяти процесса.
+    Используется, если Redis недоступен: ограничение действует только в пределах процесса.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -self.rate * seconds)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class SMTPRateLimiter:
+    """
+    Класс, описывающий ограничение скорости отправки писем через учётную запись почтового сервера.
+
+    Скорость задаётся для каждой учётной записи в настройке NEWSLETTER_RATE_LIMITS:
+    rate - писем в секунду, capacity - допустимый всплеск. Учётные записи, которых нет
+    в настройке, ограничиваются параметрами 'default'. Корзина токенов хранится в Redis
+    и общая для всех воркеров; если Redis недоступен, на REDIS_RETRY_INTERVAL секунд
+    используется корзина в памяти процесса.
+    """
+    REDIS_RETRY_INTERVAL = 30
+
+    _redis_client = None
+    _redis_retry_at = 0.0
+    _local_buckets: Dict[str, LocalTokenBucket] = {}
+    _local_lock = threading.Lock()
+
+    def __init__(self, account: str, rate: float, capacity: float) -> None:
+        """
+        :param account: Учётная запись почтового сервера.
+        :param rate: Количество писем в секунду.
+        :param capacity: Количество писем, которое можно отправить без ожидания после простоя.
+        """
+        self.account = account
+        self.rate = rate
+        self.capacity = capacity
+        self.redis_bucket = None
+
+    @classmethod
+    def for_account(cls, account: Optional[str]) -> Optional['SMTPRateLimiter']:
+        """
+        Возвращает ограничитель для учётной записи или None, если скорость не ограничена.
+        :param account: Учётная запись почтового сервера.
+        """
+        account = account or ''
+        limits = settings.NEWSLETTER_RATE_LIMITS
+        config = limits.get(account, limits.get('default'))
+        if not config:
+            return None
+        return cls(account=account, rate=config['rate'], capacity=config.get('capacity', config['rate']))
+
+    def acquire(self) -> None:
+        """
+        Ожидает, пока в корзине появится токен, и списывает его.
+        """
+        while True:
+            wait = self._call('take')
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """
+        Асинхронно ожидает, пока в корзине появится токен, и списывает его.
+        Обращение к Redis выполняется в отдельном потоке, чтобы не останавливать цикл событий
+        (и все отправляемые в нём письма) на время запроса или таймаута недоступного Redis.
+        """
+        while True:
+            wait = await asyncio.to_thread(self._call, 'take')
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает отправку через учётную запись на seconds секунд для всех воркеров.
+        Используется, когда почтовый сервер сообщает о превышении лимита.
+        """
+        self._call('pause', seconds)
+
+    def _call(self, method: str, *args):
+        if time.monotonic() >= SMTPRateLimiter._redis_retry_at:
+            try:
+                return getattr(self._get_redis_bucket(), method)(*args)
+            except redis.RedisError as error:
+                SMTPRateLimiter._redis_retry_at = time.monotonic() + self.REDIS_RETRY_INTERVAL
+                logger.warning(f'Redis недоступен, ограничение скорости действует в пределах процесса: {error}')
+        return getattr(self._get_local_bucket(), method)(*args)
+
+    def _get_redis_bucket(self) -> RedisTokenBucket:
+        if SMTPRateLimiter._redis_client is None:
+            SMTPRateLimiter._redis_client = redis.Redis.from_url(
+                settings.NEWSLETTER_RATE_LIMIT_REDIS_URL, socket_timeout=1, socket_connect_timeout=1
+            )
+        if self.redis_bucket is None:
+            self.redis_bucket = RedisTokenBucket(
+                client=SMTPRateLimiter._redis_client, account=self.account, rate=self.rate, capacity=self.capacity
+            )
+        return self.redis_bucket
+
+    def _get_local_bucket(self) -> LocalTokenBucket:
+        with self._local_lock:
+            bucket = self._local_buckets.get(self.account)
+            if bucket is None or (bucket.rate, bucket.capacity) != (self.rate, self.capacity):
+                bucket = LocalTokenBucket(rate=self.rate, capacity=self.capacity)
+                self._local_buckets[self.account] = bucket
+            return bucket
+
+
+def get_retry_delay(retries: int) -> float:
+    """
+    Возвращает задержку перед повторной попыткой отправки (экспоненциальная задержка с полным джиттером).
+    :param retries: Количество уже выполненных повторных попыток.
+    """
+    ceiling = min(settings.NEWSLETTER_RETRY_BACKOFF_MAX, settings.NEWSLETTER_RETRY_BACKOFF_BASE * 2 ** retries)
+    return random.uniform(0, ceiling)
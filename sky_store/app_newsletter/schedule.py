@@ -0,0 +1,52 @@
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def add_month(day: date, day_of_month: int) -> date:
+    """
+    Возвращает дату с номером дня day_of_month в следующем за day месяце.
+    """
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return date(year, month, day_of_month)
+
+
+def get_finish_at(finish_date: date, finish_time: time) -> datetime:
+    """
+    Возвращает время завершения рассылки по часовому поясу проекта.
+    """
+    return timezone.make_aware(datetime.combine(finish_date, finish_time))
+
+
+def get_next_run_at(run_time: time, frequency: str, created_at: datetime, after: datetime) -> datetime:
+    """
+    Возвращает ближайшее время запуска рассылки после after.
+    Рассылка запускается в run_time по часовому поясу проекта: каждый день (D),
+    в день недели создания рассылки (W) или в день месяца создания рассылки (M, не позднее 28-го числа).
+
+    :param run_time: Время рассылки.
+    :param frequency: Периодичность рассылки (D, W или M).
+    :param created_at: Дата создания рассылки.
+    :param after: Момент, после которого ищется время запуска.
+    """
+    local_after = timezone.localtime(after)
+    created_at = timezone.localtime(created_at)
+    day = local_after.date()
+
+    if frequency == 'W':
+        day += timedelta(days=(created_at.weekday() - day.weekday()) % 7)
+    elif frequency == 'M':
+        day_of_month = min(created_at.day, 28)
+        day = day.replace(day=day_of_month) if day.day <= day_of_month else add_month(day, day_of_month)
+
+    run_at = timezone.make_aware(datetime.combine(day, run_time))
+    if run_at > after:
+        return run_at
+
+    if frequency == 'W':
+        day += timedelta(days=7)
+    elif frequency == 'M':
+        day = add_month(day, min(created_at.day, 28))
+    else:
+        day += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, run_time))
@@ -1,161 +1,501 @@
 import logging
+import smtplib
+import time
+from collections import namedtuple
+from contextlib import closing
 from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q, QuerySet
 from django.utils import timezone
-from django_celery_beat.models import PeriodicTask, CrontabSchedule
 
-from .models import NewsletterLog, Message, Client, Newsletter
+from .models import NewsletterLog, Message, Newsletter, NewsletterDelivery, NewsletterRunStats
+from .async_delivery import AsyncEmailSender
+from .payloads import EmailPayload, PreparedEmailMessage
+from .rate_limit import SMTPRateLimiter
 
 logger = logging.getLogger(__name__)
 
+Recipient = namedtuple('Recipient', ['id', 'email'])
+
+
+class TransientDeliveryError(Exception):
+    """
+    Почтовый сервер временно отказал в приёме писем (ответ 4xx) или недоступен.
+    Отправка шарда прервана и должна быть повторена позже.
+    """
+
+    def __init__(self, error: Exception, result: Dict[str, int]) -> None:
+        super().__init__(str(error))
+        self.error = error
+        self.result = result
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Проверяет, является ли ошибка отправки временной: код ответа почтового сервера 4xx
+    (в том числе 421 при подключении), разрыв соединения или ошибка подключения к серверу.
+    :param error: Ошибка отправки письма.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class BulkEmailSender:
+    """
+    Класс, описывающий пакетную отправку писем.
+
+    Письма отправляются пачками по chunk_size штук, для каждой пачки открывается
+    одно соединение с почтовым сервером. Если соединение открыть не удалось,
+    ошибка подключения возвращается для каждого письма пачки. Если сервер разорвал
+    соединение, оно открывается заново и отправка письма повторяется.
+    Если передан ограничитель скорости, перед отправкой каждого письма списывается токен.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, connection_kwargs: Optional[Dict[str, Any]] = None,
+                 rate_limiter: Optional[SMTPRateLimiter] = None, stop_on_transient: bool = True) -> None:
+        """
+        :param chunk_size: Количество писем, отправляемых через одно соединение.
+        :param connection_kwargs: Параметры соединения для get_connection (по умолчанию - из настроек проекта).
+        :param rate_limiter: Ограничитель скорости отправки писем.
+        :param stop_on_transient: Не используется, принимается для совместимости с AsyncEmailSender:
+        письма отправляются по одному, и после временного отказа отправку прерывает вызывающий код.
+        """
+        self.chunk_size = chunk_size or settings.NEWSLETTER_SMTP_CHUNK_SIZE
+        self.connection_kwargs = connection_kwargs or {}
+        self.rate_limiter = rate_limiter
+        self.connection = None
+
+    def send(self, emails: Iterable[Tuple[Any, EmailMessage]]) -> Iterator[Tuple[Any, Optional[Exception]]]:
+        """
+        Отправляет письма и для каждого письма возвращает результат отправки.
+
+        :param emails: Пары (ключ, письмо). Ключ возвращается вместе с результатом.
+        :return: Пары (ключ, ошибка). Для успешно отправленных писем ошибка равна None.
+        """
+        emails = iter(emails)
+        while True:
+            chunk = list(islice(emails, self.chunk_size))
+            if not chunk:
+                return
+
+            try:
+                self.open()
+            except Exception as error:
+                logger.error(f'Не удалось подключиться к почтовому серверу: {error}')
+                self.close()
+                for key, _ in chunk:
+                    yield key, error
+                continue
+            try:
+                for key, email in chunk:
+                    yield key, self.send_one(email)
+            finally:
+                self.close()
+
+    def send_one(self, email: EmailMessage) -> Optional[Exception]:
+        """
+        Отправляет одно письмо через открытое соединение.
+
+        :param email: Письмо.
+        :return: Ошибка отправки или None, если письмо отправлено.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            try:
+                self.connection.send_messages([email])
+            except smtplib.SMTPServerDisconnected:
+                logger.warning('Почтовый сервер разорвал соединение, переподключение')
+                self.close()
+                self.open()
+                self.connection.send_messages([email])
+        except Exception as error:
+            return error
+        return None
+
+    def open(self) -> None:
+        self.connection = get_connection(fail_silently=False, **self.connection_kwargs)
+        self.connection.open()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as error:
+                logger.warning(f'Ошибка закрытия соединения с почтовым сервером: {error}')
+            self.connection = None
+
+
+class NewsletterLogBuffer:
+    """
+    Класс, описывающий буфер логов отправки писем и записей о доставке.
+
+    Логи и записи о доставке накапливаются в памяти и записываются в базу данных
+    запросами bulk_create в одной транзакции по достижении batch_size логов.
+    В той же транзакции увеличиваются счётчики статистики запусков рассылок (NewsletterRunStats).
+    Используется как контекстный менеджер: при выходе из блока
+    (в том числе из-за исключения) оставшиеся записи сохраняются.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None) -> None:
+        """
+        :param batch_size: Количество логов, после накопления которого они записываются в базу данных.
+        """
+        self.batch_size = batch_size or settings.NEWSLETTER_LOG_BATCH_SIZE
+        self.logs: List[NewsletterLog] = []
+        self.deliveries: List[NewsletterDelivery] = []
+        self.stats: Dict[Tuple[int, datetime], Dict[str, Any]] = {}
+
+    def __enter__(self) -> 'NewsletterLogBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+
+    def add(self, newsletter_log: NewsletterLog, run_at: Optional[datetime] = None,
+            delivery: Optional[NewsletterDelivery] = None) -> None:
+        """
+        Добавляет лог и запись о доставке в буфер и записывает буфер, если он заполнен.
+        :param newsletter_log: Несохранённый экземпляр класса NewsletterLog.
+        :param run_at: Плановое время запуска рассылки, в статистику которого учитывается лог.
+        :param delivery: Несохранённый экземпляр класса NewsletterDelivery (только для доставленных писем).
+        """
+        self.logs.append(newsletter_log)
+        if delivery is not None:
+            self.deliveries.append(delivery)
+        if run_at is not None:
+            stats = self.stats.setdefault(
+                (newsletter_log.newsletter_id, run_at), {'sent': 0, 'failed': 0, 'last_error': None}
+            )
+            if newsletter_log.status == 'S':
+                stats['sent'] += 1
+            else:
+                stats['failed'] += 1
+                stats['last_error'] = newsletter_log.server_response
+        if len(self.logs) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Записывает накопленные логи, записи о доставке и статистику запусков в базу данных.
+        """
+        if not self.logs and not self.deliveries:
+            return
+        logs, self.logs = self.logs, []
+        deliveries, self.deliveries = self.deliveries, []
+        stats, self.stats = self.stats, {}
+        with transaction.atomic():
+            NewsletterLog.objects.bulk_create(logs, batch_size=self.batch_size)
+            NewsletterDelivery.objects.bulk_create(deliveries, batch_size=self.batch_size, ignore_conflicts=True)
+            for (newsletter_id, run_at), counts in stats.items():
+                NewsletterRunStats.increment(newsletter_id=newsletter_id, run_at=run_at, **counts)
+        logger.debug(f'Записано логов отправки: {len(logs)}, доставок: {len(deliveries)}')
+
 
 class NewsletterDeliveryService:
     """Класс, описывающий работу сервиса доставки рассылок"""
+    SENDER_CLASSES = {
+        'sync': BulkEmailSender,
+        'async': AsyncEmailSender,
+    }
+    use_payload_cache = True
 
     def __init__(self, newsletter: Newsletter) -> None:
         """
         Инициализируется экземпляром класса рассылки Newsletter
         """
         self.newsletter = newsletter
+        self.log_buffer = NewsletterLogBuffer()
+        self.sender_class = self.SENDER_CLASSES[settings.NEWSLETTER_DELIVERY_BACKEND]
+        self.rate_limiter = SMTPRateLimiter.for_account(settings.EMAIL_HOST_USER)
 
-    def send_mail_to_client(self):
+    def get_active_clients(self) -> QuerySet:
         """
-        Если время завершения периодической задачи еще не наступило,
-        отправляет письма клиентам.
+        Возвращает активных клиентов рассылки, упорядоченных по идентификатору.
         """
-        if self.check_task_finish_datetime():
-            self.delete_task()
-            return
+        return self.newsletter.clients.filter(is_active=True).order_by('pk')
 
-        messages = self.newsletter.messages.all()
-        clients = self.newsletter.clients.all()
-
-        for message in messages:
-            for client in clients:
-                try:
-                    logger.info('Отправка письма')
-                    send_mail(
-                        subject=message.subject,
-                        message=message.body,
-                        from_email=settings.EMAIL_HOST_USER,
-                        recipient_list=[client.email]
-                    )
+    def get_client_shards(self, shard_size: int) -> List[Tuple[int, int]]:
+        """
+        Разбивает активных клиентов рассылки на группы (шарды) для параллельной отправки.
+        Идентификаторы клиентов читаются потоком через серверный курсор,
+        шард описывается только границами диапазона идентификаторов.
+        :param shard_size: Количество клиентов в одном шарде.
+        :return: Пары (первый, последний) идентификаторов клиентов шарда.
+        """
+        shards = []
+        first_id = last_id = None
+        shard_count = 0
+        client_ids = self.get_active_clients().values_list('pk', flat=True).iterator(chunk_size=shard_size)
+        for client_id in client_ids:
+            if first_id is None:
+                first_id = client_id
+            last_id = client_id
+            shard_count += 1
+            if shard_count == shard_size:
+                shards.append((first_id, last_id))
+                first_id, shard_count = None, 0
+        if first_id is not None:
+            shards.append((first_id, last_id))
+        return shards
+
+    def iter_recipients(self, first_id: int, last_id: int) -> Iterator[Recipient]:
+        """
+        Возвращает активных клиентов рассылки из диапазона идентификаторов.
+        Клиенты читаются потоком через серверный курсор, загружаются только идентификатор и электронная почта.
+        :param first_id: Первый идентификатор клиента диапазона.
+        :param last_id: Последний идентификатор клиента диапазона.
+        """
+        recipients = self.get_active_clients().filter(
+            pk__gte=first_id, pk__lte=last_id
+        ).values_list('pk', 'email').iterator(chunk_size=settings.NEWSLETTER_RECIPIENT_FETCH_SIZE)
+        for recipient in recipients:
+            yield Recipient(*recipient)
+
+    def get_run_at(self) -> datetime:
+        """
+        Возвращает плановое время текущего запуска рассылки:
+        сегодняшнюю дату и время рассылки в часовом поясе проекта.
+        Повторные выполнения одного запуска получают то же значение.
+        """
+        return timezone.make_aware(datetime.combine(timezone.localdate(), self.newsletter.time))
+
+    def send_mail_to_clients(self, first_id: int, last_id: int, run_at: datetime,
+                             retry_transient: bool = True) -> Dict[str, int]:
+        """
+        Отправляет все сообщения рассылки активным клиентам рассылки из диапазона идентификаторов.
+        Для отправки используется отдельное соединение с почтовым сервером.
+        Письма, уже доставленные в рамках этого запуска, повторно не отправляются.
+        Если почтовый сервер временно отказал в приёме письма (ответ 4xx) или недоступен, отправка прерывается,
+        учётная запись приостанавливается для всех воркеров и выбрасывается TransientDeliveryError.
+        :param first_id: Первый идентификатор клиента диапазона.
+        :param last_id: Последний идентификатор клиента диапазона.
+        :param run_at: Плановое время запуска рассылки.
+        :param retry_transient: Прерывать ли отправку при временном отказе (False - записать письмо как неуспешное).
+        :return: Количество успешно и неуспешно отправленных, а также пропущенных писем.
+        """
+        messages = list(self.newsletter.messages.all())
+        payloads = {}
+        if self.use_payload_cache:
+            payloads = {message.pk: EmailPayload.for_message(message) for message in messages}
+        delivered = set(
+            NewsletterDelivery.objects.filter(
+                newsletter=self.newsletter, run_at=run_at, client_id__gte=first_id, client_id__lte=last_id
+            ).values_list('message_id', 'client_id')
+        )
+        emails = (
+            ((message, recipient), self.build_email(
+                message=message, email=recipient.email, payload=payloads.get(message.pk)
+            ))
+            for recipient in self.iter_recipients(first_id=first_id, last_id=last_id)
+            for message in messages
+            if (message.pk, recipient.id) not in delivered
+        )
+
+        sender = self.sender_class(rate_limiter=self.rate_limiter, stop_on_transient=retry_transient)
+        started_at = time.monotonic()
+        result = {'sent': 0, 'failed': 0, 'skipped': len(delivered)}
+        transient_error = None
+
+        with self.log_buffer, closing(sender.send(emails)) as results:
+            for (message, recipient), error in results:
+                if error is not None and retry_transient and is_transient_error(error):
+                    transient_error = error
+                    break
+                if error is None:
+                    result['sent'] += 1
                     self.save_newsletter_log(
                         status='S',
                         service_response='Письмо успешно доставлено',
                         message=message,
-                        client=client
+                        client_id=recipient.id,
+                        run_at=run_at
                     )
-                    logger.info('Письмо отправлено')
-                except Exception as error:
+                else:
+                    result['failed'] += 1
                     logger.error(f'Ошибка отправки письма: {error}')
                     self.save_newsletter_log(
                         status='F',
                         service_response=str(error),
                         message=message,
-                        client=client
+                        client_id=recipient.id,
+                        run_at=run_at
                     )
 
-    def save_newsletter_log(self, status: str, service_response: str, message: Message, client: Client) -> None:
+        if transient_error is not None:
+            logger.warning(f'{self.newsletter}: почтовый сервер временно отказал в приёме писем: {transient_error}')
+            if self.rate_limiter is not None:
+                self.rate_limiter.pause(settings.NEWSLETTER_RETRY_BACKOFF_BASE)
+            raise TransientDeliveryError(error=transient_error, result=result)
+
+        processed = result['sent'] + result['failed']
+        elapsed = time.monotonic() - started_at
+        logger.info(
+            f'{self.newsletter}: обработано писем {processed} за {elapsed:.2f} с '
+            f'({processed / elapsed if elapsed else 0:.1f} писем/с)'
+        )
+        return result
+
+    def complete_run(self, sent: int, failed: int) -> None:
+        """
+        Завершает запуск рассылки после отправки всех шардов.
+        Если время завершения рассылки наступило, снимает рассылку с расписания
+        и переводит её в статус 'Завершена', иначе - в статус 'Запущена'.
+        :param sent: Количество успешно отправленных писем.
+        :param failed: Количество неуспешно отправленных писем.
+        """
+        logger.info(f'{self.newsletter}: запуск завершён, отправлено {sent}, ошибок {failed}')
+        if self.newsletter.is_finished():
+            self.unschedule()
+        elif self.newsletter.status != 'S':
+            self.newsletter.status = 'S'
+            self.newsletter.save(update_fields=['status'])
+
+    @staticmethod
+    def build_email(message: Message, email: str, payload: Optional[EmailPayload] = None) -> EmailMessage:
         """
-        Сохраняет отчёт об отправке письма клиенту.
+        Формирует письмо клиенту.
+        :param message: Экземпляр класса Сообщение (Message).
+        :param email: Электронная почта клиента.
+        :param payload: Заранее сформированное письмо с сообщением. Если передано,
+        к нему добавляются только заголовки получателя.
+        """
+        if payload is not None:
+            return PreparedEmailMessage(payload=payload, to=[email])
+        return EmailMessage(
+            subject=message.subject,
+            body=message.body,
+            from_email=settings.EMAIL_HOST_USER,
+            to=[email]
+        )
+
+    def save_newsletter_log(self, status: str, service_response: str, message: Message, client_id: int,
+                            run_at: Optional[datetime] = None) -> None:
+        """
+        Добавляет отчёт об отправке письма клиенту в буфер логов и учитывает его в статистике запуска рассылки.
+        Для доставленного письма добавляет запись о доставке в рамках запуска рассылки.
+        Отчёты записываются в базу данных пачками.
         :param status: Статус отправки письма (S - успешная отправка, F - неуспешная отправка).
         :param service_response: Ответ внешнего сервиса приёма сообщений.
         :param message: Экземпляр класса Сообщение (Message).
-        :param client: Экземпляр класса Клиент (Client)
+        :param client_id: Идентификатор клиента.
+        :param run_at: Плановое время запуска рассылки.
         """
         newsletter_log = NewsletterLog(
             status=status,
             server_response=service_response,
             message=message,
-            client=client,
+            client_id=client_id,
             newsletter=self.newsletter
         )
-        newsletter_log.save()
-
-    def create_schedule(self) -> CrontabSchedule:
-        """
-        Создаёт и возвращает расписание (CrontabSchedule) для задачи рассылки.
-        В зависимости от заданной частоты рассылки (D - раз в день, W - раз в неделю,
-        M - раз в месяц) и времени отправки рассылки (time) назначаются параметры
-        расписания.
-        """
-        schedule_args = {
-            'minute': self.newsletter.time.minute,
-            'hour': self.newsletter.time.hour,
-        }
-
-        if self.newsletter.frequency == 'D':
-            schedule_args.update(
-                {
-                    'day_of_week': '*',
-                    'day_of_month': '*'
-                }
+        delivery = None
+        if status == 'S' and run_at is not None:
+            delivery = NewsletterDelivery(
+                newsletter=self.newsletter, message=message, client_id=client_id, run_at=run_at
             )
+        self.log_buffer.add(newsletter_log, run_at=run_at, delivery=delivery)
 
-        elif self.newsletter.frequency == 'W':
-            schedule_args.update(
-                {
-                    'day_of_week': self.newsletter.created_at.weekday(),
-                    'day_of_month': '*'
-                }
-            )
+    def schedule(self) -> None:
+        """
+        Планирует ближайший запуск рассылки.
+        """
+        self.newsletter.next_run_at = self.newsletter.get_next_run_at()
+        self.newsletter.save(update_fields=['next_run_at'])
+        logger.info(f'{self.newsletter}: следующий запуск {self.newsletter.next_run_at}')
 
-        elif self.newsletter.frequency == 'M':
-            day_of_month = self.newsletter.created_at.day if self.newsletter.created_at.day <= 28 else 28
-            schedule_args.update(
-                {
-                    'day_of_week': '*',
-                    'day_of_month': day_of_month
-                }
-            )
+    def unschedule(self) -> None:
+        """
+        Снимает рассылку с расписания и переводит её в статус 'Завершена'.
+        """
+        self.newsletter.next_run_at = None
+        self.newsletter.status = 'F'
+        self.newsletter.save(update_fields=['next_run_at', 'status'])
+        logger.info(f'{self.newsletter}: рассылка снята с расписания')
 
-        schedule, _ = CrontabSchedule.objects.get_or_create(**schedule_args, month_of_year='*')
 
-        return schedule
+class NewsletterScheduler:
+    """
+    Класс, описывающий планировщик рассылок.
 
-    def create_task(self):
+    Вместо отдельной периодической задачи celery-beat на каждую рассылку задача
+    app_newsletter.tasks.dispatch_due_newsletters раз в минуту выбирает рассылки,
+    время следующего запуска (next_run_at) которых наступило, по индексу,
+    переносит их next_run_at на следующий запуск одним запросом UPDATE
+    и ставит задачи отправки в очередь одной группой.
+    Стоимость планирования зависит от количества рассылок, которые нужно запустить, а не от общего количества.
+    Рассылки, время завершения (finish_at) которых наступило, снимаются с расписания
+    задачей app_newsletter.tasks.expire_finished_newsletters.
+    """
+
+    @classmethod
+    def dispatch_due(cls, now: Optional[datetime] = None, batch_size: Optional[int] = None) -> List[int]:
         """
-        Создаёт периодическую задачу для рассылки.
+        Запускает рассылки, время запуска которых наступило.
+        Рассылки блокируются SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+        одновременный запуск нескольких планировщиков не приводит к повторной отправке.
+
+        :param now: Текущий момент.
+        :param batch_size: Максимальное количество рассылок, запускаемых за один раз.
+        :return: Идентификаторы запущенных рассылок.
         """
-        schedule = self.create_schedule()
-        PeriodicTask.objects.create(
-            crontab=schedule,
-            name=str(self.newsletter),
-            task='app_newsletter.tasks.send_newsletter',
-            args=[self.newsletter.pk]
-        )
+        now = now or timezone.now()
+        batch_size = batch_size or settings.NEWSLETTER_DISPATCH_BATCH_SIZE
+
+        with transaction.atomic():
+            newsletters = list(
+                Newsletter.objects.select_for_update(skip_locked=True)
+                .filter(is_active=True, next_run_at__lte=now, finish_at__gt=now)
+                .order_by('next_run_at')
+                .only('pk', 'time', 'frequency', 'created_at', 'next_run_at')[:batch_size]
+            )
+            if not newsletters:
+                return []
 
-    def delete_task(self):
+            runs = [(newsletter.pk, newsletter.next_run_at.isoformat()) for newsletter in newsletters]
+            for newsletter in newsletters:
+                newsletter.next_run_at = newsletter.get_next_run_at(after=now)
+            Newsletter.objects.bulk_update(newsletters, ['next_run_at'])
+            transaction.on_commit(lambda: cls.enqueue(runs))
+
+        logger.info(f'Запущено рассылок: {len(runs)}')
+        return [newsletter_id for newsletter_id, _ in runs]
+
+    @classmethod
+    def expire_finished(cls, now: Optional[datetime] = None) -> int:
         """
-        Удаляет периодическую задачу для рассылки.
+        Снимает с расписания и переводит в статус 'Завершена' все рассылки,
+        время завершения которых наступило, одним запросом UPDATE.
+
+        :param now: Текущий момент.
+        :return: Количество завершённых рассылок.
         """
-        try:
-            task = PeriodicTask.objects.get(name=str(self.newsletter))
-            task.delete()
-            self.newsletter.status = 'F'
-            self.newsletter.save()
-            logger.info('Задача удалена')
-        except PeriodicTask.DoesNotExist:
-            logger.exception(f'Периодической задачи для {self.newsletter} не существует.')
+        now = now or timezone.now()
+        expired = Newsletter.objects.filter(finish_at__lte=now).filter(
+            Q(next_run_at__isnull=False) | ~Q(status='F')
+        ).update(status='F', next_run_at=None)
+        if expired:
+            logger.info(f'Завершено рассылок: {expired}')
+        return expired
 
-    def check_task_finish_datetime(self) -> bool:
+    @staticmethod
+    def enqueue(runs: List[Tuple[int, str]]) -> None:
         """
-        Проверяет пришло ли время завершения периодической задачи для рассылки
+        Ставит задачи отправки рассылок в очередь одной группой.
+        :param runs: Пары (идентификатор рассылки, плановое время запуска в формате ISO 8601).
         """
+        from celery import group
 
-        end_datetime_str = f'{self.newsletter.finish_date} {self.newsletter.finish_time}'
-        end_datetime = datetime.strptime(end_datetime_str, "%Y-%m-%d %H:%M:%S")
-        end_datetime = timezone.make_aware(end_datetime, timezone=timezone.utc)
-        logger.info(f'Время завершения задачи: {end_datetime}')
-
-        current_time = datetime.now()
-        current_time = current_time.replace(tzinfo=timezone.utc)
-        logger.info(f'Текущее время: {current_time}')
+        from .tasks import send_newsletter
 
-        if current_time > end_datetime:
-            logger.info('Время истекло. Задача должна быть удалена')
-            return True
-        return False
+        group(send_newsletter.s(newsletter_id, run_at) for newsletter_id, run_at in runs).apply_async()
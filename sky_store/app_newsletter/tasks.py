@@ -1,15 +1,136 @@
-from celery import shared_task
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from celery import chain, chord, group, shared_task
+from django.conf import settings
 
 from .models import Newsletter
-from .services import NewsletterDeliveryService
+from .partitions import NewsletterLogPartitions
+from .rate_limit import get_retry_delay
+from .services import NewsletterDeliveryService, NewsletterScheduler, TransientDeliveryError
+
+logger = logging.getLogger(__name__)
+
+EMPTY_TOTALS = {'sent': 0, 'failed': 0, 'skipped': 0, 'failed_shards': 0}
 
 
 @shared_task
-def send_newsletter(newsletter_id: int) -> None:
+def dispatch_due_newsletters() -> List[int]:
+    """
+    Запускает рассылки, время запуска которых наступило, и планирует их следующие запуски.
+    :return: идентификаторы запущенных рассылок
+    """
+    return NewsletterScheduler.dispatch_due()
+
+
+@shared_task
+def expire_finished_newsletters() -> int:
+    """
+    Снимает с расписания рассылки, время завершения которых наступило.
+    :return: количество завершённых рассылок
     """
-    Отправляет рассылку клиентам
+    return NewsletterScheduler.expire_finished()
+
+
+@shared_task
+def send_newsletter(newsletter_id: int, run_at: Optional[str] = None) -> None:
+    """
+    Отправляет рассылку клиентам.
+    Клиенты разбиваются на шарды по NEWSLETTER_SHARD_SIZE, шарды отправляются параллельно
+    не более чем в NEWSLETTER_MAX_PARALLEL_SHARDS потоков (цепочек задач).
+    После отправки всех шардов результаты собираются задачей finish_newsletter_delivery.
+    Все шарды получают плановое время запуска, по которому отмечаются доставленные письма,
+    поэтому повторное выполнение задачи не приводит к повторной отправке писем.
     :param newsletter_id: идентификатор рассылки
+    :param run_at: плановое время запуска в формате ISO 8601 (по умолчанию - сегодня во время рассылки)
     """
     newsletter = Newsletter.objects.get(pk=newsletter_id)
     delivery_service = NewsletterDeliveryService(newsletter=newsletter)
-    delivery_service.send_mail_to_client()
+    if newsletter.is_finished():
+        delivery_service.unschedule()
+        return
+
+    shards = delivery_service.get_client_shards(shard_size=settings.NEWSLETTER_SHARD_SIZE)
+    if not shards:
+        logger.info(f'{newsletter}: нет клиентов для отправки')
+        return
+
+    run_at = run_at or delivery_service.get_run_at().isoformat()
+    lanes_count = min(settings.NEWSLETTER_MAX_PARALLEL_SHARDS, len(shards))
+    lanes = []
+    for lane_index in range(lanes_count):
+        lane_shards = shards[lane_index::lanes_count]
+        (first_id, last_id), next_shards = lane_shards[0], lane_shards[1:]
+        lanes.append(chain(
+            send_newsletter_shard.s(dict(EMPTY_TOTALS), newsletter_id, first_id, last_id, run_at),
+            *[send_newsletter_shard.s(newsletter_id, *shard, run_at) for shard in next_shards]
+        ))
+
+    logger.info(f'{newsletter}: шардов {len(shards)}, параллельно {lanes_count}')
+    chord(group(lanes))(finish_newsletter_delivery.s(newsletter_id))
+
+
+@shared_task(bind=True, acks_late=True, max_retries=settings.NEWSLETTER_SEND_MAX_RETRIES)
+def send_newsletter_shard(self, totals: Dict[str, int], newsletter_id: int, first_id: int, last_id: int,
+                          run_at: str) -> Dict[str, int]:
+    """
+    Отправляет рассылку клиентам одного шарда.
+    Задача подтверждается брокеру после выполнения (acks_late): если воркер упадёт,
+    шард будет выполнен повторно, а уже доставленные письма будут пропущены.
+    Если почтовый сервер временно отказал в приёме писем, задача повторяется
+    с экспоненциальной задержкой и джиттером. При последней попытке письма,
+    которые не удалось отправить, записываются как неуспешные.
+    Любая другая ошибка записывается в журнал и учитывается в failed_shards,
+    чтобы остальные шарды цепочки были отправлены и запуск рассылки был завершён.
+    :param totals: результаты предыдущих шардов цепочки
+    :param newsletter_id: идентификатор рассылки
+    :param first_id: первый идентификатор клиента шарда
+    :param last_id: последний идентификатор клиента шарда
+    :param run_at: плановое время запуска рассылки в формате ISO 8601
+    :return: суммарные результаты отправки в цепочке
+    """
+    totals = {**EMPTY_TOTALS, **totals}
+    try:
+        newsletter = Newsletter.objects.get(pk=newsletter_id)
+        result = NewsletterDeliveryService(newsletter=newsletter).send_mail_to_clients(
+            first_id=first_id,
+            last_id=last_id,
+            run_at=datetime.fromisoformat(run_at),
+            retry_transient=self.request.retries < self.max_retries
+        )
+    except TransientDeliveryError as error:
+        countdown = get_retry_delay(self.request.retries)
+        logger.warning(f'Рассылка #{newsletter_id}: повтор отправки шарда {first_id}-{last_id} через {countdown:.0f} с')
+        raise self.retry(exc=error, countdown=countdown)
+    except Exception:
+        logger.exception(f'Рассылка #{newsletter_id}: ошибка отправки шарда {first_id}-{last_id}')
+        return {**totals, 'failed_shards': totals['failed_shards'] + 1}
+    return {key: totals[key] + result.get(key, 0) for key in totals}
+
+
+@shared_task
+def finish_newsletter_delivery(results: List[Dict[str, int]], newsletter_id: int) -> None:
+    """
+    Собирает результаты отправки всех шардов рассылки и обновляет статус рассылки.
+    :param results: результаты цепочек шардов
+    :param newsletter_id: идентификатор рассылки
+    """
+    failed_shards = sum(result.get('failed_shards', 0) for result in results)
+    if failed_shards:
+        logger.error(f'Рассылка #{newsletter_id}: не удалось отправить шардов: {failed_shards}')
+    newsletter = Newsletter.objects.get(pk=newsletter_id)
+    NewsletterDeliveryService(newsletter=newsletter).complete_run(
+        sent=sum(result['sent'] for result in results),
+        failed=sum(result['failed'] for result in results)
+    )
+
+
+@shared_task
+def create_newsletter_log_partitions() -> List[str]:
+    """
+    Создаёт секции таблицы логов отправки писем на NEWSLETTER_LOG_PARTITIONS_AHEAD месяцев вперёд,
+    чтобы новые логи не попадали в секцию по умолчанию.
+    :return: имена созданных секций
+    """
+    return NewsletterLogPartitions.create_partitions()
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import asyncio
+import socket
+import threading
+from datetime import date, datetime, time, timezone
+from functools import partial
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.timezone import make_aware
+
+from .async_delivery import AsyncEmailSender, aiosmtplib
+from .benchmark import FakeSMTPServer
+from .models import Client, Message, Newsletter, NewsletterLog
+from .partitions import NewsletterLogPartitions
+from .rate_limit import SMTPRateLimiter
+from .payloads import EmailPayload
+from .services import BulkEmailSender, NewsletterDeliveryService, TransientDeliveryError
+from .tasks import EMPTY_TOTALS, finish_newsletter_delivery, send_newsletter_shard
+
+
+def get_closed_port() -> int:
+    """
+    Возвращает номер порта, на котором никто не принимает соединения.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get_connection_kwargs(port: int) -> dict:
+    return {
+        'backend': 'django.core.mail.backends.smtp.EmailBackend',
+        'host': '127.0.0.1',
+        'port': port,
+        'username': '',
+        'password': '',
+        'use_tls': False,
+        'use_ssl': False,
+        'timeout': 5,
+    }
+
+
+class BulkEmailSenderTestCase(SimpleTestCase):
+    """
+    Проверяет пакетную отправку писем.
+    """
+
+    def test_connection_failure_is_returned_for_every_email(self):
+        sender = BulkEmailSender(chunk_size=2, connection_kwargs=get_connection_kwargs(get_closed_port()))
+        emails = [
+            (index, EmailMessage(subject='Тема', body='Текст', to=[f'{index}@example.com'])) for index in range(3)
+        ]
+        results = list(sender.send(emails))
+        self.assertEqual([key for key, _ in results], [0, 1, 2])
+        for _, error in results:
+            self.assertIsInstance(error, OSError)
+
+
+class NewsletterShardTaskTestCase(TestCase):
+    """
+    Проверяет, что ошибка в одном шарде не прерывает цепочку шардов и запуск рассылки завершается.
+    """
+
+    def setUp(self):
+        self.newsletter = Newsletter.objects.create(
+            time=time(10), frequency='D', status='C', finish_date=date(2099, 1, 1), finish_time=time(0)
+        )
+
+    def test_shard_error_is_counted(self):
+        totals = {**EMPTY_TOTALS, 'sent': 5}
+        with mock.patch.object(NewsletterDeliveryService, 'send_mail_to_clients', side_effect=TypeError('ошибка')):
+            result = send_newsletter_shard.apply(
+                args=(totals, self.newsletter.pk, 1, 10, '2030-01-01T10:00:00+00:00')
+            ).get()
+        self.assertEqual(result, {**EMPTY_TOTALS, 'sent': 5, 'failed_shards': 1})
+
+        finish_newsletter_delivery.apply(args=([result], self.newsletter.pk)).get()
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.status, 'S')
+
+
+@override_settings(DEFAULT_FROM_EMAIL='newsletter@example.com')
+class TransientConnectErrorTestCase(TestCase):
+    """
+    Проверяет, что отказ почтового сервера при подключении (421) считается временной ошибкой.
+    """
+
+    def setUp(self):
+        self.newsletter = Newsletter.objects.create(
+            time=time(10), frequency='D', status='C', finish_date=date(2099, 1, 1), finish_time=time(0)
+        )
+        self.recipient = Client.objects.create(email='client@example.com', first_name='Имя', last_name='Фамилия')
+        self.newsletter.clients.add(self.recipient)
+        self.newsletter.messages.add(Message.objects.create(subject='Тема', body='Текст'))
+        self.run_at = datetime(2030, 1, 1, 10, tzinfo=timezone.utc)
+
+    def send(self, port: int, retry_transient: bool) -> dict:
+        service = NewsletterDeliveryService(newsletter=self.newsletter)
+        service.sender_class = partial(BulkEmailSender, connection_kwargs=get_connection_kwargs(port))
+        service.rate_limiter = None
+        return service.send_mail_to_clients(
+            first_id=self.recipient.pk, last_id=self.recipient.pk, run_at=self.run_at, retry_transient=retry_transient
+        )
+
+    def test_connect_throttling_is_transient(self):
+        with FakeSMTPServer(connect_throttle_rate=1.0) as server:
+            with self.assertRaises(TransientDeliveryError) as context:
+                self.send(server.port, retry_transient=True)
+            self.assertEqual(context.exception.error.smtp_code, 421)
+
+            result = self.send(server.port, retry_transient=False)
+        self.assertEqual(result, {'sent': 0, 'failed': 1, 'skipped': 0})
+
+    def test_unavailable_server_is_transient(self):
+        with self.assertRaises(TransientDeliveryError) as context:
+            self.send(get_closed_port(), retry_transient=True)
+        self.assertIsInstance(context.exception.error, OSError)
+
+
+class NewsletterFinishAtTestCase(TestCase):
+    """
+    Проверяет вычисление времени завершения рассылки при сохранении.
+    """
+
+    def test_string_values_are_converted(self):
+        newsletter = Newsletter.objects.create(
+            time='10:00', frequency='D', status='C', finish_date='2030-01-01', finish_time='12:30'
+        )
+        self.assertEqual(newsletter.finish_date, date(2030, 1, 1))
+        self.assertEqual(newsletter.finish_at, make_aware(datetime(2030, 1, 1, 12, 30)))
+
+
+class EmailPayloadSenderTestCase(SimpleTestCase):
+    """
+    Проверяет выбор отправителя заранее сформированных писем.
+    """
+
+    def setUp(self):
+        EmailPayload.clear_cache()
+        self.addCleanup(EmailPayload.clear_cache)
+        self.message = Message(pk=1, subject='Тема', body='Текст')
+
+    @override_settings(EMAIL_HOST_USER=None, DEFAULT_FROM_EMAIL='newsletter@example.com')
+    def test_default_sender(self):
+        self.assertEqual(EmailPayload.for_message(self.message).from_email, 'newsletter@example.com')
+
+    @override_settings(EMAIL_HOST_USER=None, DEFAULT_FROM_EMAIL=None)
+    def test_missing_sender(self):
+        with self.assertRaises(ImproperlyConfigured):
+            EmailPayload.for_message(self.message)
+
+
+@skipIf(aiosmtplib is None, 'Для асинхронной отправки писем нужен пакет aiosmtplib')
+class AsyncEmailSenderTestCase(SimpleTestCase):
+    """
+    Проверяет асинхронную отправку писем на локальный фиктивный почтовый сервер.
+    """
+
+    @staticmethod
+    def send(port: int, **kwargs) -> dict:
+        sender = AsyncEmailSender(pool_size=2, concurrency=1, connection_kwargs=get_connection_kwargs(port), **kwargs)
+        emails = [
+            (index, EmailMessage(subject='Тема', body='Текст', from_email='sender@example.com',
+                                 to=[f'{index}@example.com']))
+            for index in range(10)
+        ]
+        return dict(sender.send(emails))
+
+    def test_emails_are_sent_in_chunks(self):
+        with FakeSMTPServer() as server:
+            results = self.send(server.port, chunk_size=3)
+        self.assertEqual(results, {index: None for index in range(10)})
+
+    def test_transient_error_stops_chunk(self):
+        with FakeSMTPServer(data_throttle_rate=0.5, seed=1) as server:
+            results = self.send(server.port, chunk_size=10)
+        self.assertEqual(sorted(results), list(range(10)))
+        errors = {id(error): error for error in results.values() if error is not None}
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(next(iter(errors.values())).smtp_code, 451)
+
+    def test_every_email_is_sent_without_stop(self):
+        with FakeSMTPServer(data_throttle_rate=0.5, seed=1) as server:
+            results = self.send(server.port, chunk_size=10, stop_on_transient=False)
+        self.assertEqual(sorted(results), list(range(10)))
+        errors = [error for error in results.values() if error is not None]
+        self.assertGreater(len(errors), 1)
+        self.assertLess(len(errors), 10)
+
+
+class SMTPRateLimiterTestCase(SimpleTestCase):
+    """
+    Проверяет, что асинхронное ожидание токена не останавливает цикл событий на время запроса к Redis.
+    """
+
+    def test_acquire_async_does_not_block_event_loop(self):
+        limiter = SMTPRateLimiter(account='test', rate=10, capacity=10)
+        released = threading.Event()
+        waited = []
+
+        def take(method):
+            # Запрос к Redis завершается только после того, как цикл событий выполнит другую сопрограмму
+            waited.append(released.wait(timeout=1))
+            return 0.0
+
+        async def release():
+            released.set()
+
+        async def main():
+            await asyncio.gather(limiter.acquire_async(), release())
+
+        with mock.patch.object(limiter, '_call', side_effect=take):
+            asyncio.run(main())
+        self.assertEqual(waited, [True])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Таблица логов секционирована только в PostgreSQL')
+class NewsletterLogPartitionsTestCase(TestCase):
+    """
+    Проверяет создание секции логов за месяц, логи которого уже попали в секцию по умолчанию.
+    """
+
+    def count_rows(self, table: str) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{table}"')
+            return cursor.fetchone()[0]
+
+    def test_late_partition_takes_default_rows(self):
+        month = date(2090, 1, 1)
+        log = NewsletterLog.objects.create(status='S', server_response='250')
+        NewsletterLog.objects.filter(pk=log.pk).update(date_time=datetime(2090, 1, 15, tzinfo=timezone.utc))
+        NewsletterLog.objects.create(status='S', server_response='250')
+        self.assertEqual(self.count_rows(NewsletterLogPartitions.DEFAULT_PARTITION), 1)
+
+        with mock.patch.object(NewsletterLogPartitions, 'current_month', return_value=month):
+            created = NewsletterLogPartitions.create_partitions(months_ahead=0)
+
+        name = NewsletterLogPartitions.partition_name(month)
+        self.assertEqual(created, [name])
+        self.assertEqual(self.count_rows(name), 1)
+        self.assertEqual(self.count_rows(NewsletterLogPartitions.DEFAULT_PARTITION), 0)
+        self.assertEqual(NewsletterLog.objects.count(), 2)
+
+        # Секция по умолчанию снова присоединена к таблице
+        NewsletterLog.objects.filter(pk=log.pk).update(date_time=datetime(2095, 1, 15, tzinfo=timezone.utc))
+        self.assertEqual(self.count_rows(NewsletterLogPartitions.DEFAULT_PARTITION), 1)
@@ -1,8 +1,10 @@
 from django.contrib import messages
+from django.db.models import Sum
 from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView
 
+from pagination.keyset import KeysetPaginationMixin
 from .forms import ClientCreateForm, NewsletterCreateForm
 from .models import Client, Newsletter, NewsletterLog
 from .services import NewsletterDeliveryService
@@ -23,13 +25,15 @@ class ClientCreateView(CreateView):
         return response
 
 
-class ClientListView(ListView):
+class ClientListView(KeysetPaginationMixin, ListView):
     model = Client
     paginate_by = 5
+    keyset_ordering = ('first_name', 'id')
+    approximate_count = True
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = queryset.filter(is_active=True).order_by('first_name')
+        queryset = queryset.filter(is_active=True)
         return queryset
 
 
@@ -78,6 +82,14 @@ class NewsletterListView(ListView):
 
 class NewsletterDetailView(DetailView):
     model = Newsletter
+    run_stats_count = 10
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        run_stats = self.object.run_stats.all()
+        context['run_stats'] = run_stats[:self.run_stats_count]
+        context['run_totals'] = run_stats.aggregate(sent=Sum('sent'), failed=Sum('failed'))
+        return context
 
 
 class NewsletterCreateView(CreateView):
@@ -96,7 +108,7 @@ class NewsletterCreateView(CreateView):
         self.object.save()
 
         delivery_service = NewsletterDeliveryService(self.object)
-        delivery_service.create_task()
+        delivery_service.schedule()
 
         self.object.status = 'S'
         self.object.save()
@@ -118,8 +130,7 @@ class NewsletterUpdateView(UpdateView):
         response = super().form_valid(form)
 
         delivery_service = NewsletterDeliveryService(self.object)
-        delivery_service.delete_task()
-        delivery_service.create_task()
+        delivery_service.schedule()
 
         messages.success(self.request, 'Данные рассылки успешно отредактированы')
         return response
@@ -132,9 +143,6 @@ class NewsletterDeleteView(DeleteView):
     def form_valid(self, form):
         self.object = self.get_object()
 
-        delivery_service = NewsletterDeliveryService(self.object)
-        delivery_service.delete_task()
-
         message = f'Рассылка "{self.object}" была удалена'
         self.object.delete()
 
@@ -143,13 +151,15 @@ class NewsletterDeleteView(DeleteView):
         return HttpResponseRedirect(self.get_success_url())
 
 
-class NewsletterLogListView(ListView):
+class NewsletterLogListView(KeysetPaginationMixin, ListView):
     model = NewsletterLog
     paginate_by = 5
+    keyset_ordering = ('-date_time', '-id')
+    approximate_count = True
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = queryset.order_by('-date_time')
+        queryset = queryset.select_related('client')
         return queryset
 
 
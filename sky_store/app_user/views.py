@@ -21,6 +21,7 @@ from django.utils.http import urlsafe_base64_decode
 from django.views import View
 from django.views.generic import CreateView, UpdateView, DetailView, ListView
 
+from pagination.keyset import KeysetPaginationMixin
 from permissions.authenticate import AuthenticatedAccessMixin
 from permissions.user_permission import AdminAccessMixin
 from .forms import UserRegistrationForm, UserLoginForm, UserUpdateForm, CustomPasswordResetForm, CustomSetPasswordForm
@@ -259,15 +260,18 @@ class CustomPasswordResetCompleteView(PasswordResetCompleteView):
     template_name = 'app_user/password_reset_complete.html'
 
 
-class UserListView(AdminAccessMixin, ListView):
+class UserListView(AdminAccessMixin, KeysetPaginationMixin, ListView):
     """
     Представление для отображения списка пользователей сервиса.
-    Наследуется от AdminAccessMixin и Django-класса ListView.
+    Наследуется от AdminAccessMixin, KeysetPaginationMixin и Django-класса ListView.
     Класс AdminAccessMixin обеспечивает доступ к представлению
     только для администраторов.
+    Класс KeysetPaginationMixin обеспечивает постраничный вывод
+    по дате регистрации пользователя без OFFSET и COUNT.
     """
     model = CustomUser
     paginate_by = 5
+    keyset_ordering = ('date_joined', 'id')
 
     def get_queryset(self) -> QuerySet[CustomUser]:
         """
@@ -6,7 +6,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 app = Celery('config')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks(['app_newsletter'])
+app.autodiscover_tasks(['app_newsletter', 'app_blog', 'app_media'])
 
 
 @app.task(bind=True)
@@ -28,7 +28,8 @@ INSTALLED_APPS = [
     'app_catalog.apps.AppCatalogConfig',
     'app_blog.apps.AppBlogConfig',
     'app_newsletter.apps.AppNewsletterConfig',
-    'app_user.apps.AppUserConfig'
+    'app_user.apps.AppUserConfig',
+    'app_media.apps.AppMediaConfig'
 ]
 
 MIDDLEWARE = [
@@ -136,6 +137,28 @@ EMAIL_USE_SSL = True
 
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 
+NEWSLETTER_SMTP_CHUNK_SIZE = 100
+NEWSLETTER_DELIVERY_BACKEND = 'sync'
+NEWSLETTER_ASYNC_POOL_SIZE = 20
+NEWSLETTER_ASYNC_CONCURRENCY = 20
+NEWSLETTER_ASYNC_CHUNK_SIZE = 1000
+NEWSLETTER_LOG_BATCH_SIZE = 500
+NEWSLETTER_SHARD_SIZE = 500
+NEWSLETTER_RECIPIENT_FETCH_SIZE = 2000
+NEWSLETTER_MAX_PARALLEL_SHARDS = 4
+NEWSLETTER_DISPATCH_BATCH_SIZE = 1000
+NEWSLETTER_PAYLOAD_CACHE_SIZE = 256
+NEWSLETTER_RATE_LIMIT_REDIS_URL = 'redis://localhost:6379/1'
+NEWSLETTER_RATE_LIMITS = {
+    'default': {'rate': 5, 'capacity': 10},
+}
+NEWSLETTER_SEND_MAX_RETRIES = 5
+NEWSLETTER_RETRY_BACKOFF_BASE = 30
+NEWSLETTER_RETRY_BACKOFF_MAX = 600
+NEWSLETTER_LOG_RETENTION_MONTHS = 12
+NEWSLETTER_LOG_PARTITIONS_AHEAD = 3
+NEWSLETTER_LOG_ARCHIVE_DIR = BASE_DIR / 'archive' / 'newsletter_logs'
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
@@ -143,6 +166,29 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_BEAT_SCHEDULE = {
+    'flush-post-views': {
+        'task': 'app_blog.tasks.flush_post_views',
+        'schedule': 60.0,
+    },
+    'dispatch-due-newsletters': {
+        'task': 'app_newsletter.tasks.dispatch_due_newsletters',
+        'schedule': 60.0,
+    },
+    'expire-finished-newsletters': {
+        'task': 'app_newsletter.tasks.expire_finished_newsletters',
+        'schedule': 60.0,
+    },
+    'create-newsletter-log-partitions': {
+        'task': 'app_newsletter.tasks.create_newsletter_log_partitions',
+        'schedule': 24 * 60 * 60.0,
+    },
+}
+
+BLOG_VIEWS_REDIS_URL = 'redis://localhost:6379/1'
+BLOG_VIEWS_FLUSH_INTERVAL = 60
+BLOG_VIEWS_REDIS_RETRY_INTERVAL = 30
 
 LOGGING = {
     'version': 1,
@@ -172,3 +218,27 @@ CACHES = {
         "TIMEOUT": 60
     }
 }
+
+PRODUCT_AUTOCOMPLETE_MIN_LENGTH = 2
+PRODUCT_AUTOCOMPLETE_LIMIT = 10
+PRODUCT_AUTOCOMPLETE_MAX_LIMIT = 50
+PRODUCT_AUTOCOMPLETE_CHANGE_TIMEOUT = 60 * 60
+PRODUCT_AUTOCOMPLETE_TRIGRAM_CHECK_INTERVAL = 60
+
+CATALOG_PRICE_BUCKETS = [0, 500, 1000, 2000, 5000]
+CATALOG_FACETS_CACHE_TIMEOUT = 60 * 15
+
+MEDIA_VARIANT_DIR = 'variants'
+MEDIA_VARIANT_WIDTHS = [320, 640, 1280]
+MEDIA_VARIANT_FORMATS = {'webp': 80, 'jpeg': 85}
+MEDIA_VARIANT_FIELDS = {
+    'app_catalog.Product': ['image'],
+    'app_blog.Post': ['preview'],
+    'app_user.CustomUser': ['avatar'],
+}
+# Короткая политика повторов публикации задачи: при недоступном брокере сохранение модели не ждёт подключения
+MEDIA_VARIANT_TASK_RETRY_POLICY = {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.1, 'interval_max': 0.1}
+MEDIA_FILE_CACHE_TIMEOUT = 60 * 60 * 24
+MEDIA_URL_HASH_LENGTH = 12
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_SERVE = DEBUG
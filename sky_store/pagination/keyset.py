@@ -0,0 +1,236 @@
+import datetime
+import decimal
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Model, Q, QuerySet
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'pagination.keyset'
+
+
+class KeysetPage:
+    """
+    Класс, описывающий страницу выборки при keyset-пагинации.
+    Повторяет интерфейс django.core.paginator.Page в объёме,
+    который используется в шаблонах и ListView.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list: List[Model], paginator: 'KeysetPaginator',
+                 next_cursor: Optional[str], previous_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Класс, описывающий keyset (cursor) пагинатор.
+
+    Вместо OFFSET следующая страница выбирается по условию на значения ключа сортировки
+    последней записи текущей страницы, поэтому стоимость запроса не зависит от номера страницы.
+    Ключ сортировки должен быть уникальным, поэтому последним полем в нём указывается 'id'.
+    Положение в выборке передаётся в виде непрозрачного подписанного токена,
+    подпись которого зависит от ключа сортировки, поэтому токен другого списка не принимается.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: Sequence[str],
+                 approximate_count: bool = False) -> None:
+        """
+        :param queryset: Выборка, которую нужно разбить на страницы.
+        :param per_page: Количество объектов на странице.
+        :param ordering: Поля ключа сортировки, например ('-date_time', '-id').
+        :param approximate_count: Оценивать ли общее количество объектов по статистике планировщика.
+        """
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.approximate_count = approximate_count
+        self.fields = [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+        self.salt = f"{CURSOR_SALT}:{','.join(self.ordering)}"
+
+    @cached_property
+    def count(self) -> Optional[int]:
+        """
+        Возвращает оценку количества объектов в выборке по статистике планировщика PostgreSQL.
+        Точный COUNT(*) не выполняется. Для остальных СУБД и при выключенной оценке возвращает None.
+        """
+        if not self.approximate_count:
+            return None
+
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def page(self, cursor: Optional[str]) -> KeysetPage:
+        """
+        Возвращает страницу, на которую указывает токен.
+        Если токен не передан, повреждён или содержит значения, не подходящие для ключа сортировки,
+        возвращает первую страницу.
+
+        :param cursor: Токен положения в выборке.
+        """
+        values, backwards = self.decode_cursor(cursor)
+
+        queryset = self.queryset.order_by(*self._ordering(reverse=backwards))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._keyset_filter(values, reverse=backwards))
+            except (ValidationError, ValueError, TypeError):
+                values, backwards = None, False
+                queryset = self.queryset.order_by(*self._ordering(reverse=False))
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if backwards:
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = self.encode_cursor(object_list[-1], backwards=False) if has_next and object_list else None
+        previous_cursor = self.encode_cursor(object_list[0], backwards=True) if has_previous and object_list else None
+
+        return KeysetPage(
+            object_list=object_list,
+            paginator=self,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor
+        )
+
+    def encode_cursor(self, obj: Model, backwards: bool) -> str:
+        """
+        Кодирует значения ключа сортировки объекта в токен.
+
+        :param obj: Крайний объект страницы.
+        :param backwards: Направление перехода (True - на предыдущую страницу).
+        """
+        values = [self._serialize(getattr(obj, name)) for name, _ in self.fields]
+        return signing.dumps({'v': values, 'b': backwards}, salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor: Optional[str]) -> Tuple[Optional[List[Any]], bool]:
+        """
+        Декодирует токен в значения ключа сортировки и направление перехода.
+
+        :param cursor: Токен положения в выборке.
+        """
+        if not cursor:
+            return None, False
+
+        try:
+            payload = signing.loads(cursor, salt=self.salt)
+            values = payload['v']
+            backwards = bool(payload['b'])
+        except (signing.BadSignature, KeyError, TypeError):
+            return None, False
+
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            return None, False
+        return values, backwards
+
+    def _ordering(self, reverse: bool) -> List[str]:
+        """
+        Возвращает ключ сортировки в прямом или обратном направлении.
+        """
+        if not reverse:
+            return list(self.ordering)
+        return [name if descending else f'-{name}' for name, descending in self.fields]
+
+    def _keyset_filter(self, values: List[Any], reverse: bool) -> Q:
+        """
+        Строит условие выборки записей, расположенных после (или перед) переданным ключом:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_index, (prev_name, _) in enumerate(self.fields[:index]):
+                branch &= Q(**{prev_name: values[prev_index]})
+            condition |= branch
+        return condition
+
+    @staticmethod
+    def _serialize(value: Any) -> Any:
+        """
+        Приводит значение ключа сортировки к виду, пригодному для JSON, без потери точности.
+        """
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        if isinstance(value, Model):
+            return value.pk
+        return value
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView, заменяющий постраничную пагинацию через OFFSET на keyset-пагинацию.
+
+    Ключ сортировки задаётся атрибутом keyset_ordering, количество объектов на странице -
+    стандартным атрибутом paginate_by. Точное количество объектов не подсчитывается;
+    при approximate_count = True в шаблон передаётся оценка планировщика.
+    """
+    keyset_ordering: Sequence[str] = ('-id',)
+    cursor_kwarg = 'cursor'
+    approximate_count = False
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> Tuple[KeysetPaginator, KeysetPage, list, bool]:
+        """
+        Разбивает выборку на страницы по ключу сортировки.
+        """
+        paginator = KeysetPaginator(
+            queryset=queryset,
+            per_page=page_size,
+            ordering=self.keyset_ordering,
+            approximate_count=self.approximate_count
+        )
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        """
+        Добавляет в контекст параметры запроса (кроме токена пагинации)
+        для формирования ссылок на соседние страницы.
+        """
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        query.pop(self.cursor_kwarg, None)
+        query.pop('page', None)
+        context['pagination_query'] = query.urlencode()
+        return context
@@ -0,0 +1,121 @@
+from unittest import skipIf
+
+from django.core import signing
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.test import TestCase
+from django.urls import reverse
+
+from app_catalog.models import Category, Product
+from app_user.models import CustomUser
+from .keyset import KeysetPaginator
+
+
+class KeysetPaginatorTestCase(TestCase):
+    """
+    Проверяет keyset-пагинацию: токены, переходы вперёд и назад при повторяющихся значениях ключа сортировки
+    и оценку количества объектов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+        # Названия и цены повторяются, поэтому порядок внутри одинаковых значений задаёт id
+        for number, name in enumerate(['Б', 'А', 'Б', 'В', 'Б', 'А', 'Б', 'Б', 'В']):
+            Product.objects.create(
+                name=name, description='Описание', category=category, price=100 * (number % 3),
+                created_by=user, is_published=True
+            )
+
+    @staticmethod
+    def get_pages(paginator: KeysetPaginator) -> list:
+        """
+        Проходит выборку вперёд до последней страницы, затем назад до первой.
+        Возвращает идентификаторы объектов страниц в порядке обхода.
+        """
+        pages = [paginator.page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        while pages[-1].has_previous():
+            pages.append(paginator.page(pages[-1].previous_cursor))
+        return [[obj.pk for obj in page] for page in pages]
+
+    def assert_pages(self, paginator: KeysetPaginator, expected: list) -> None:
+        chunks = [expected[index:index + paginator.per_page] for index in range(0, len(expected), paginator.per_page)]
+        self.assertEqual(self.get_pages(paginator), chunks + chunks[-2::-1])
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPaginator(Product.objects.all(), per_page=2, ordering=('-created_at', 'name', 'id'))
+        product = Product.objects.first()
+        cursor = paginator.encode_cursor(product, backwards=True)
+        self.assertEqual(
+            paginator.decode_cursor(cursor), ([product.created_at.isoformat(), product.name, product.pk], True)
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), per_page=2, ordering=('name', 'id'))
+        first_page = [obj.pk for obj in paginator.page(None)]
+        cursor = paginator.encode_cursor(Product.objects.last(), backwards=False)
+        other_cursor = KeysetPaginator(Product.objects.all(), per_page=2, ordering=('-name', 'id')).encode_cursor(
+            Product.objects.last(), backwards=False
+        )
+        cursors = [
+            cursor[:-3] + 'abc',
+            'не токен',
+            other_cursor,
+            signing.dumps({'v': ['Б'], 'b': False}, salt=paginator.salt),
+            signing.dumps({'v': ['Б', 'не число'], 'b': False}, salt=paginator.salt),
+        ]
+        for invalid_cursor in cursors:
+            with self.subTest(cursor=invalid_cursor):
+                page = paginator.page(invalid_cursor)
+                self.assertEqual([obj.pk for obj in page], first_page)
+                self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_in_view(self):
+        paginator = KeysetPaginator(Product.objects.all(), per_page=4, ordering=('name', 'id'))
+        cursor = signing.dumps({'v': ['Б', 'не число'], 'b': True}, salt=paginator.salt)
+        response = self.client.get(reverse('app_catalog:product_list'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_paging_with_duplicate_names(self):
+        expected = list(Product.objects.order_by('name', 'id').values_list('pk', flat=True))
+        for per_page in (2, 3):
+            with self.subTest(per_page=per_page):
+                self.assert_pages(
+                    KeysetPaginator(Product.objects.all(), per_page=per_page, ordering=('name', 'id')), expected
+                )
+
+    def test_paging_with_mixed_directions(self):
+        expected = list(Product.objects.order_by('-name', 'id').values_list('pk', flat=True))
+        self.assert_pages(KeysetPaginator(Product.objects.all(), per_page=2, ordering=('-name', 'id')), expected)
+
+    def test_paging_by_rank(self):
+        """
+        Сортировка ProductSearchView: по убыванию вычисляемой релевантности, затем по id.
+        """
+        queryset = Product.objects.annotate(rank=Cast('price', FloatField()))
+        expected = list(queryset.order_by('-rank', 'id').values_list('pk', flat=True))
+        self.assert_pages(KeysetPaginator(queryset, per_page=2, ordering=('-rank', 'id')), expected)
+
+    def test_search_view_paging(self):
+        expected = list(Product.objects.filter(name='Б').order_by('id').values_list('pk', flat=True))
+        found, cursor, pages = [], '', 0
+        while cursor is not None:
+            pages += 1
+            response = self.client.get(reverse('app_catalog:product_search'), {'q': 'Б', 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            found += [product.pk for product in page]
+            cursor = page.next_cursor
+        self.assertEqual(found, expected)
+        self.assertEqual(pages, 2)
+
+    @skipIf(connection.vendor == 'postgresql', 'Оценка количества объектов выполняется только в PostgreSQL')
+    def test_count_is_not_estimated(self):
+        paginator = KeysetPaginator(Product.objects.all(), per_page=2, ordering=('id',), approximate_count=True)
+        with self.assertNumQueries(0):
+            self.assertIsNone(paginator.count)
@@ -0,0 +1,51 @@
+from typing import FrozenSet
+
+from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
+
+MODERATORS_GROUP = 'Модераторы'
+CONTENT_MANAGERS_GROUP = 'Контент менеджеры'
+
+GROUP_NAMES_ATTR = '_cached_group_names'
+
+
+def get_group_names(user: AbstractBaseUser | AnonymousUser) -> FrozenSet[str]:
+    """
+    Возвращает названия групп пользователя.
+    Группы загружаются из базы данных одним запросом при первом обращении
+    и сохраняются в объекте пользователя, поэтому в рамках одного запроса
+    (request.user) повторные проверки не обращаются к базе данных.
+
+    :param user: Пользователь, группы которого нужно получить.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, GROUP_NAMES_ATTR, None)
+    if group_names is None:
+        group_names = frozenset(user.groups.values_list('name', flat=True))
+        setattr(user, GROUP_NAMES_ATTR, group_names)
+    return group_names
+
+
+def has_group(user: AbstractBaseUser | AnonymousUser, group_name: str) -> bool:
+    """
+    Проверяет, принадлежит ли пользователь к группе.
+
+    :param user: Пользователь, которого нужно проверить.
+    :param group_name: Название группы.
+    """
+    return group_name in get_group_names(user)
+
+
+def is_moderator(user: AbstractBaseUser | AnonymousUser) -> bool:
+    """
+    Проверяет, входит ли пользователь в группу 'Модераторы'.
+    """
+    return has_group(user, MODERATORS_GROUP)
+
+
+def is_content_manager(user: AbstractBaseUser | AnonymousUser) -> bool:
+    """
+    Проверяет, входит ли пользователь в группу 'Контент менеджеры'.
+    """
+    return has_group(user, CONTENT_MANAGERS_GROUP)
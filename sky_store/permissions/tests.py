@@ -0,0 +1,43 @@
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app_catalog.models import Category, Product
+from app_user.models import CustomUser
+from .roles import (
+    MODERATORS_GROUP, CONTENT_MANAGERS_GROUP, get_group_names, has_group, is_moderator, is_content_manager
+)
+
+
+class GroupLookupTestCase(TestCase):
+    """
+    Проверяет, что группы пользователя загружаются не более одного раза за запрос.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.moderator = CustomUser.objects.create_user(email='moderator@example.com', password='password')
+        cls.moderator.groups.add(Group.objects.create(name=MODERATORS_GROUP))
+        Group.objects.create(name=CONTENT_MANAGERS_GROUP)
+        category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(
+            name='Товар', description='Описание', category=category, price=100, created_by=cls.moderator
+        )
+
+    def test_group_names_are_loaded_once(self):
+        user = CustomUser.objects.get(pk=self.moderator.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_group_names(user), frozenset([MODERATORS_GROUP]))
+            self.assertTrue(is_moderator(user))
+            self.assertFalse(is_content_manager(user))
+            self.assertFalse(has_group(user, 'Другая группа'))
+
+    def test_product_update_page_queries_groups_once(self):
+        self.client.force_login(self.moderator)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('app_catalog:update_product', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 200)
+        group_queries = [query['sql'] for query in context.captured_queries if 'auth_group' in query['sql']]
+        self.assertLessEqual(len(group_queries), 1, group_queries)
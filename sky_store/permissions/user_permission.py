@@ -5,6 +5,7 @@ from django.shortcuts import redirect
 from django.urls import reverse
 
 from app_catalog.forms import ProductModeratorForm, ProductCreatorForm
+from .roles import is_moderator, is_content_manager
 
 
 class CreatorAccessMixin:
@@ -81,7 +82,7 @@ class ModeratorAccessMixin:
         :param request: HttpRequest объект.
         """
 
-        if not request.user.groups.filter(name='Модераторы'):
+        if not is_moderator(request.user):
             messages.info(request=request, message='У вас нет соответствующих прав доступа!')
             return redirect(reverse('app_catalog:home'))
 
@@ -97,7 +98,7 @@ class ModeratorOrCreatorMixin(UserPassesTestMixin):
         """
         Возвращает форму в зависимости от роли пользователя.
         """
-        if self.request.user.groups.filter(name='Модераторы').exists():
+        if is_moderator(self.request.user):
             return ProductModeratorForm
         else:
             return ProductCreatorForm
@@ -113,8 +114,7 @@ class ModeratorOrCreatorMixin(UserPassesTestMixin):
         """
         Определяет, входит ли пользователь в группу 'Модераторы' или является создателем товара.
         """
-        return self.request.user.groups.filter(
-            name='Модераторы').exists() or self.check_creator_access(self.get_object())
+        return is_moderator(self.request.user) or self.check_creator_access(self.get_object())
 
     def handle_no_permission(self) -> HttpResponseRedirect:
         """
@@ -144,7 +144,7 @@ class CombinedAccessMixin:
         к редактированию или удалению объекта.
         :param obj: Объект, который нужно проверить.
         """
-        return obj.created_by == self.request.user or self.request.user.groups.filter(name='Контент менеджеры')
+        return obj.created_by == self.request.user or is_content_manager(self.request.user)
 
     def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponseRedirect:
         """